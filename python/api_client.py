@@ -1,47 +1,167 @@
-import requests
 import json
-from typing import List, Dict, Generator
-from config import API_KEY, API_URL
+import time
+import requests
+from typing import Any, List, Dict, Generator, Optional
+from config import API_KEY, API_URL, MODEL
+from http_transport import HTTPTransport, get_shared_transport
+from response_cache import ResponseCache, make_cache_key
+from request_scheduler import PRIORITY_INTERACTIVE, RequestScheduler, get_scheduler
+from history_manager import estimate_tokens
+from metrics import registry as metrics_registry
+from sse_decoder import SSEDecoder, SSEEvent, StreamMetrics
+
+def text_from_stream_event(event: SSEEvent, metrics: StreamMetrics) -> Optional[str]:
+    """
+    text_from_stream_event function
+
+    Parameters:
+        event (SSEEvent): A decoded Messages API stream event.
+        metrics (StreamMetrics): The metrics of the stream the event belongs to.
+
+    Returns:
+        Optional[str]: The text carried by the event, or None for events without text.
+    """
+    if event.event == "ping":
+        return None
+    payload = event.json()
+    event_type = payload.get("type", event.event)
+    if event_type == "content_block_delta":
+        delta = payload.get("delta", {})
+        return delta.get("text") if delta.get("type", "text_delta") == "text_delta" else None
+    elif event_type == "message_start":
+        metrics.input_tokens = payload.get("message", {}).get("usage", {}).get("input_tokens")
+    elif event_type == "message_delta":
+        output_tokens = payload.get("usage", {}).get("output_tokens")
+        if output_tokens is not None:
+            metrics.output_tokens = output_tokens
+    elif event_type == "error":
+        error = payload.get("error", {})
+        raise RuntimeError(f"{error.get('type', 'error')}: {error.get('message', '')}")
+    elif "content" in payload:
+        # Older endpoints send whole content blocks rather than deltas.
+        return payload["content"][0]["text"]
+    return None
+
+def build_headers(api_key: str) -> Dict[str, str]:
+    return {
+        "Content-Type": "application/json",
+        "X-API-Key": api_key,
+    }
+
+def build_request(messages: List[Dict[str, str]], system_prompt: str, stream: bool = False) -> Dict[str, Any]:
+    data = {
+        "messages": messages,
+        "system": system_prompt,
+        "model": MODEL,
+        "max_tokens_to_sample": 1000,
+    }
+    if stream:
+        data["stream"] = True
+    return data
 
 class AnthropicAPIClient:
-    def __init__(self):
+    def __init__(self, transport: Optional[HTTPTransport] = None, api_url: str = API_URL, cache: Optional[ResponseCache] = None,
+                 scheduler: Optional[RequestScheduler] = None, priority: int = PRIORITY_INTERACTIVE):
         self.api_key = API_KEY
-        self.api_url = API_URL
+        self.api_url = api_url
+        self.transport = transport or get_shared_transport()
+        self.cache = cache
+        self.scheduler = scheduler or get_scheduler()
+        self.priority = priority
+        self.last_timings: Dict[str, Any] = {}
+        self.last_stream_metrics: Dict[str, Any] = {}
+
+    def _post(self, data: Dict[str, Any], stream: bool = False):
+        body = json.dumps(data)
+        estimated_tokens = estimate_tokens(body)
+        rate_limit_wait = self.scheduler.acquire(estimated_tokens, self.priority)
+        response, self.last_timings = self.transport.post(self.api_url, build_headers(self.api_key), body, stream=stream)
+        self.last_timings["rate_limit_wait"] = rate_limit_wait
+        self.last_timings["estimated_tokens"] = estimated_tokens
+        if not response.ok:
+            # An unread streaming response would hold its pooled connection until garbage collected. The
+            # (small) error body is read first, so the connection goes back to the pool instead of being dropped.
+            try:
+                response.content
+            except requests.RequestException:
+                pass
+            finally:
+                response.close()
+            response.raise_for_status()
+        return response
+
+    def _cache_key(self, data: Dict[str, Any]) -> Optional[str]:
+        if self.cache is None or not self.cache.enabled:
+            return None
+        return make_cache_key(data)
 
     def send_message(self, message: str, system_prompt: str, conversation_history: List[Dict[str, str]]) -> str:
-        headers = {
-            "Content-Type": "application/json",
-            "X-API-Key": self.api_key,
-        }
-
-        data = {
-            "messages": conversation_history + [{"role": "user", "content": message}],
-            "system": system_prompt,
-            "model": "claude-2",
-            "max_tokens_to_sample": 1000,
-        }
-
-        response = requests.post(self.api_url, headers=headers, data=json.dumps(data))
-        response.raise_for_status()
-        return response.json()["content"][0]["text"]
+        return self.send_messages(conversation_history + [{"role": "user", "content": message}], system_prompt)
 
     def stream_message(self, message: str, system_prompt: str, conversation_history: List[Dict[str, str]]) -> Generator[str, None, None]:
-        headers = {
-            "Content-Type": "application/json",
-            "X-API-Key": self.api_key,
-        }
-
-        data = {
-            "messages": conversation_history + [{"role": "user", "content": message}],
-            "system": system_prompt,
-            "model": "claude-2",
-            "max_tokens_to_sample": 1000,
-            "stream": True,
-        }
-
-        response = requests.post(self.api_url, headers=headers, data=json.dumps(data), stream=True)
-        response.raise_for_status()
-
-        for line in response.iter_lines():
-            if line:
-                yield json.loads(line)["content"][0]["text"]
\ No newline at end of file
+        return self.stream_messages(conversation_history + [{"role": "user", "content": message}], system_prompt)
+
+    def send_messages(self, messages: List[Dict[str, str]], system_prompt: str) -> str:
+        """Send a payload whose last message is the new user turn. The list is sent as is, not copied."""
+        start = time.perf_counter()
+        data = build_request(messages, system_prompt)
+        cache_key = self._cache_key(data)
+        if cache_key:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                text = "".join(cached)
+                metrics_registry.record("api.cache_hit", time.perf_counter() - start, bytes_out=len(text))
+                return text
+
+        try:
+            response = self._post(data)
+        except Exception:
+            metrics_registry.record("api.send", time.perf_counter() - start, error=True)
+            raise
+        result = response.json()
+        usage = result.get("usage", {})
+        self.scheduler.settle(self.last_timings["estimated_tokens"], usage.get("input_tokens"), usage.get("output_tokens"))
+        text = result["content"][0]["text"]
+        if cache_key:
+            self.cache.put(cache_key, [text])
+        metrics_registry.record("api.send", time.perf_counter() - start, bytes_in=len(response.request.body or ""),
+                                bytes_out=len(response.content))
+        return text
+
+    def stream_messages(self, messages: List[Dict[str, str]], system_prompt: str) -> Generator[str, None, None]:
+        data = build_request(messages, system_prompt, stream=True)
+        cache_key = self._cache_key(data)
+        if cache_key:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                metrics_registry.record("api.cache_hit", 0.0, bytes_out=sum(len(chunk) for chunk in cached))
+                yield from cached
+                return
+
+        metrics = StreamMetrics()
+        try:
+            response = self._post(data, stream=True)
+        except Exception:
+            metrics_registry.record("api.stream", time.perf_counter() - metrics.start, error=True)
+            raise
+        chunks: List[str] = []
+        completed = False
+
+        try:
+            with response:
+                for event in SSEDecoder().iter_events(response.iter_content(chunk_size=None)):
+                    text = text_from_stream_event(event, metrics)
+                    if text:
+                        metrics.record_chunk(text)
+                        chunks.append(text)
+                        yield text
+            # Only complete streams are cached; an interrupted one never reaches this point.
+            if cache_key:
+                self.cache.put(cache_key, chunks)
+            completed = True
+        finally:
+            metrics.finish()
+            metrics_registry.record("api.stream", metrics.end - metrics.start, error=not completed,
+                                    bytes_in=len(response.request.body or ""), bytes_out=metrics.characters)
+            self.last_stream_metrics = metrics.to_dict()
+            self.scheduler.settle(self.last_timings["estimated_tokens"], metrics.input_tokens, metrics.output_tokens)
@@ -0,0 +1,154 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Any, AsyncGenerator, Dict, List, Optional, Sequence, Union
+import aiohttp
+from api_client import build_headers, build_request, text_from_stream_event
+from config import (
+    API_KEY,
+    API_URL,
+    SYSTEM_PROMPT,
+    ASYNC_BATCH_CONCURRENCY,
+    HTTP_POOL_MAXSIZE,
+    HTTP_MAX_RETRIES,
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_READ_TIMEOUT,
+    HTTP_RETRY_AFTER_MAX,
+)
+from history_manager import estimate_tokens
+from http_transport import RETRY_STATUS_CODES, backoff_delay, parse_retry_after
+from request_scheduler import PRIORITY_BATCH, RequestScheduler, get_scheduler
+from sse_decoder import SSEDecoder, StreamMetrics
+
+class AsyncAnthropicAPIClient:
+    """
+    asyncio sibling of AnthropicAPIClient.
+
+    Use it as an async context manager, or call close() when done, so the
+    pooled aiohttp session is released.
+    """
+
+    def __init__(self, api_url: str = API_URL, concurrency: int = ASYNC_BATCH_CONCURRENCY,
+                 pool_size: int = HTTP_POOL_MAXSIZE, max_retries: int = HTTP_MAX_RETRIES,
+                 scheduler: Optional[RequestScheduler] = None, priority: int = PRIORITY_BATCH):
+        self.api_key = API_KEY
+        self.api_url = api_url
+        self.concurrency = concurrency
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.scheduler = scheduler or get_scheduler()
+        self.priority = priority
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def __aenter__(self) -> "AsyncAnthropicAPIClient":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+                timeout=aiohttp.ClientTimeout(connect=HTTP_CONNECT_TIMEOUT, sock_read=HTTP_READ_TIMEOUT),
+            )
+        return self._session
+
+    async def _post(self, data: Dict[str, Any]) -> aiohttp.ClientResponse:
+        session = self._get_session()
+        body = json.dumps(data)
+        # The scheduler is shared with the synchronous clients, so wait for it off the event loop.
+        await asyncio.get_running_loop().run_in_executor(None, self.scheduler.acquire, estimate_tokens(body), self.priority)
+        attempt = 0
+        while True:
+            try:
+                response = await session.post(self.api_url, headers=build_headers(self.api_key), data=body)
+            except aiohttp.ClientConnectorError as e:
+                # Only connect failures are retried; see http_transport.is_connect_error.
+                if attempt >= self.max_retries:
+                    raise
+                delay = backoff_delay(attempt)
+                logging.warning(f"Connection error posting to {self.api_url}: {str(e)}. Retrying in {delay:.2f}s")
+            else:
+                delay = parse_retry_after(response.headers.get("Retry-After"))
+                if (response.status not in RETRY_STATUS_CODES or attempt >= self.max_retries
+                        or (delay is not None and delay > HTTP_RETRY_AFTER_MAX)):
+                    if response.status >= 400:
+                        # Hand the connection back to the pool before the error propagates.
+                        response.release()
+                        response.raise_for_status()
+                    return response
+                if delay is None:
+                    delay = backoff_delay(attempt)
+                logging.warning(f"POST {self.api_url} returned {response.status}. Retrying in {delay:.2f}s")
+                response.release()
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def send_message(self, message: str, system_prompt: str, conversation_history: List[Dict[str, str]]) -> str:
+        messages = conversation_history + [{"role": "user", "content": message}]
+        async with await self._post(build_request(messages, system_prompt)) as response:
+            result = await response.json(content_type=None)
+        return result["content"][0]["text"]
+
+    async def stream_message(self, message: str, system_prompt: str, conversation_history: List[Dict[str, str]],
+                             metrics: Optional[StreamMetrics] = None) -> AsyncGenerator[str, None]:
+        messages = conversation_history + [{"role": "user", "content": message}]
+        metrics = metrics or StreamMetrics()
+        decoder = SSEDecoder()
+        try:
+            async with await self._post(build_request(messages, system_prompt, stream=True)) as response:
+                async for chunk in response.content.iter_any():
+                    for event in decoder.feed(chunk):
+                        text = text_from_stream_event(event, metrics)
+                        if text:
+                            metrics.record_chunk(text)
+                            yield text
+                for event in decoder.flush():
+                    text = text_from_stream_event(event, metrics)
+                    if text:
+                        metrics.record_chunk(text)
+                        yield text
+        finally:
+            metrics.finish()
+
+    async def batch(self, prompts: Sequence[str], system_prompt: str = SYSTEM_PROMPT,
+                    concurrency: Optional[int] = None, stream: bool = False) -> List[Union[str, Exception]]:
+        """
+        batch function
+
+        Parameters:
+            prompts (Sequence[str]): Independent single-turn prompts.
+            system_prompt (str): The system prompt sent with every prompt.
+            concurrency (Optional[int]): Maximum number of requests in flight. Defaults to the client's setting.
+            stream (bool): Whether to use the streaming endpoint for each request.
+
+        Returns:
+            List[Union[str, Exception]]: One entry per prompt, in input order. A prompt that failed
+            gets the exception it raised instead of a response, so one failure doesn't sink the batch.
+        """
+        semaphore = asyncio.Semaphore(concurrency or self.concurrency)
+        results: List[Union[str, Exception]] = [None] * len(prompts)
+
+        async def run(index: int, prompt: str):
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    if stream:
+                        chunks = [chunk async for chunk in self.stream_message(prompt, system_prompt, [])]
+                        results[index] = "".join(chunks)
+                    else:
+                        results[index] = await self.send_message(prompt, system_prompt, [])
+                except Exception as e:
+                    logging.error(f"Batch prompt {index} failed: {str(e)}")
+                    results[index] = e
+                logging.debug(f"Batch prompt {index} finished in {time.perf_counter() - start:.3f}s")
+
+        await asyncio.gather(*(run(index, prompt) for index, prompt in enumerate(prompts)))
+        return results
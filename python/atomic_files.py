@@ -0,0 +1,160 @@
+import os
+import shutil
+import stat
+import uuid
+import logging
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+def fsync_directory(directory: str):
+    """Persist a rename or removal in directory; a no-op where directories cannot be opened (Windows)."""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def write_temp_file(file_path: str, data: bytes) -> str:
+    """
+    write_temp_file function
+
+    Parameters:
+        file_path (str): The file the data is destined for.
+        data (bytes): The new content.
+
+    Returns:
+        str: The path of a fully written and fsynced temporary file next to file_path, with file_path's
+        permissions, ready to be renamed over it.
+    """
+    directory = os.path.dirname(os.path.abspath(file_path))
+    os.makedirs(directory, exist_ok=True)
+    try:
+        mode = stat.S_IMODE(os.stat(file_path).st_mode)
+    except FileNotFoundError:
+        mode = None
+    temp_path = os.path.join(directory, f".{os.path.basename(file_path)}.{uuid.uuid4().hex}.tmp")
+    # A new file is created 0666 so the process umask applies as for any other new file; a replacement
+    # starts owner-only and gets the original's mode below.
+    fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0),
+                 0o666 if mode is None else 0o600)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        if mode is not None:
+            os.chmod(temp_path, mode)
+        return temp_path
+    except BaseException:
+        _remove_quietly(temp_path)
+        raise
+
+def atomic_write(file_path: str, data: bytes):
+    """
+    atomic_write function
+
+    Parameters:
+        file_path (str): The file to write.
+        data (bytes): The new content.
+
+    Writes to a temporary file in the same directory, fsyncs it and renames it over file_path, so
+    readers and crashes see either the old content or the new, never a partial write.
+    """
+    temp_path = write_temp_file(file_path, data)
+    try:
+        os.replace(temp_path, file_path)
+    except BaseException:
+        _remove_quietly(temp_path)
+        raise
+    fsync_directory(os.path.dirname(os.path.abspath(file_path)))
+
+def _remove_quietly(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+class WriteTransaction:
+    """
+    A set of file writes and deletions applied together.
+
+    Writes are staged in memory, so reads through staged() see them before
+    commit. Commit writes and fsyncs every new version first, then backs up
+    the current files and renames the new versions into place; if any step
+    fails, the files already replaced are restored from their backups.
+    """
+
+    def __init__(self):
+        # Absolute path -> new content, or None to delete the file
+        self._staged: "OrderedDict[str, Optional[bytes]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._staged)
+
+    def paths(self) -> List[str]:
+        return list(self._staged)
+
+    def stage(self, file_path: str, data: Optional[bytes]):
+        self._staged[os.path.abspath(file_path)] = data
+
+    def staged(self, file_path: str) -> Tuple[bool, Optional[bytes]]:
+        """Return whether file_path has a staged change, and the staged content (None for a deletion)."""
+        path = os.path.abspath(file_path)
+        if path in self._staged:
+            return True, self._staged[path]
+        return False, None
+
+    def abort(self):
+        self._staged.clear()
+
+    def commit(self) -> List[str]:
+        """Apply every staged change, all or nothing. Returns the paths changed; raises on failure."""
+        temps = {}
+        backups = {}
+        applied = []
+        try:
+            for path, data in self._staged.items():
+                if data is not None:
+                    temps[path] = write_temp_file(path, data)
+            for path in self._staged:
+                if os.path.exists(path):
+                    backup = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.{uuid.uuid4().hex[:8]}.bak")
+                    try:
+                        os.link(path, backup)
+                    except OSError:
+                        shutil.copy2(path, backup)
+                    backups[path] = backup
+            for path, data in self._staged.items():
+                if data is None:
+                    if os.path.exists(path):
+                        os.remove(path)
+                else:
+                    os.replace(temps[path], path)
+                    # Dropped only once renamed, so a failed rename's temporary file is cleaned up below.
+                    del temps[path]
+                applied.append(path)
+        except BaseException:
+            for path in reversed(applied):
+                try:
+                    if path in backups:
+                        os.replace(backups.pop(path), path)
+                    elif os.path.exists(path):
+                        os.remove(path)
+                except OSError as e:
+                    logging.error(f"Could not roll back {path}: {str(e)}")
+            for temp_path in temps.values():
+                _remove_quietly(temp_path)
+            for backup in backups.values():
+                _remove_quietly(backup)
+            raise
+        for directory in {os.path.dirname(path) for path in applied}:
+            fsync_directory(directory)
+        for backup in backups.values():
+            _remove_quietly(backup)
+        self._staged.clear()
+        return applied
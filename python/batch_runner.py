@@ -0,0 +1,98 @@
+import json
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+# Commands that only read state. Consecutive runs of these are executed concurrently;
+# every other command (cd, write, exec, chat turns, stores, ...) is an ordering barrier.
+PARALLEL_SAFE_PREFIXES = (
+    "file list",
+    "file read ",
+    "file parse ",
+    "file pwd",
+    "file find-symbol ",
+    "code analyze ",
+    "code generate ",
+    "nlp ",
+    "kb ",
+    "memory retrieve ",
+    "memory list",
+    "task list",
+    "cache stats",
+    "scheduler stats",
+)
+
+# Commands under a parallel-safe prefix that write files, and so stay barriers
+BARRIER_PREFIXES = (
+    "nlp file ",
+)
+
+# Flush a run of parallel commands after this many per worker so results keep streaming out.
+GROUP_SIZE_PER_WORKER = 4
+
+def is_barrier(command: str) -> bool:
+    return not command.startswith(PARALLEL_SAFE_PREFIXES) or command.startswith(BARRIER_PREFIXES)
+
+def read_commands(lines: Iterable[str]) -> Iterator[Tuple[int, str]]:
+    """Yield (line number, command) pairs, skipping blank lines and '#' comments and stopping at 'quit'."""
+    for line_number, line in enumerate(lines, 1):
+        command = line.strip()
+        if not command or command.startswith("#"):
+            continue
+        if command.lower() == "quit":
+            return
+        yield line_number, command
+
+def run_command(session, line_number: int, command: str) -> Dict[str, Any]:
+    start = time.perf_counter()
+    result: Dict[str, Any] = {"line": line_number, "command": command}
+    try:
+        output = session.handle_command(command)
+        result["ok"] = not output.startswith("Error")
+        result["output"] = output
+    except Exception as e:
+        logging.error(f"Batch command on line {line_number} failed: {str(e)}")
+        result["ok"] = False
+        result["error"] = str(e)
+    result["elapsed"] = round(time.perf_counter() - start, 6)
+    return result
+
+def run_batch(session, lines: Iterable[str], max_workers: int) -> Iterator[Dict[str, Any]]:
+    """
+    run_batch function
+
+    Parameters:
+        session (AssistantSession): The session whose handle_* dispatchers run the commands.
+        lines (Iterable[str]): Command lines, read lazily (a file object or sys.stdin works).
+        max_workers (int): Number of threads used for runs of independent commands.
+
+    Returns:
+        Iterator[Dict[str, Any]]: One result per command, in input order.
+    """
+    group: List[Tuple[int, str]] = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        def flush():
+            results = executor.map(lambda item: run_command(session, *item), group)
+            group_results = list(results)
+            group.clear()
+            return group_results
+
+        for line_number, command in read_commands(lines):
+            if is_barrier(command):
+                yield from flush()
+                yield run_command(session, line_number, command)
+            else:
+                group.append((line_number, command))
+                if len(group) >= max_workers * GROUP_SIZE_PER_WORKER:
+                    yield from flush()
+        yield from flush()
+
+def write_json_lines(results: Iterable[Dict[str, Any]], output) -> int:
+    failures = 0
+    for result in results:
+        if not result["ok"]:
+            failures += 1
+        output.write(json.dumps(result) + "\n")
+        output.flush()
+    return failures
@@ -0,0 +1,112 @@
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+class FakeMessagesHandler(BaseHTTPRequestHandler):
+    """
+    Local stand-in for the Messages API.
+
+    Replies with a fixed number of words. Streaming replies are sent as real
+    SSE framing (message_start, content_block_delta, ping, message_delta,
+    message_stop) at the server's configured rate.
+    """
+
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without this, Nagle's algorithm
+    # adds a delayed-ACK stall to every request and swamps the client's own cost.
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _words(self):
+        return [f"word{i} " for i in range(self.server.response_tokens)]
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if self.server.first_token_delay:
+            time.sleep(self.server.first_token_delay)
+        if request.get("stream"):
+            self._stream()
+        else:
+            body = json.dumps({
+                "type": "message",
+                "role": "assistant",
+                "content": [{"type": "text", "text": "".join(self._words())}],
+                "usage": {"input_tokens": length // 4, "output_tokens": self.server.response_tokens},
+            }).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    def _send_event(self, event: str, data: dict):
+        payload = f"event: {event}\ndata: {json.dumps(data)}\n\n".encode("utf-8")
+        self.wfile.write(f"{len(payload):x}\r\n".encode("ascii") + payload + b"\r\n")
+        self.wfile.flush()
+
+    def _stream(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        self._send_event("message_start", {"type": "message_start", "message": {"usage": {"input_tokens": 0}}})
+        self._send_event("ping", {"type": "ping"})
+        interval = 1.0 / self.server.tokens_per_second if self.server.tokens_per_second else 0.0
+        for word in self._words():
+            self._send_event("content_block_delta", {"type": "content_block_delta", "index": 0,
+                                                     "delta": {"type": "text_delta", "text": word}})
+            if interval:
+                time.sleep(interval)
+        self._send_event("message_delta", {"type": "message_delta", "usage": {"output_tokens": self.server.response_tokens}})
+        self._send_event("message_stop", {"type": "message_stop"})
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+class FakeAnthropicServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, response_tokens: int = 50, tokens_per_second: float = 0.0,
+                 first_token_delay: float = 0.0):
+        super().__init__(("127.0.0.1", port), FakeMessagesHandler)
+        self.response_tokens = response_tokens
+        self.tokens_per_second = tokens_per_second
+        self.first_token_delay = first_token_delay
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1/messages"
+
+    def start(self) -> "FakeAnthropicServer":
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local stand-in for the Anthropic Messages API")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--tokens", type=int, default=50, help="words per response")
+    parser.add_argument("--rate", type=float, default=0.0, help="streamed tokens per second (0 = as fast as possible)")
+    parser.add_argument("--first-token-delay", type=float, default=0.0, help="seconds before the first byte")
+    args = parser.parse_args()
+    server = FakeAnthropicServer(args.port, args.tokens, args.rate, args.first_token_delay)
+    print(f"Fake Messages API listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
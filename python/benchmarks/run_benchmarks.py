@@ -0,0 +1,295 @@
+import argparse
+import fnmatch
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_anthropic_server import FakeAnthropicServer
+
+BENCHMARKS: Dict[str, Callable[[argparse.Namespace, str], Dict[str, Any]]] = {}
+
+# Results are written with sorted keys and rounded numbers so runs diff cleanly.
+PRECISION = 6
+
+def benchmark(name: str):
+    def decorator(func):
+        BENCHMARKS[name] = func
+        return func
+    return decorator
+
+def measure(func: Callable[[], Any], repeat: int) -> Dict[str, Any]:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return {"median_s": statistics.median(timings), "min_s": min(timings), "runs": repeat}
+
+def make_tree(root: str, file_count: int, files_per_dir: int = 100) -> List[str]:
+    paths = []
+    for i in range(file_count):
+        directory = os.path.join(root, f"pkg{i // (files_per_dir * 10)}", f"mod{(i // files_per_dir) % 10}")
+        if i % files_per_dir == 0:
+            os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"file{i}.py")
+        with open(path, 'w') as f:
+            f.write(f"import os\n\nclass Model{i}:\n    def run(self):\n        return {i}\n\ndef helper_{i}():\n    return Model{i}()\n")
+        paths.append(path)
+    return paths
+
+def make_module(function_count: int) -> str:
+    lines = ["import os", "import sys", "from typing import List"]
+    for i in range(function_count):
+        lines.append(f"CONSTANT_{i} = {i}")
+        lines.append(f"class Class{i}:")
+        lines.append("    def method(self, value):")
+        lines.append(f"        total = value + {i}")
+        lines.append("        return total")
+        lines.append(f"def function_{i}(items: List[int]) -> int:")
+        lines.append("    result = 0")
+        lines.append("    for item in items:")
+        lines.append("        result += item")
+        lines.append("    return result")
+    return "\n".join(lines) + "\n"
+
+def make_text(size: int) -> str:
+    sentences = [
+        "John Smith works for Acme Corporation in New York.",
+        "The quick brown fox jumps over the lazy dog.",
+        "Marie Curie was born in Warsaw and later moved to Paris.",
+        "Natural language processing turns text into structured data.",
+    ]
+    rng = random.Random(0)
+    parts, length = [], 0
+    while length < size:
+        sentence = rng.choice(sentences)
+        parts.append(sentence)
+        length += len(sentence) + 1
+    return " ".join(parts)
+
+@benchmark("api.send")
+def bench_api_send(args, workdir):
+    from api_client import AnthropicAPIClient
+    from request_scheduler import RequestScheduler
+    server = FakeAnthropicServer(response_tokens=args.response_tokens).start()
+    try:
+        client = AnthropicAPIClient(api_url=server.url, scheduler=RequestScheduler(0, 0))
+        client.send_message("warm up", "system", [])
+        result = measure(lambda: [client.send_message(f"prompt {i}", "system", []) for i in range(args.requests)], args.repeat)
+        result["per_request_s"] = result["median_s"] / args.requests
+        return result
+    finally:
+        server.stop()
+
+@benchmark("api.stream")
+def bench_api_stream(args, workdir):
+    from api_client import AnthropicAPIClient
+    from request_scheduler import RequestScheduler
+    server = FakeAnthropicServer(response_tokens=args.response_tokens, tokens_per_second=args.stream_rate).start()
+    try:
+        client = AnthropicAPIClient(api_url=server.url, scheduler=RequestScheduler(0, 0))
+        first_token_times = []
+
+        def run():
+            for i in range(args.requests):
+                for _ in client.stream_message(f"prompt {i}", "system", []):
+                    pass
+                first_token_times.append(client.last_stream_metrics["time_to_first_token"])
+
+        result = measure(run, args.repeat)
+        result["per_request_s"] = result["median_s"] / args.requests
+        result["time_to_first_token_s"] = statistics.median(first_token_times)
+        return result
+    finally:
+        server.stop()
+
+def _file_benchmarks(size: int):
+    def list_bench(args, workdir):
+        from file_utils import list_files
+        root = _tree(workdir, size)
+        return measure(lambda: list_files(root, recursive=True), args.repeat)
+
+    def list_cold_bench(args, workdir):
+        from file_tree import directory_cache
+        from file_utils import list_files
+        root = _tree(workdir, size)
+        return measure(lambda: (directory_cache.clear(), list_files(root, recursive=True)), args.repeat)
+
+    def read_bench(args, workdir):
+        from file_utils import read_file
+        root = _tree(workdir, size)
+        sample = _TREES[root][:args.sample]
+        return measure(lambda: [read_file(path) for path in sample], args.repeat)
+
+    def parse_bench(args, workdir):
+        from file_utils import parse_file
+        root = _tree(workdir, size)
+        sample = _TREES[root][:args.sample]
+        errors = []
+        result = measure(lambda: errors.append(sum("error" in parse_file(path) for path in sample)), args.repeat)
+        result["errors"] = errors[-1]
+        return result
+
+    benchmark(f"file.list.{size}")(list_bench)
+    benchmark(f"file.list_cold.{size}")(list_cold_bench)
+    benchmark(f"file.read.{size}")(read_bench)
+    benchmark(f"file.parse.{size}")(parse_bench)
+
+_TREES: Dict[str, List[str]] = {}
+
+def _tree(workdir: str, size: int) -> str:
+    root = os.path.join(workdir, f"tree{size}")
+    if root not in _TREES:
+        _TREES[root] = make_tree(root, size)
+    return root
+
+for _size in (1000, 10000, 100000):
+    _file_benchmarks(_size)
+
+@benchmark("code.analyze")
+def bench_analyze(args, workdir):
+    from code_analyzer import analyze_code
+    path = os.path.join(workdir, "large_module.py")
+    with open(path, 'w') as f:
+        f.write(make_module(args.module_functions))
+    return measure(lambda: analyze_code(path), args.repeat)
+
+@benchmark("nlp.pipeline")
+def bench_nlp(args, workdir):
+    from config import NLTK_DATA_PATH
+    from download_nltk_data import REQUIRED_NLTK_DATA
+    from nlp_processor import NLPProcessor
+    # Check for the data directly so a missing install does not trigger download attempts. The
+    # application's data directory is used, so the benchmark measures what the assistant loads.
+    if not all(os.path.exists(os.path.join(NLTK_DATA_PATH, file_path)) for file_path, _ in REQUIRED_NLTK_DATA):
+        return {"skipped": "NLTK data is not available"}
+    nlp = NLPProcessor(data_dir=NLTK_DATA_PATH)
+    text = make_text(args.text_bytes)
+    result = measure(lambda: nlp.ner(text), args.repeat)
+    result["bytes"] = len(text)
+    return result
+
+@benchmark("nlp.batch")
+def bench_nlp_batch(args, workdir):
+    from config import NLTK_DATA_PATH
+    from download_nltk_data import REQUIRED_NLTK_DATA
+    from nlp_processor import NLPProcessor
+    if not all(os.path.exists(os.path.join(NLTK_DATA_PATH, file_path)) for file_path, _ in REQUIRED_NLTK_DATA):
+        return {"skipped": "NLTK data is not available"}
+    nlp = NLPProcessor(data_dir=NLTK_DATA_PATH)
+    # Many small documents, as in a corpus of messages or transcripts
+    documents = [make_text(2000) for _ in range(max(1, args.text_bytes // 2000))]
+    try:
+        result = measure(lambda: sum(1 for _ in nlp.process_documents(documents, "ner")), args.repeat)
+    finally:
+        nlp.close()
+    result["bytes"] = sum(map(len, documents))
+    return result
+
+@benchmark("memory.100k")
+def bench_memory(args, workdir):
+    from memory_manager import MemoryManager
+    path = os.path.join(workdir, "memory.json")
+    with open(path, 'w') as f:
+        json.dump({f"key{i}": f"value {i}" for i in range(100000)}, f)
+    manager = MemoryManager(storage_file=path)
+    keys = [f"key{i}" for i in range(100000)]
+    return {
+        "load": measure(manager.load_memory, args.repeat),
+        "retrieve_all": measure(lambda: [manager.retrieve(key) for key in keys], args.repeat),
+        "store_10": measure(lambda: [manager.store(f"new{i}", "value") for i in range(10)], args.repeat),
+    }
+
+def _round(value: Any) -> Any:
+    if isinstance(value, float):
+        return round(value, PRECISION)
+    if isinstance(value, dict):
+        return {key: _round(item) for key, item in value.items()}
+    return value
+
+def _flatten(results: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            if "median_s" in value:
+                flat[name] = value["median_s"]
+            else:
+                flat.update(_flatten(value, f"{name}."))
+    return flat
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> int:
+    current, previous = _flatten(results), _flatten(baseline.get("results", {}))
+    regressions = 0
+    print(f"{'benchmark':<32} {'baseline s':>12} {'current s':>12} {'change':>8}")
+    for name in sorted(set(current) & set(previous)):
+        change = (current[name] - previous[name]) / previous[name] if previous[name] else 0.0
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        print(f"{name:<32} {previous[name]:>12.6f} {current[name]:>12.6f} {change:>+7.1%}{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the assistant's benchmark suite")
+    parser.add_argument("--only", default="*", help="glob of benchmark names to run, e.g. 'file.*'")
+    parser.add_argument("--sizes", default="1000,10000", help="synthetic tree sizes to run (1000, 10000, 100000)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--requests", type=int, default=50, help="API requests per run")
+    parser.add_argument("--response-tokens", type=int, default=50)
+    parser.add_argument("--stream-rate", type=float, default=0.0, help="fake server tokens/sec (0 = unthrottled)")
+    parser.add_argument("--sample", type=int, default=500, help="files read/parsed per tree")
+    parser.add_argument("--module-functions", type=int, default=5000, help="functions in the analyzed module")
+    parser.add_argument("--text-bytes", type=int, default=200000)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="compare against a saved results file")
+    parser.add_argument("--threshold", type=float, default=0.25, help="slowdown counted as a regression")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    sizes = {int(size) for size in args.sizes.split(",") if size}
+    selected = [name for name in BENCHMARKS if fnmatch.fnmatch(name, args.only)
+                and not (name.startswith("file.") and int(name.rsplit(".", 1)[1]) not in sizes)]
+
+    workdir = tempfile.mkdtemp(prefix="assistant-bench-")
+    results = {}
+    try:
+        for name in selected:
+            print(f"Running {name}...", file=sys.stderr)
+            try:
+                results[name] = _round(BENCHMARKS[name](args, workdir))
+            except Exception as e:
+                results[name] = {"error": str(e)}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "environment": {"python": platform.python_version(), "platform": platform.platform()},
+        "results": results,
+    }
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
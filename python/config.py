@@ -6,6 +6,7 @@ load_dotenv()
 
 API_KEY = os.getenv('ANTHROPIC_API_KEY')
 API_URL = 'https://api.anthropic.com/v1/messages'
+MODEL = os.getenv('ANTHROPIC_MODEL', 'claude-2')
 
 SYSTEM_PROMPT = """You are an AI assistant with access to the user's local environment. You can perform various tasks such as reading and writing files, executing commands, analyzing code, managing tasks, processing natural language, and more. Always prioritize the user's safety and privacy."""
 
@@ -20,15 +21,84 @@ if not os.path.exists(WORKING_DIRECTORY):
 # NLP settings
 NLTK_DATA_PATH = os.getenv('NLTK_DATA_PATH', os.path.join(os.getcwd(), 'nltk_data'))
 os.environ['NLTK_DATA'] = NLTK_DATA_PATH
-
-# Check if required NLTK data is available
-required_nltk_data = ['punkt', 'averaged_perceptron_tagger', 'maxent_ne_chunker', 'words']
-for data in required_nltk_data:
-    if not os.path.exists(os.path.join(NLTK_DATA_PATH, data)):
-        print(f"Warning: Required NLTK data '{data}' not found. Please ensure it's downloaded.")
+# Required NLTK data is verified on first use by download_nltk_data.ensure_nltk_data
+# Worker processes and batch size (in characters) of the batched NLP pipeline
+NLP_WORKERS = int(os.getenv('NLP_WORKERS', str(os.cpu_count() or 1)))
+NLP_BATCH_CHARS = int(os.getenv('NLP_BATCH_CHARS', str(256 * 1024)))
+# 'nlp file' reads this much at a time, cuts longer runs without a sentence break, and logs progress this often
+NLP_FILE_READ_BYTES = int(os.getenv('NLP_FILE_READ_BYTES', str(1024 * 1024)))
+NLP_MAX_SENTENCE_CHARS = int(os.getenv('NLP_MAX_SENTENCE_CHARS', str(64 * 1024)))
+NLP_PROGRESS_SECONDS = float(os.getenv('NLP_PROGRESS_SECONDS', '5'))
 
 # Memory settings
 MEMORY_STORAGE_FILE = os.getenv('MEMORY_STORAGE_FILE', 'memory.json')
 
 # Knowledge Base settings
 KNOWLEDGE_BASE_API_URL = os.getenv('KNOWLEDGE_BASE_API_URL', 'https://api.duckduckgo.com/')
+
+# HTTP transport settings
+HTTP_POOL_CONNECTIONS = int(os.getenv('HTTP_POOL_CONNECTIONS', '4'))
+HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', '16'))
+HTTP_MAX_RETRIES = int(os.getenv('HTTP_MAX_RETRIES', '4'))
+HTTP_BACKOFF_BASE = float(os.getenv('HTTP_BACKOFF_BASE', '0.5'))
+HTTP_BACKOFF_MAX = float(os.getenv('HTTP_BACKOFF_MAX', '30'))
+# Longest Retry-After the transports wait for; a response asking for longer is returned as is
+HTTP_RETRY_AFTER_MAX = float(os.getenv('HTTP_RETRY_AFTER_MAX', '300'))
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', '10'))
+HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', '600'))
+
+# Number of prompts the async client's batch() runs at once
+ASYNC_BATCH_CONCURRENCY = int(os.getenv('ASYNC_BATCH_CONCURRENCY', '8'))
+
+# Response cache settings
+RESPONSE_CACHE_ENABLED = os.getenv('RESPONSE_CACHE_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+RESPONSE_CACHE_DIR = os.getenv('RESPONSE_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.assistant_cache', 'responses'))
+RESPONSE_CACHE_MEMORY_ENTRIES = int(os.getenv('RESPONSE_CACHE_MEMORY_ENTRIES', '256'))
+RESPONSE_CACHE_MAX_DISK_BYTES = int(os.getenv('RESPONSE_CACHE_MAX_DISK_BYTES', str(256 * 1024 * 1024)))
+
+# Conversation history settings
+CONTEXT_TOKEN_BUDGET = int(os.getenv('CONTEXT_TOKEN_BUDGET', '80000'))
+HISTORY_KEEP_RECENT_MESSAGES = int(os.getenv('HISTORY_KEEP_RECENT_MESSAGES', '6'))
+HISTORY_TRUNCATE_CHARS = int(os.getenv('HISTORY_TRUNCATE_CHARS', '2000'))
+
+# Rate limits shared by every session in the process (0, the default, disables a limit). Set them to
+# your account's limits; a request larger than the tokens/min limit is charged the whole bucket.
+RATE_LIMIT_REQUESTS_PER_MIN = int(os.getenv('RATE_LIMIT_REQUESTS_PER_MIN', '0'))
+RATE_LIMIT_TOKENS_PER_MIN = int(os.getenv('RATE_LIMIT_TOKENS_PER_MIN', '0'))
+
+# Worker threads used by batch mode for independent commands
+BATCH_MAX_WORKERS = int(os.getenv('BATCH_MAX_WORKERS', str(min(32, (os.cpu_count() or 1) * 2))))
+
+# Server mode settings
+SERVER_SOCKET_PATH = os.getenv('SERVER_SOCKET_PATH', os.path.join(os.path.expanduser('~'), '.assistant', 'server.sock'))
+SERVER_WORKERS = int(os.getenv('SERVER_WORKERS', '8'))
+SERVER_SESSION_IDLE_TIMEOUT = float(os.getenv('SERVER_SESSION_IDLE_TIMEOUT', '3600'))
+
+# Append-only session logs, used by 'resume'
+SESSION_LOG_DIR = os.getenv('SESSION_LOG_DIR', os.path.join(os.path.expanduser('~'), '.assistant', 'sessions'))
+
+# Directory listings kept by the recursive file lister
+FILE_LIST_CACHE_DIRS = int(os.getenv('FILE_LIST_CACHE_DIRS', '20000'))
+
+# Largest window 'file read' returns at once; bigger files and ranges are truncated
+FILE_READ_MAX_BYTES = int(os.getenv('FILE_READ_MAX_BYTES', str(1024 * 1024)))
+
+# Compiled tree-sitter grammars used by 'file parse'
+TREE_SITTER_LIBRARY = os.getenv('TREE_SITTER_LIBRARY', 'build/my-languages.so')
+
+# Parsed files whose symbols are kept in memory
+PARSE_CACHE_ENTRIES = int(os.getenv('PARSE_CACHE_ENTRIES', '512'))
+
+# Project indexes ('file index', 'file search') are stored here, one set per indexed directory
+INDEX_DIR = os.getenv('INDEX_DIR', os.path.join(os.path.expanduser('~'), '.assistant', 'index'))
+INDEX_WORKERS = int(os.getenv('INDEX_WORKERS', str(os.cpu_count() or 1)))
+# Files larger than this are left out of the indexes
+INDEX_MAX_FILE_BYTES = int(os.getenv('INDEX_MAX_FILE_BYTES', str(4 * 1024 * 1024)))
+# Matching lines 'file search' returns unless --limit is given
+FILE_SEARCH_MAX_RESULTS = int(os.getenv('FILE_SEARCH_MAX_RESULTS', '200'))
+
+# Relevant code attached to chat turns ('context on'): whether it starts enabled, its token budget,
+# and how many source files under the working directory are considered
+CONTEXT_PACK_ENABLED = os.getenv('CONTEXT_PACK_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+CONTEXT_PACK_TOKENS = int(os.getenv('CONTEXT_PACK_TOKENS', '4000'))
+CONTEXT_PACK_MAX_FILES = int(os.getenv('CONTEXT_PACK_MAX_FILES', '5000'))
@@ -0,0 +1,275 @@
+import ast
+import math
+import os
+import re
+import threading
+import logging
+from collections import Counter
+from typing import Dict, List, Tuple
+from config import CONTEXT_PACK_TOKENS, CONTEXT_PACK_MAX_FILES, INDEX_MAX_FILE_BYTES
+from file_reader import split_lines
+from file_tree import iter_files
+from history_manager import estimate_tokens
+from language_queries import EXTENSION_TO_LANGUAGE
+from metrics import instrument
+
+# Larger definitions are split (classes into their methods) or cut into windows of this many lines.
+CHUNK_MAX_TOKENS = 1200
+WINDOW_LINES = 60
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Added to a chunk's score when the message names its symbol or its file
+SYMBOL_MATCH_WEIGHT = 6.0
+FILE_MATCH_WEIGHT = 2.0
+
+CONTEXT_HEADER = "Code from the user's working directory that may be relevant to their message:"
+
+# Estimated tokens of a chunk's heading and code fence
+CHUNK_OVERHEAD_TOKENS = 20
+
+IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+WORD_PART = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[0-9]+")
+
+# Words too common in messages to say anything about which code is meant
+STOP_WORDS = {
+    "the", "a", "an", "and", "or", "of", "to", "in", "on", "for", "is", "are", "be", "it", "this", "that",
+    "with", "how", "what", "why", "does", "do", "can", "i", "we", "you", "me", "my", "should", "would",
+    "when", "where", "which", "there", "from", "as", "at", "by", "not", "if", "into", "about", "please",
+}
+
+def terms(text: str) -> List[str]:
+    """Split text into lower-case search terms: each identifier whole, plus its snake_case and camelCase parts."""
+    result = []
+    for identifier in IDENTIFIER.findall(text):
+        lowered = identifier.lower()
+        result.append(lowered)
+        parts = [part.lower() for part in WORD_PART.findall(identifier)]
+        if len(parts) > 1:
+            result.extend(part for part in parts if len(part) > 1)
+    return result
+
+class Chunk:
+    """A function-, class- or window-sized piece of a file, with its term counts for ranking."""
+
+    __slots__ = ("path", "start", "end", "kind", "name", "text", "tokens", "term_counts", "length")
+
+    def __init__(self, path: str, start: int, end: int, kind: str, name: str, text: str):
+        self.path = path
+        self.start = start
+        self.end = end
+        self.kind = kind
+        self.name = name
+        self.text = text
+        self.tokens = estimate_tokens(text)
+        self.term_counts = Counter(terms(text))
+        self.length = sum(self.term_counts.values())
+
+def _window_chunks(path: str, lines: List[str], start: int, end: int, kind: str, name: str) -> List[Chunk]:
+    """Chunks for lines start..end (1-based, inclusive), cut into windows if the span is too large."""
+    text = "".join(lines[start - 1:end])
+    if estimate_tokens(text) <= CHUNK_MAX_TOKENS:
+        return [Chunk(path, start, end, kind, name, text)] if text.strip() else []
+    chunks = []
+    for first in range(start, end + 1, WINDOW_LINES):
+        last = min(first + WINDOW_LINES - 1, end)
+        text = "".join(lines[first - 1:last])
+        if text.strip():
+            chunks.append(Chunk(path, first, last, kind, name, text))
+    return chunks
+
+def _definition_start(node: ast.AST) -> int:
+    decorators = getattr(node, "decorator_list", None)
+    return min([node.lineno] + [decorator.lineno for decorator in decorators]) if decorators else node.lineno
+
+def python_chunks(path: str, source: str) -> List[Chunk]:
+    """
+    python_chunks function
+
+    Parameters:
+        path (str): The file's path, as reported in the chunks.
+        source (str): Its Python source.
+
+    Returns:
+        List[Chunk]: One chunk per top-level function and class, with oversized classes split into their
+        methods, plus chunks for the module-level code between them. Raises SyntaxError for invalid code.
+    """
+    lines = split_lines(source)
+    chunks: List[Chunk] = []
+    position = 1
+
+    def add_definitions(body: List[ast.stmt], prefix: str, end_of_body: int):
+        nonlocal position
+        for node in body:
+            if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                continue
+            start, end = _definition_start(node), node.end_lineno
+            if start > position:
+                chunks.extend(_window_chunks(path, lines, position, start - 1, "module" if not prefix else "class",
+                                             prefix.rstrip(".") or "<module>"))
+            kind = "class" if isinstance(node, ast.ClassDef) else ("method" if prefix else "function")
+            name = prefix + node.name
+            text = "".join(lines[start - 1:end])
+            if kind == "class" and estimate_tokens(text) > CHUNK_MAX_TOKENS:
+                position = start
+                add_definitions(node.body, name + ".", end)
+                if position <= end:
+                    chunks.extend(_window_chunks(path, lines, position, end, "class", name))
+            else:
+                chunks.extend(_window_chunks(path, lines, start, end, kind, name))
+            position = end + 1
+        if position <= end_of_body and not prefix:
+            chunks.extend(_window_chunks(path, lines, position, end_of_body, "module", "<module>"))
+            position = end_of_body + 1
+
+    add_definitions(ast.parse(source).body, "", len(lines))
+    return chunks
+
+def symbol_chunks(path: str, source: str) -> List[Chunk]:
+    """Chunks for a file parse_symbols supports: its outermost definitions, or line windows if it cannot be parsed."""
+    lines = split_lines(source)
+    try:
+        from parser_registry import parse_symbols
+        definitions = [symbol for symbol in parse_symbols(path) if symbol["kind"] in ("class", "function", "method")]
+    except Exception as e:
+        logging.debug(f"Chunking {path} by lines: {str(e)}")
+        definitions = []
+    chunks: List[Chunk] = []
+    covered = 0
+    for symbol in sorted(definitions, key=lambda symbol: (symbol["line"], -symbol["end_line"])):
+        if symbol["line"] <= covered:
+            continue
+        chunks.extend(_window_chunks(path, lines, symbol["line"], symbol["end_line"], symbol["kind"], symbol["name"]))
+        covered = symbol["end_line"]
+    if not chunks:
+        chunks = _window_chunks(path, lines, 1, len(lines), "file", os.path.basename(path))
+    return chunks
+
+class ContextPacker:
+    """
+    Picks the code under a directory most relevant to a message, within a token budget.
+
+    Files are split into function- and class-level chunks (kept in memory
+    until the file's mtime or size changes). Chunks are ranked by BM25 over
+    identifiers and their parts, plus a bonus when the message names the
+    chunk's symbol or file, and the best are packed greedily into the budget.
+    """
+
+    def __init__(self, max_files: int = CONTEXT_PACK_MAX_FILES):
+        self.max_files = max_files
+        self._files: Dict[str, Tuple[Tuple[int, int], List[Chunk]]] = {}
+        self._lock = threading.Lock()
+
+    def chunks(self, root: str) -> List[Chunk]:
+        """Return the chunks of the supported source files under root, re-chunking only changed files."""
+        root = os.path.abspath(root)
+        include = [f"*{extension}" for extension in EXTENSION_TO_LANGUAGE]
+        result: List[Chunk] = []
+        with self._lock:
+            for count, relative in enumerate(iter_files(root, recursive=True, include=include)):
+                if count == self.max_files:
+                    logging.warning(f"Context packing looked at the first {self.max_files} source files under {root} only")
+                    break
+                path = os.path.join(root, relative)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                if st.st_size > INDEX_MAX_FILE_BYTES:
+                    continue
+                key = (st.st_mtime_ns, st.st_size)
+                cached = self._files.get(path)
+                if cached is None or cached[0] != key:
+                    cached = self._files[path] = (key, self._chunk_file(path))
+                result.extend(cached[1])
+        return result
+
+    def _chunk_file(self, path: str) -> List[Chunk]:
+        try:
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                source = f.read()
+        except OSError:
+            return []
+        if path.endswith(".py"):
+            try:
+                return python_chunks(path, source)
+            except (SyntaxError, ValueError, RecursionError):
+                lines = split_lines(source)
+                return _window_chunks(path, lines, 1, len(lines), "file", os.path.basename(path))
+        return symbol_chunks(path, source)
+
+    def rank(self, message: str, chunks: List[Chunk]) -> List[Tuple[float, Chunk]]:
+        """
+        rank function
+
+        Parameters:
+            message (str): The user's message.
+            chunks (List[Chunk]): Candidate chunks.
+
+        Returns:
+            List[Tuple[float, Chunk]]: (score, chunk) pairs with a positive score, best first.
+        """
+        query = [term for term in set(terms(message)) if term not in STOP_WORDS]
+        if not query or not chunks:
+            return []
+        named = {identifier.lower() for identifier in IDENTIFIER.findall(message)} - STOP_WORDS
+        average_length = sum(chunk.length for chunk in chunks) / len(chunks) or 1.0
+        idf = {}
+        for term in query:
+            frequency = sum(1 for chunk in chunks if term in chunk.term_counts)
+            if frequency:
+                idf[term] = math.log(1 + (len(chunks) - frequency + 0.5) / (frequency + 0.5))
+
+        ranked = []
+        for chunk in chunks:
+            score = 0.0
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * chunk.length / average_length)
+            for term, weight in idf.items():
+                count = chunk.term_counts.get(term)
+                if count:
+                    score += weight * count * (BM25_K1 + 1) / (count + norm)
+            if chunk.name.rsplit(".", 1)[-1].lower() in named or chunk.name.lower() in named:
+                score += SYMBOL_MATCH_WEIGHT
+            if os.path.splitext(os.path.basename(chunk.path))[0].lower() in named:
+                score += FILE_MATCH_WEIGHT
+            if score > 0:
+                ranked.append((score, chunk))
+        ranked.sort(key=lambda item: -item[0])
+        return ranked
+
+    @instrument("context.pack")
+    def pack(self, message: str, root: str, token_budget: int = CONTEXT_PACK_TOKENS) -> str:
+        """
+        pack function
+
+        Parameters:
+            message (str): The user's message.
+            root (str): The directory whose code is considered.
+            token_budget (int): Upper bound on the estimated tokens of the result.
+
+        Returns:
+            str: The best-ranked chunks that fit the budget, grouped by file in source order, each headed
+            by its path and lines; an empty string when nothing in the code matches the message.
+        """
+        root = os.path.abspath(root)
+        selected: List[Chunk] = []
+        remaining = token_budget - estimate_tokens(CONTEXT_HEADER)
+        for _, chunk in self.rank(message, self.chunks(root)):
+            cost = chunk.tokens + CHUNK_OVERHEAD_TOKENS
+            if cost <= remaining:
+                selected.append(chunk)
+                remaining -= cost
+            if remaining < CHUNK_OVERHEAD_TOKENS * 2:
+                break
+        if not selected:
+            return ""
+        selected.sort(key=lambda chunk: (chunk.path, chunk.start))
+        sections = [CONTEXT_HEADER]
+        for chunk in selected:
+            relative = os.path.relpath(chunk.path, root)
+            language = EXTENSION_TO_LANGUAGE.get(os.path.splitext(chunk.path)[1], "")
+            sections.append(f"{relative} lines {chunk.start}-{chunk.end} ({chunk.kind} {chunk.name}):\n"
+                            f"```{language}\n{chunk.text.rstrip()}\n```")
+        return "\n\n".join(sections)
@@ -0,0 +1,72 @@
+import gzip
+import json
+import os
+import logging
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional
+
+EXPORT_FORMATS = ("markdown", "jsonl")
+EXPORT_BUFFER_SIZE = 1 << 20
+
+def detect_format(file_path: str) -> str:
+    base = file_path[:-3] if file_path.endswith(".gz") else file_path
+    return "jsonl" if base.endswith((".jsonl", ".json")) else "markdown"
+
+def render_messages(messages: Iterable[Dict[str, str]], export_format: str) -> Iterator[str]:
+    if export_format == "jsonl":
+        for message in messages:
+            yield json.dumps({"role": message["role"], "content": message["content"]}, ensure_ascii=False) + "\n"
+    else:
+        for message in messages:
+            yield f"# {message['role'].capitalize()}\n\n{message['content']}\n\n"
+
+def open_export_file(file_path: str, append: bool):
+    mode = 'a' if append else 'w'
+    if file_path.endswith(".gz"):
+        # Appending to a gzip file adds a new member; readers decompress members back to back.
+        return gzip.open(file_path, mode + 't', compresslevel=6, encoding='utf-8')
+    return open(file_path, mode, encoding='utf-8', buffering=EXPORT_BUFFER_SIZE)
+
+class ConversationExporter:
+    """
+    Streaming conversation export to markdown or JSON lines, gzip-compressed for '.gz' paths.
+
+    Messages are rendered lazily through a large buffered writer. With
+    incremental export, only messages added since the last export to the
+    same path are appended.
+    """
+
+    def __init__(self):
+        self._exported: Dict[str, int] = {}
+
+    def export(self, messages: List[Dict[str, str]], file_path: str,
+               export_format: Optional[str] = None, incremental: bool = False) -> str:
+        """
+        export function
+
+        Parameters:
+            messages (List[Dict[str, str]]): The conversation to export.
+            file_path (str): Destination path. A '.gz' suffix enables gzip compression.
+            export_format (Optional[str]): 'markdown' or 'jsonl'. Detected from the path when omitted.
+            incremental (bool): Append only the messages added since the last export to this path.
+
+        Returns:
+            str: A success message or an error message if something goes wrong.
+        """
+        export_format = export_format or detect_format(file_path)
+        if export_format not in EXPORT_FORMATS:
+            return f"Error exporting conversation: unknown format '{export_format}'. Use {' or '.join(EXPORT_FORMATS)}."
+        key = os.path.abspath(file_path)
+        start = self._exported.get(key, 0) if incremental and os.path.exists(file_path) else 0
+        if start > len(messages):
+            # The conversation was replaced (e.g. by resume) since the last export; write it out again.
+            start = 0
+        try:
+            with open_export_file(file_path, append=start > 0) as f:
+                f.writelines(render_messages(islice(messages, start, None), export_format))
+        except Exception as e:
+            logging.error(f"Error exporting conversation to {file_path}: {str(e)}")
+            return f"Error exporting conversation: {str(e)}"
+        self._exported[key] = len(messages)
+        written = len(messages) - start
+        return f"Conversation exported to {file_path} ({written} messages{' appended' if start else ''}, {export_format})"
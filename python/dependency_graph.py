@@ -0,0 +1,212 @@
+import json
+import os
+import time
+from collections import defaultdict, deque
+from typing import Any, Dict, Iterable, List, Optional, Set
+from code_analyzer import ProjectAnalysis
+from config import INDEX_WORKERS
+from metrics import instrument
+from symbol_index import index_location, open_index
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS modules (
+    path TEXT PRIMARY KEY,
+    imports TEXT NOT NULL,
+    deps TEXT NOT NULL
+);
+"""
+
+def module_names(relative: str) -> List[str]:
+    """Return the dotted names a file can be imported as, from its full path down to its own name."""
+    parts = relative[:-3].split("/")
+    if parts[-1] == "__init__":
+        parts.pop()
+    return [".".join(parts[i:]) for i in range(len(parts))]
+
+class ModuleResolver:
+    """
+    Maps import names to files of the project.
+
+    Absolute imports are matched against every file's dotted path and its
+    suffixes, so modules imported relative to a source directory (python/,
+    src/) resolve too; where several files match, the one nearest the
+    importing file wins. Relative imports resolve against the importer's
+    package directory.
+    """
+
+    def __init__(self, paths: Iterable[str]):
+        self.paths = set(paths)
+        self.by_name: Dict[str, List[str]] = defaultdict(list)
+        for path in self.paths:
+            for name in module_names(path):
+                self.by_name[name].append(path)
+
+    def _nearest(self, candidates: List[str], importer: str) -> str:
+        directory = os.path.dirname(importer)
+
+        def shared(path: str) -> int:
+            common = os.path.commonpath([directory, os.path.dirname(path)])
+            return len(common.split("/")) if common else 0
+
+        return min(candidates, key=lambda path: (-shared(path), len(path), path))
+
+    def _module_file(self, directory: str, parts: List[str]) -> Optional[str]:
+        base = "/".join(([directory] if directory else []) + parts)
+        for candidate in (f"{base}.py", f"{base}/__init__.py"):
+            if candidate in self.paths:
+                return candidate
+        return None
+
+    def resolve(self, name: str, importer: str) -> Optional[str]:
+        """
+        resolve function
+
+        Parameters:
+            name (str): An import as analyze_code reports it: 'pkg.mod', 'pkg.mod.name' for 'from pkg.mod
+                import name', '..pkg.name' for relative imports.
+            importer (str): The importing file, relative to the project root.
+
+        Returns:
+            Optional[str]: The imported file, or None for modules outside the project. For 'from' imports the
+            name is tried as a submodule first, then the module it is imported from.
+        """
+        level = len(name) - len(name.lstrip("."))
+        parts = [part for part in name[level:].split(".") if part]
+        if level:
+            directory = os.path.dirname(importer)
+            for _ in range(level - 1):
+                directory = os.path.dirname(directory)
+            for end in range(len(parts), -1, -1):
+                found = self._module_file(directory, parts[:end])
+                if found and found != importer:
+                    return found
+            return None
+        for end in range(len(parts), 0, -1):
+            candidates = [path for path in self.by_name.get(".".join(parts[:end]), ()) if path != importer]
+            if candidates:
+                return self._nearest(candidates, importer)
+        return None
+
+class DependencyGraph:
+    """
+    Import dependencies between the Python files under a directory.
+
+    Edges are kept in SQLite and loaded into forward and reverse maps, so
+    dependency and reverse-dependency lookups are dictionary lookups.
+    update() takes imports from the content-hash cache of ProjectAnalysis
+    and only re-resolves the edges of files whose imports changed, or of
+    every file when files were added or removed.
+    """
+
+    def __init__(self, root: str, db_path: Optional[str] = None):
+        self.root = os.path.abspath(root)
+        self.db_path = db_path or index_location(self.root, "deps")
+        self.connection = open_index(self.db_path, SCHEMA)
+        self.imports: Dict[str, List[str]] = {}
+        self.forward: Dict[str, Set[str]] = {}
+        self.reverse: Dict[str, Set[str]] = defaultdict(set)
+        for path, imports, deps in self.connection.execute("SELECT path, imports, deps FROM modules"):
+            self.imports[path] = json.loads(imports)
+            self.forward[path] = set(json.loads(deps))
+        for path, deps in self.forward.items():
+            for dep in deps:
+                self.reverse[dep].add(path)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _set_deps(self, path: str, deps: Set[str]):
+        for dep in self.forward.get(path, ()):
+            self.reverse[dep].discard(path)
+        self.forward[path] = deps
+        for dep in deps:
+            self.reverse[dep].add(path)
+
+    @instrument("code.deps.update")
+    def update(self, workers: int = INDEX_WORKERS) -> Dict[str, Any]:
+        """
+        update function
+
+        Parameters:
+            workers (int): Processes used to analyze changed files.
+
+        Returns:
+            Dict[str, Any]: Counts of files, files whose edges were recomputed, files removed and files that
+            could not be parsed (they keep no edges), and the time taken.
+        """
+        start = time.perf_counter()
+        current: Dict[str, List[str]] = {}
+        errors = 0
+        with ProjectAnalysis(self.root) as project:
+            for relative, analysis in project.results(workers):
+                if "error" in analysis:
+                    errors += 1
+                current[relative] = analysis.get("imports", [])
+
+        removed = set(self.imports) - set(current)
+        # A new or removed file can change what any import resolves to.
+        structure_changed = bool(removed) or any(path not in self.imports for path in current)
+        changed = [path for path in current if structure_changed or self.imports.get(path) != current[path]]
+        resolver = ModuleResolver(current)
+        with self.connection:
+            for path in removed:
+                self._set_deps(path, set())
+                del self.forward[path]
+                del self.imports[path]
+                self.connection.execute("DELETE FROM modules WHERE path = ?", (path,))
+            for path in changed:
+                deps = {dep for dep in (resolver.resolve(name, path) for name in current[path]) if dep}
+                if self.imports.get(path) == current[path] and self.forward.get(path) == deps:
+                    continue
+                self.imports[path] = current[path]
+                self._set_deps(path, deps)
+                self.connection.execute("INSERT OR REPLACE INTO modules (path, imports, deps) VALUES (?, ?, ?)",
+                                        (path, json.dumps(current[path]), json.dumps(sorted(deps))))
+        return {"files": len(current), "recomputed": len(changed), "removed": len(removed), "errors": errors,
+                "seconds": time.perf_counter() - start}
+
+    def dependencies(self, path: str, transitive: bool = False) -> Dict[str, int]:
+        """
+        dependencies function
+
+        Parameters:
+            path (str): A file relative to the root.
+            transitive (bool): Include indirect dependencies.
+
+        Returns:
+            Dict[str, int]: The files path imports, each with its distance in imports (1 for direct ones).
+        """
+        return self._closure(path, self.forward, transitive)
+
+    def dependents(self, path: str, transitive: bool = False) -> Dict[str, int]:
+        """
+        dependents function
+
+        Parameters:
+            path (str): A file relative to the root.
+            transitive (bool): Include indirect dependents.
+
+        Returns:
+            Dict[str, int]: The files that import path, each with its distance in imports (1 for direct ones).
+            These are the files an edit to path can affect.
+        """
+        return self._closure(path, self.reverse, transitive)
+
+    def _closure(self, path: str, edges: Dict[str, Set[str]], transitive: bool) -> Dict[str, int]:
+        distances: Dict[str, int] = {}
+        queue = deque([(path, 0)])
+        while queue:
+            node, distance = queue.popleft()
+            if distance and not transitive:
+                break
+            for neighbour in edges.get(node, ()):
+                if neighbour != path and neighbour not in distances:
+                    distances[neighbour] = distance + 1
+                    queue.append((neighbour, distance + 1))
+        return distances
@@ -1,4 +1,4 @@
-import nltk
+import json
 import os
 import ssl
 import logging
@@ -16,15 +16,32 @@ else:
 
 # Set NLTK data path
 nltk_data_dir = os.path.expanduser("~/nltk_data")
-nltk.data.path.append(nltk_data_dir)
 
-def download_nltk_data():
-    packages = ['punkt', 'averaged_perceptron_tagger', 'maxent_ne_chunker', 'words']
-    
-    logging.info(f"NLTK data directory: {nltk_data_dir}")
+NLTK_PACKAGES = ['punkt', 'averaged_perceptron_tagger', 'maxent_ne_chunker', 'words']
+
+REQUIRED_NLTK_DATA = [
+    ('tokenizers/punkt/english.pickle', 'punkt'),
+    ('taggers/averaged_perceptron_tagger/averaged_perceptron_tagger.pickle', 'averaged_perceptron_tagger'),
+    ('chunkers/maxent_ne_chunker/PY3/english_ace_binary.pickle', 'maxent_ne_chunker'),
+    ('corpora/words/en', 'words')
+]
+
+# Written into the data directory once every required package has been verified.
+STAMP_FILE = '.assistant_nltk_verified.json'
+
+def _use_data_dir(data_dir: str):
+    import nltk
+    if data_dir not in nltk.data.path:
+        nltk.data.path.insert(0, data_dir)
+
+def download_nltk_data(data_dir: str = nltk_data_dir):
+    import nltk
+    _use_data_dir(data_dir)
+
+    logging.info(f"NLTK data directory: {data_dir}")
     logging.info(f"Current NLTK data path: {nltk.data.path}")
 
-    for package in packages:
+    for package in NLTK_PACKAGES:
         logging.info(f"Checking {package}...")
         try:
             nltk.data.find(f"{package}")
@@ -32,7 +49,7 @@ def download_nltk_data():
         except LookupError:
             logging.info(f" Downloading {package}...")
             try:
-                nltk.download(package, download_dir=nltk_data_dir, quiet=False)
+                nltk.download(package, download_dir=data_dir, quiet=False)
             except Exception as e:
                 logging.error(f" Failed to download {package}: {str(e)}")
                 continue
@@ -46,12 +63,59 @@ def download_nltk_data():
 
     # Final verification
     logging.info("Final verification of all packages:")
-    for package in packages:
+    for package in NLTK_PACKAGES:
         try:
             nltk.data.find(f"{package}")
             logging.info(f" {package} is available")
         except LookupError:
             logging.error(f" {package} is not available")
 
+def _resource_mtimes(data_dir: str):
+    mtimes = {}
+    for file_path, package_name in REQUIRED_NLTK_DATA:
+        try:
+            mtimes[file_path] = os.stat(os.path.join(data_dir, file_path)).st_mtime
+        except OSError:
+            return None
+    return mtimes
+
+def _stamp_is_valid(data_dir: str) -> bool:
+    try:
+        with open(os.path.join(data_dir, STAMP_FILE), 'r') as f:
+            stamp = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return False
+    return stamp.get("packages") == NLTK_PACKAGES and stamp.get("resources") == _resource_mtimes(data_dir)
+
+def ensure_nltk_data(data_dir: str = nltk_data_dir) -> bool:
+    """
+    ensure_nltk_data function
+
+    Parameters:
+        data_dir (str): The NLTK data directory to use and download into.
+
+    Returns:
+        bool: True if every required package is available. A stamp file records a successful
+        verification, so later calls only stat the required files.
+    """
+    if _stamp_is_valid(data_dir):
+        _use_data_dir(data_dir)
+        return True
+
+    download_nltk_data(data_dir)
+    resources = _resource_mtimes(data_dir)
+    if resources is None:
+        missing = [package for file_path, package in REQUIRED_NLTK_DATA if not os.path.exists(os.path.join(data_dir, file_path))]
+        logging.warning(f"The following NLTK data packages are missing: {', '.join(missing)}")
+        return False
+
+    try:
+        with open(os.path.join(data_dir, STAMP_FILE), 'w') as f:
+            json.dump({"packages": NLTK_PACKAGES, "resources": resources}, f)
+    except OSError as e:
+        logging.warning(f"Could not write NLTK verification stamp: {str(e)}")
+    logging.info("All required NLTK data packages are available.")
+    return True
+
 if __name__ == "__main__":
-    download_nltk_data()
\ No newline at end of file
+    download_nltk_data()
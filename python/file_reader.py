@@ -0,0 +1,260 @@
+import codecs
+import mmap
+import os
+import threading
+from array import array
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+from config import FILE_READ_MAX_BYTES
+
+# Bytes examined to detect binary content and the text encoding
+SNIFF_BYTES = 64 * 1024
+
+# Shorter non-UTF-8 samples are too small for a reliable charset guess and are read as latin-1
+MIN_DETECTION_BYTES = 512
+
+# The newline index records how many newlines precede each block of this size
+INDEX_BLOCK_SIZE = 1 << 20
+
+# Newline indexes kept for recently read files
+INDEX_CACHE_FILES = 64
+
+BOMS = (
+    (codecs.BOM_UTF32_LE, "utf-32-le"),
+    (codecs.BOM_UTF32_BE, "utf-32-be"),
+    (codecs.BOM_UTF8, "utf-8"),
+    (codecs.BOM_UTF16_LE, "utf-16-le"),
+    (codecs.BOM_UTF16_BE, "utf-16-be"),
+)
+
+def split_lines(text: str) -> List[str]:
+    """
+    Split text into lines at "\n" only, keeping each line's ending.
+
+    Unlike str.splitlines, form feeds, \x1c-\x1e, \x85 and \u2028 stay inside their line, so line
+    numbers agree with editors, diffs and the ast module.
+    """
+    lines = text.split("\n")
+    result = [line + "\n" for line in lines[:-1]]
+    if lines[-1]:
+        result.append(lines[-1])
+    return result
+
+def is_binary(sample: bytes, encoding: Optional[str] = None) -> bool:
+    """A NUL byte in text that is not UTF-16/32 marks the file as binary."""
+    if encoding and encoding.startswith(("utf-16", "utf-32")):
+        return False
+    return b"\x00" in sample
+
+def sniff_encoding(sample: bytes) -> Tuple[str, int]:
+    """
+    sniff_encoding function
+
+    Parameters:
+        sample (bytes): The first bytes of a file.
+
+    Returns:
+        Tuple[str, int]: The encoding and the length of its byte order mark, if any. Files without
+        a BOM are UTF-8 when they decode as such, otherwise the guess of charset_normalizer when it
+        is installed and the sample is large enough, otherwise latin-1.
+    """
+    for bom, encoding in BOMS:
+        if sample.startswith(bom):
+            return encoding, len(bom)
+    try:
+        # The sample may end inside a multi-byte character, so decode it incrementally.
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+        return "utf-8", 0
+    except UnicodeDecodeError:
+        pass
+    if len(sample) < MIN_DETECTION_BYTES:
+        return "latin-1", 0
+    try:
+        from charset_normalizer import from_bytes
+    except ImportError:
+        return "latin-1", 0
+    best = from_bytes(sample).best()
+    return (best.encoding if best else "latin-1"), 0
+
+class NewlineIndex:
+    """
+    Cumulative newline counts at fixed block boundaries of a file.
+
+    The index is extended lazily, only as far as the lines requested so far,
+    so reading near the start of a huge file scans only its first blocks.
+    Finding a line then scans a single block.
+    """
+
+    def __init__(self, size: int, newline: bytes, data_start: int):
+        self.size = size
+        self.newline = newline
+        self.data_start = data_start
+        self.counts = array("Q", [0])
+        self._lock = threading.Lock()
+
+    def _extend(self, mm, newlines: int):
+        with self._lock:
+            self._extend_locked(mm, newlines)
+
+    def _extend_locked(self, mm, newlines: int):
+        while self.counts[-1] < newlines and (len(self.counts) - 1) * INDEX_BLOCK_SIZE < self.size:
+            start = (len(self.counts) - 1) * INDEX_BLOCK_SIZE
+            self.counts.append(self.counts[-1] + mm[start:start + INDEX_BLOCK_SIZE].count(self.newline))
+
+    def line_start(self, mm, line: int) -> Optional[int]:
+        """Return the byte offset where a 1-based line starts, or None past the end of the file."""
+        if line <= 1:
+            return self.data_start
+        target = line - 1
+        self._extend(mm, target)
+        if self.counts[-1] < target:
+            return None
+        # The block holding the target newline is the last one starting with fewer newlines before it.
+        lo, hi = 0, len(self.counts) - 1
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if self.counts[mid] < target:
+                lo = mid
+            else:
+                hi = mid - 1
+        position = lo * INDEX_BLOCK_SIZE
+        for _ in range(target - self.counts[lo]):
+            position = mm.find(self.newline, position) + len(self.newline)
+        return position if position < self.size else None
+
+class MappedTextFile:
+    """A read-only memory map of a file with its encoding, binary flag and shared newline index."""
+
+    _indexes: "OrderedDict[str, Tuple[Tuple[int, int], NewlineIndex]]" = OrderedDict()
+    _lock = threading.Lock()
+
+    def __init__(self, file_path: str):
+        self.path = os.path.abspath(file_path)
+        self._file = open(self.path, 'rb')
+        st = os.fstat(self._file.fileno())
+        self.size = st.st_size
+        self._key = (st.st_mtime_ns, st.st_size)
+        # Empty files cannot be mapped; an empty bytes object serves the same reads.
+        self.mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b""
+        sample = self.mm[:SNIFF_BYTES]
+        self.encoding, self.data_start = sniff_encoding(sample)
+        self.binary = is_binary(sample, self.encoding)
+        self.newline = "\n".encode(self.encoding)
+
+    def close(self):
+        if self.size:
+            self.mm.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def index(self) -> NewlineIndex:
+        cls = MappedTextFile
+        with cls._lock:
+            cached = cls._indexes.get(self.path)
+            if cached is not None and cached[0] == self._key:
+                cls._indexes.move_to_end(self.path)
+                return cached[1]
+            index = NewlineIndex(self.size, self.newline, self.data_start)
+            cls._indexes[self.path] = (self._key, index)
+            while len(cls._indexes) > INDEX_CACHE_FILES:
+                cls._indexes.popitem(last=False)
+            return index
+
+    def decode(self, start: int, end: int, max_bytes: int) -> str:
+        end = min(end, self.size)
+        truncated = end - start > max_bytes
+        if truncated:
+            end = start + max_bytes
+        text = self.mm[start:end].decode(self.encoding, errors="replace")
+        if truncated:
+            text += f"\n... [truncated at {max_bytes} bytes; request a smaller range]"
+        return text
+
+    def lines(self, first: int, last: Optional[int], max_bytes: int) -> str:
+        index = self.index()
+        start = index.line_start(self.mm, first)
+        if start is None:
+            return ""
+        end = self.size
+        if last is not None:
+            end = index.line_start(self.mm, last + 1)
+            end = self.size if end is None else end
+        return self.decode(start, end, max_bytes)
+
+    def head(self, count: int, max_bytes: int) -> str:
+        end = self.data_start
+        for _ in range(count):
+            position = self.mm.find(self.newline, end, min(self.size, self.data_start + max_bytes))
+            if position == -1:
+                end = self.size
+                break
+            end = position + len(self.newline)
+        return self.decode(self.data_start, end, max_bytes)
+
+    def tail(self, count: int, max_bytes: int) -> str:
+        if count <= 0:
+            return ""
+        start = self.size
+        # A trailing newline ends the last line rather than starting an empty one.
+        search_end = self.size - len(self.newline) if self.mm[-len(self.newline):] == self.newline else self.size
+        lower = max(self.data_start, self.size - max_bytes)
+        for _ in range(count):
+            position = self.mm.rfind(self.newline, lower, search_end)
+            if position == -1:
+                start = lower
+                break
+            start = position + len(self.newline)
+            search_end = position
+        return self.mm[start:self.size].decode(self.encoding, errors="replace")
+
+    def hex_dump(self, offset: int, length: int, max_bytes: int) -> str:
+        data = self.mm[offset:offset + min(length, max_bytes)]
+        rows = []
+        for row in range(0, len(data), 16):
+            chunk = data[row:row + 16]
+            text = "".join(chr(b) if 32 <= b < 127 else "." for b in chunk)
+            rows.append(f"{offset + row:08x}  {chunk.hex(' '):<47}  {text}")
+        return "\n".join(rows)
+
+def read_window(file_path: str, start_line: Optional[int] = None, end_line: Optional[int] = None,
+                offset: Optional[int] = None, length: Optional[int] = None,
+                head: Optional[int] = None, tail: Optional[int] = None,
+                max_bytes: int = FILE_READ_MAX_BYTES) -> str:
+    """
+    read_window function
+
+    Parameters:
+        file_path (str): The file to read.
+        start_line (Optional[int]): First line (1-based) of a line range.
+        end_line (Optional[int]): Last line of a line range, inclusive. Reads to the end when omitted.
+        offset (Optional[int]): Byte offset of a byte range.
+        length (Optional[int]): Length of a byte range.
+        head (Optional[int]): Read this many lines from the start.
+        tail (Optional[int]): Read this many lines from the end.
+        max_bytes (int): Upper bound on the bytes returned.
+
+    Returns:
+        str: The decoded window. Binary files are refused for line reads and shown as a hex dump for byte reads.
+        With no range at all, the start of the file is returned, truncated at max_bytes.
+    """
+    with MappedTextFile(file_path) as f:
+        if offset is not None or length is not None:
+            offset = offset or 0
+            length = f.size - offset if length is None else length
+            if f.binary:
+                return f.hex_dump(offset, length, max_bytes)
+            return f.decode(offset, offset + length, max_bytes)
+        if f.binary:
+            return f"Binary file ({f.size} bytes). Use a byte range (--bytes OFFSET:LENGTH) to view a hex dump."
+        if head is not None:
+            return f.head(head, max_bytes)
+        if tail is not None:
+            return f.tail(tail, max_bytes)
+        if start_line is not None:
+            return f.lines(start_line, end_line, max_bytes)
+        return f.decode(f.data_start, f.size, max_bytes)
@@ -0,0 +1,278 @@
+import fnmatch
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Iterator, List, Optional, Sequence, Tuple
+from config import FILE_LIST_CACHE_DIRS
+
+# Directories never descended into, whatever the ignore rules say
+ALWAYS_SKIP_DIRS = {".git"}
+
+IGNORE_FILE = ".gitignore"
+
+# Entry kinds stored in the directory cache
+KIND_FILE = "f"
+KIND_DIR = "d"
+
+class IgnoreRule:
+    __slots__ = ("regex", "negate", "dir_only")
+
+    def __init__(self, regex, negate: bool, dir_only: bool):
+        self.regex = regex
+        self.negate = negate
+        self.dir_only = dir_only
+
+def _translate_glob(pattern: str) -> str:
+    """Translate a gitignore glob into a regex over '/'-separated relative paths."""
+    i, n = 0, len(pattern)
+    out = []
+    while i < n:
+        c = pattern[i]
+        if c == "*":
+            if pattern.startswith("**", i):
+                # '**/' matches any number of leading directories, a trailing '/**' everything below.
+                if pattern.startswith("**/", i):
+                    out.append("(?:.*/)?")
+                    i += 3
+                    continue
+                out.append(".*")
+                i += 2
+                continue
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            end = pattern.find("]", i + 2 if pattern.startswith("[!", i) or pattern.startswith("[^", i) else i + 1)
+            if end == -1:
+                out.append(re.escape(c))
+            else:
+                body = pattern[i + 1:end]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                out.append("[" + body.replace("\\", "\\\\") + "]")
+                i = end
+        elif c == "\\" and i + 1 < n:
+            i += 1
+            out.append(re.escape(pattern[i]))
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return "".join(out)
+
+def parse_ignore_file(lines: Sequence[str]) -> List[IgnoreRule]:
+    """
+    parse_ignore_file function
+
+    Parameters:
+        lines (Sequence[str]): Lines of a .gitignore file.
+
+    Returns:
+        List[IgnoreRule]: The compiled rules, in file order. Paths are matched relative to the
+        directory holding the file, and the last matching rule decides.
+    """
+    rules = []
+    for line in lines:
+        line = line.rstrip("\n")
+        if not line.endswith("\\ "):
+            line = line.rstrip()
+        if not line or line.startswith("#"):
+            continue
+        negate = line.startswith("!")
+        if negate:
+            line = line[1:]
+        elif line.startswith("\\"):
+            line = line[1:]
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        if not line:
+            continue
+        # A pattern containing a slash is anchored to the ignore file's directory;
+        # one without matches a name at any depth.
+        anchored = "/" in line
+        regex = _translate_glob(line.lstrip("/"))
+        if not anchored:
+            regex = "(?:.*/)?" + regex
+        rules.append(IgnoreRule(re.compile(regex + r"\Z", re.DOTALL), negate, dir_only))
+    return rules
+
+class IgnoreRules:
+    """A stack of .gitignore rule sets, one per directory between the repository root and the current directory."""
+
+    def __init__(self, layers: Tuple[Tuple[int, List[IgnoreRule]], ...] = ()):
+        # Each layer holds the length of its directory's path prefix and that directory's rules.
+        self.layers = layers
+
+    def push(self, directory: str, rules: List[IgnoreRule]) -> "IgnoreRules":
+        if not rules:
+            return self
+        return IgnoreRules(self.layers + ((len(os.path.join(directory, "")), rules),))
+
+    def ignored(self, path: str, is_dir: bool) -> bool:
+        """Return whether an absolute path below every layer's directory is ignored."""
+        ignored = False
+        for prefix_length, rules in self.layers:
+            relative = path[prefix_length:]
+            if os.sep != "/":
+                relative = relative.replace(os.sep, "/")
+            for rule in rules:
+                if rule.dir_only and not is_dir:
+                    continue
+                if rule.regex.match(relative):
+                    ignored = not rule.negate
+        return ignored
+
+class DirectoryCache:
+    """
+    Directory listings keyed by path and validated against the directory's mtime.
+
+    Adding, removing or renaming an entry updates its directory's mtime, so a
+    cached listing is reused for as long as the mtime is unchanged and a
+    repeated walk costs one stat per directory instead of a scandir.
+    """
+
+    def __init__(self, max_directories: int = FILE_LIST_CACHE_DIRS):
+        self.max_directories = max_directories
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[int, List[Tuple[str, str]]]]" = OrderedDict()
+        self._ignore_files: "OrderedDict[str, Tuple[Tuple[int, int], List[IgnoreRule]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def entries(self, directory: str) -> List[Tuple[str, str]]:
+        """Return the sorted (name, kind) pairs of a directory's files and subdirectories."""
+        mtime = os.stat(directory).st_mtime_ns
+        with self._lock:
+            cached = self._entries.get(directory)
+            if cached is not None and cached[0] == mtime:
+                self._entries.move_to_end(directory)
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+
+        entries = []
+        with os.scandir(directory) as it:
+            for entry in it:
+                # The kind comes from the dirent type, so most entries need no extra stat.
+                # Symlinked directories are not followed, which keeps walks free of cycles.
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        entries.append((entry.name, KIND_DIR))
+                    elif entry.is_file():
+                        entries.append((entry.name, KIND_FILE))
+                except OSError:
+                    continue
+        entries.sort()
+
+        with self._lock:
+            self._entries[directory] = (mtime, entries)
+            self._entries.move_to_end(directory)
+            while len(self._entries) > self.max_directories:
+                self._entries.popitem(last=False)
+        return entries
+
+    def ignore_rules(self, ignore_file: str) -> List[IgnoreRule]:
+        try:
+            st = os.stat(ignore_file)
+        except OSError:
+            return []
+        key = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            cached = self._ignore_files.get(ignore_file)
+            if cached is not None and cached[0] == key:
+                return cached[1]
+        try:
+            with open(ignore_file, 'r', encoding='utf-8', errors='replace') as f:
+                rules = parse_ignore_file(f.readlines())
+        except OSError:
+            return []
+        with self._lock:
+            self._ignore_files[ignore_file] = (key, rules)
+            while len(self._ignore_files) > self.max_directories:
+                self._ignore_files.popitem(last=False)
+        return rules
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._ignore_files.clear()
+            self.hits = 0
+            self.misses = 0
+
+directory_cache = DirectoryCache()
+
+def _inherited_rules(directory: str, cache: DirectoryCache) -> IgnoreRules:
+    """Collect .gitignore rules from the directory's ancestors, up to the enclosing repository root."""
+    ancestors = []
+    current = directory
+    while True:
+        parent = os.path.dirname(current)
+        if os.path.exists(os.path.join(current, ".git")):
+            break
+        if parent == current:
+            # Not inside a repository: only the directory's own rules apply.
+            return IgnoreRules()
+        ancestors.append(parent)
+        current = parent
+    rules = IgnoreRules()
+    for ancestor in reversed(ancestors):
+        rules = rules.push(ancestor, cache.ignore_rules(os.path.join(ancestor, IGNORE_FILE)))
+    return rules
+
+def _matches(patterns: Optional[Sequence[str]], relative: str, name: str) -> bool:
+    return any(fnmatch.fnmatchcase(relative, p) or fnmatch.fnmatchcase(name, p) for p in patterns)
+
+def iter_files(root: str, recursive: bool = True, include: Optional[Sequence[str]] = None,
+               exclude: Optional[Sequence[str]] = None, use_ignore_files: bool = True,
+               cache: Optional[DirectoryCache] = None) -> Iterator[str]:
+    """
+    iter_files function
+
+    Parameters:
+        root (str): The directory to list.
+        recursive (bool): Descend into subdirectories.
+        include (Optional[Sequence[str]]): Only yield files whose relative path or name matches one of these globs.
+        exclude (Optional[Sequence[str]]): Skip files and prune directories whose relative path or name matches one of these globs.
+        use_ignore_files (bool): Apply .gitignore rules from the root, its repository ancestors and every visited directory.
+        cache (Optional[DirectoryCache]): The listing cache to use; the shared module cache by default.
+
+    Returns:
+        Iterator[str]: Paths of matching files relative to root, yielded lazily in sorted depth-first order.
+    """
+    cache = cache or directory_cache
+    root = os.path.abspath(root)
+    rules = _inherited_rules(root, cache) if use_ignore_files else IgnoreRules()
+    stack = [(root, "", rules)]
+    while stack:
+        directory, prefix, rules = stack.pop()
+        try:
+            entries = cache.entries(directory)
+        except OSError:
+            if directory == root:
+                raise
+            continue
+        if use_ignore_files and any(name == IGNORE_FILE for name, _ in entries):
+            rules = rules.push(directory, cache.ignore_rules(os.path.join(directory, IGNORE_FILE)))
+
+        subdirectories = []
+        for name, kind in entries:
+            relative = prefix + name
+            path = os.path.join(directory, name)
+            if kind == KIND_DIR:
+                if not recursive or name in ALWAYS_SKIP_DIRS:
+                    continue
+                if exclude and _matches(exclude, relative, name):
+                    continue
+                if rules.layers and rules.ignored(path, True):
+                    continue
+                subdirectories.append((path, relative + "/", rules))
+            else:
+                if exclude and _matches(exclude, relative, name):
+                    continue
+                if include and not _matches(include, relative, name):
+                    continue
+                if rules.layers and rules.ignored(path, False):
+                    continue
+                yield relative
+        # Push in reverse so directories are visited in sorted order.
+        stack.extend(reversed(subdirectories))
@@ -1,67 +1,194 @@
 import os
-from typing import List, Dict
-from language_queries import get_query_for_language
+from typing import List, Dict, Optional, Sequence, Tuple
+from atomic_files import WriteTransaction, atomic_write
+from file_reader import SNIFF_BYTES, is_binary, read_window, sniff_encoding
+from file_tree import iter_files
+from language_queries import get_language_for_extension
+from metrics import instrument
+from parser_registry import parse_symbols
+from patch_utils import PatchError, apply_patch, apply_unified_hunks, parse_unified_diff
 import logging
 
 logging.basicConfig(level=logging.INFO)
 
-def list_files(directory: str) -> List[str]:
+@instrument("file.list")
+def list_files(directory: str, recursive: bool = False, include: Optional[Sequence[str]] = None,
+               exclude: Optional[Sequence[str]] = None, use_ignore_files: Optional[bool] = None,
+               limit: Optional[int] = None) -> List[str]:
     """
     list_files function
 
     Parameters:
         directory (str): The directory path to list files from.
+        recursive (bool): List files in subdirectories too, as paths relative to the directory.
+        include (Optional[Sequence[str]]): Only list files matching one of these globs.
+        exclude (Optional[Sequence[str]]): Skip files and directories matching one of these globs.
+        use_ignore_files (Optional[bool]): Skip files excluded by .gitignore rules. Defaults to recursive, so a
+            plain listing of one directory still shows every file in it, as it always has.
+        limit (Optional[int]): Stop after this many files.
 
     Returns:
         List[str]: A list of file names in the directory or an error message if something goes wrong.
     """
+    if use_ignore_files is None:
+        use_ignore_files = recursive
     try:
-        files = [f for f in os.listdir(directory) if os.path.isfile(os.path.join(directory, f))]
+        files = []
+        for path in iter_files(directory, recursive, include, exclude, use_ignore_files):
+            if limit is not None and len(files) >= limit:
+                break
+            files.append(path)
         logging.info(f"Listed files in directory: {directory}")
         return files
     except Exception as e:
         logging.error(f"Error listing files in directory {directory}: {str(e)}")
         return [f"Error listing files: {str(e)}"]
 
-def read_file(file_path: str) -> str:
+@instrument("file.read")
+def read_file(file_path: str, start_line: Optional[int] = None, end_line: Optional[int] = None,
+              offset: Optional[int] = None, length: Optional[int] = None,
+              head: Optional[int] = None, tail: Optional[int] = None) -> str:
     """
     read_file function
 
     Parameters:
         file_path (str): The path of the file to read.
+        start_line (Optional[int]): First line (1-based) to read.
+        end_line (Optional[int]): Last line to read, inclusive.
+        offset (Optional[int]): Byte offset to read from.
+        length (Optional[int]): Number of bytes to read.
+        head (Optional[int]): Number of lines to read from the start.
+        tail (Optional[int]): Number of lines to read from the end.
 
     Returns:
-        str: The content of the file or an error message if something goes wrong.
+        str: The content of the file or an error message if something goes wrong. Reads go through
+        a memory map and are capped at FILE_READ_MAX_BYTES, however large the file.
     """
     try:
-        with open(file_path, 'r') as file:
-            content = file.read()
+        content = read_window(file_path, start_line, end_line, offset, length, head, tail)
         logging.info(f"Read file: {file_path}")
         return content
     except Exception as e:
         logging.error(f"Error reading file {file_path}: {str(e)}")
         return f"Error reading file: {str(e)}"
 
-def write_file(file_path: str, content: str) -> str:
+def _load_text(file_path: str, transaction: Optional[WriteTransaction] = None) -> Tuple[str, str, bytes]:
+    """Return a file's text, encoding and byte order mark, as staged in transaction if it has a pending change."""
+    found, data = transaction.staged(file_path) if transaction else (False, None)
+    if found and data is None:
+        raise FileNotFoundError(f"'{file_path}' is deleted in the current transaction")
+    if not found:
+        with open(file_path, 'rb') as file:
+            data = file.read()
+    encoding, bom_length = sniff_encoding(data[:SNIFF_BYTES])
+    if is_binary(data[:SNIFF_BYTES], encoding):
+        raise ValueError(f"'{file_path}' is a binary file")
+    return data[bom_length:].decode(encoding), encoding, data[:bom_length]
+
+def _store(file_path: str, data: bytes, transaction: Optional[WriteTransaction] = None):
+    if transaction is not None:
+        transaction.stage(file_path, data)
+    else:
+        atomic_write(file_path, data)
+
+@instrument("file.write")
+def write_file(file_path: str, content: str, transaction: Optional[WriteTransaction] = None) -> str:
     """
     write_file function
 
     Parameters:
         file_path (str): The path of the file to write.
         content (str): The content to write to the file.
+        transaction (Optional[WriteTransaction]): Stage the write in this transaction instead of writing now.
 
     Returns:
         str: A success message or an error message if something goes wrong.
     """
     try:
-        with open(file_path, 'w') as file:
-            file.write(content)
+        _store(file_path, content.encode('utf-8'), transaction)
+        if transaction is not None:
+            return f"Staged write to '{file_path}' ({len(transaction)} files in transaction)."
         logging.info(f"Wrote to file: {file_path}")
         return f"File '{file_path}' has been written successfully."
     except Exception as e:
         logging.error(f"Error writing file {file_path}: {str(e)}")
         return f"Error writing file: {str(e)}"
 
+@instrument("file.edit")
+def edit_file(file_path: str, patch_text: str, transaction: Optional[WriteTransaction] = None) -> str:
+    """
+    edit_file function
+
+    Parameters:
+        file_path (str): The path of the file to edit.
+        patch_text (str): A unified diff of the file or SEARCH/REPLACE blocks.
+        transaction (Optional[WriteTransaction]): Stage the edit in this transaction instead of writing now.
+
+    Returns:
+        str: A success message or an error message if something goes wrong. The file keeps its
+        encoding, byte order mark and line endings, and is replaced atomically.
+    """
+    try:
+        content, encoding, bom = _load_text(file_path, transaction)
+        patched = apply_patch(content, patch_text)
+        _store(file_path, bom + patched.encode(encoding), transaction)
+        logging.info(f"Edited file: {file_path}")
+        action = "Staged edit of" if transaction is not None else "Edited"
+        return f"{action} '{file_path}' ({len(content.splitlines())} -> {len(patched.splitlines())} lines)."
+    except (PatchError, OSError, ValueError) as e:
+        logging.error(f"Error editing file {file_path}: {str(e)}")
+        return f"Error editing file: {str(e)}"
+
+@instrument("file.patch")
+def patch_files(patch_text: str, base_directory: str, transaction: Optional[WriteTransaction] = None) -> str:
+    """
+    patch_files function
+
+    Parameters:
+        patch_text (str): A unified diff, possibly covering several files, with paths relative to base_directory.
+        base_directory (str): The directory the diff's paths are relative to.
+        transaction (Optional[WriteTransaction]): Stage the changes in this transaction instead of writing now.
+
+    Returns:
+        str: A success message or an error message if something goes wrong. Without a transaction,
+        either every file is patched or none is.
+    """
+    own_transaction = transaction is None
+    transaction = transaction or WriteTransaction()
+    try:
+        patches = parse_unified_diff(patch_text)
+        for file_patch in patches:
+            file_path = os.path.join(base_directory, file_patch.path)
+            if file_patch.deletes_file:
+                transaction.stage(file_path, None)
+                continue
+            if file_patch.creates_file:
+                content, encoding, bom = "", "utf-8", b""
+            else:
+                content, encoding, bom = _load_text(file_path, transaction)
+            patched = apply_unified_hunks(content, file_patch.hunks)
+            transaction.stage(file_path, bom + patched.encode(encoding))
+        if own_transaction:
+            transaction.commit()
+        logging.info(f"Patched {len(patches)} files in {base_directory}")
+        action = "Patched" if own_transaction else "Staged patch of"
+        return f"{action} {len(patches)} files: " + ", ".join(file_patch.path for file_patch in patches)
+    except (PatchError, OSError, ValueError) as e:
+        if own_transaction:
+            transaction.abort()
+        logging.error(f"Error applying patch in {base_directory}: {str(e)}")
+        return f"Error applying patch: {str(e)}"
+
+# parse_file result keys for each symbol kind
+SYMBOL_CATEGORIES = {
+    "class": "classes",
+    "function": "functions",
+    "method": "methods",
+    "import": "imports",
+    "export": "exports",
+}
+
+@instrument("file.parse")
 def parse_file(file_path: str) -> Dict[str, List[str]]:
     """
     parse_file function
@@ -78,58 +205,16 @@ def parse_file(file_path: str) -> Dict[str, List[str]]:
         logging.error("tree-sitter is not installed. Please install it to use advanced parsing.")
         return {}
 
-    try:
-        from tree_sitter import Language, Parser
-    except ImportError:
-        logging.error("Failed to import tree-sitter components. Please check your installation.")
-        return {}
-
     file_extension = os.path.splitext(file_path)[1]
-    if file_extension not in ['.py', '.js', '.java']:
+    if not get_language_for_extension(file_extension):
         logging.warning(f"Parsing not supported for file type: {file_extension}")
         return {"error": [f"Parsing not supported for this file type: {file_extension}"]}
 
-    language_name = get_query_for_language(file_extension)
-    if not language_name:
-        logging.warning(f"No query available for language with extension: {file_extension}")
-        return {"error": [f"No query available for language with extension: {file_extension}"]}
-
     try:
-        LANGUAGE = Language(f'build/my-languages.so', language_name)
-        parser = Parser()
-        parser.set_language(LANGUAGE)
-
-        with open(file_path, 'r') as file:
-            content = file.read()
-
-        tree = parser.parse(bytes(content, "utf8"))
-        query_string = get_query_for_language(file_extension)
-        query = LANGUAGE.query(query_string)
-
-        captures = query.captures(tree.root_node)
-        
-        definitions = {
-            "classes": [],
-            "functions": [],
-            "methods": [],
-            "imports": [],
-            "exports": []
-        }
-
-        for capture in captures:
-            capture_type = capture[1]
-            name = content[capture[0].start_byte:capture[0].end_byte].strip()
-            if capture_type == "definition.class":
-                definitions["classes"].append(name)
-            elif capture_type == "definition.function":
-                definitions["functions"].append(name)
-            elif capture_type == "definition.method":
-                definitions["methods"].append(name)
-            elif capture_type == "name.import":
-                definitions["imports"].append(name)
-            elif capture_type == "name.export":
-                definitions["exports"].append(name)
-
+        symbols = parse_symbols(file_path)
+        definitions = {category: [] for category in SYMBOL_CATEGORIES.values()}
+        for symbol in symbols:
+            definitions[SYMBOL_CATEGORIES[symbol["kind"]]].append(symbol["name"])
         logging.info(f"Parsed file: {file_path} with definitions: {definitions}")
         return definitions
 
@@ -0,0 +1,107 @@
+import re
+import logging
+from typing import Dict, List
+from config import CONTEXT_TOKEN_BUDGET, HISTORY_KEEP_RECENT_MESSAGES, HISTORY_TRUNCATE_CHARS
+
+SUMMARY_LINE_CHARS = 200
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s')
+
+def estimate_tokens(text: str) -> int:
+    """
+    estimate_tokens function
+
+    Parameters:
+        text (str): The text to estimate.
+
+    Returns:
+        int: A rough token count, using the usual ~4 characters per token.
+    """
+    return (len(text) + 3) // 4 + 1
+
+def summarize_message(message: Dict[str, str]) -> str:
+    content = message["content"].strip()
+    match = _SENTENCE_END.search(content)
+    first = content[:match.start()] if match else content
+    if len(first) > SUMMARY_LINE_CHARS:
+        first = first[:SUMMARY_LINE_CHARS].rstrip() + "..."
+    return f"{message['role'].capitalize()}: {first}"
+
+class HistoryManager:
+    """
+    Token-budgeted conversation payload.
+
+    `messages` is the list sent to the API and is updated in place, so building
+    a request never copies the history. When the estimated token count goes
+    over the budget, older messages are first truncated and then dropped in
+    user/assistant pairs, with a one-line summary of each dropped message kept
+    for the system prompt.
+    """
+
+    def __init__(self, token_budget: int = CONTEXT_TOKEN_BUDGET,
+                 keep_recent: int = HISTORY_KEEP_RECENT_MESSAGES,
+                 truncate_chars: int = HISTORY_TRUNCATE_CHARS):
+        self.token_budget = token_budget
+        self.keep_recent = keep_recent
+        self.truncate_chars = truncate_chars
+        self.messages: List[Dict[str, str]] = []
+        self._tokens: List[int] = []
+        self._truncated = 0
+        self.total_tokens = 0
+        self.summary_lines: List[str] = []
+        self.summary_tokens = 0
+
+    def append(self, role: str, content: str):
+        tokens = estimate_tokens(content)
+        self.messages.append({"role": role, "content": content})
+        self._tokens.append(tokens)
+        self.total_tokens += tokens
+        if self.total_tokens + self.summary_tokens > self.token_budget:
+            self.compact()
+
+    def pop(self) -> Dict[str, str]:
+        message = self.messages.pop()
+        self.total_tokens -= self._tokens.pop()
+        self._truncated = min(self._truncated, len(self.messages))
+        return message
+
+    def system_prompt(self, base_prompt: str) -> str:
+        if not self.summary_lines:
+            return base_prompt
+        return base_prompt + "\n\nSummary of earlier conversation:\n" + "\n".join(self.summary_lines)
+
+    def compact(self):
+        # Only messages outside the recent window are touched, and the latest message is always kept.
+        protected = max(self.keep_recent, 1)
+
+        # Pass 1: truncate the oldest untruncated messages.
+        while self.total_tokens + self.summary_tokens > self.token_budget and self._truncated < len(self.messages) - protected:
+            index = self._truncated
+            content = self.messages[index]["content"]
+            if len(content) > self.truncate_chars:
+                content = content[:self.truncate_chars].rstrip() + " [truncated]"
+                tokens = estimate_tokens(content)
+                self.total_tokens += tokens - self._tokens[index]
+                self.messages[index] = {"role": self.messages[index]["role"], "content": content}
+                self._tokens[index] = tokens
+            self._truncated += 1
+
+        # Pass 2: drop the oldest user/assistant pairs, keeping the payload starting with a user turn.
+        dropped = 0
+        while self.total_tokens + self.summary_tokens > self.token_budget and len(self.messages) - dropped - 2 >= protected:
+            for message, tokens in zip(self.messages[dropped:dropped + 2], self._tokens[dropped:dropped + 2]):
+                line = summarize_message(message)
+                self.summary_lines.append(line)
+                self.summary_tokens += estimate_tokens(line)
+                self.total_tokens -= tokens
+            dropped += 2
+        if dropped:
+            del self.messages[:dropped]
+            del self._tokens[:dropped]
+            self._truncated = max(self._truncated - dropped, 0)
+
+        # Summaries are bounded too: keep at most a quarter of the budget, dropping the oldest lines.
+        while self.summary_lines and self.summary_tokens > self.token_budget // 4:
+            self.summary_tokens -= estimate_tokens(self.summary_lines.pop(0))
+
+        if self.total_tokens + self.summary_tokens > self.token_budget:
+            logging.warning(f"Conversation history is {self.total_tokens} tokens, over the {self.token_budget} token budget, after compaction")
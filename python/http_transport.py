@@ -0,0 +1,143 @@
+import random
+import threading
+import time
+import logging
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional, Tuple
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+from config import (
+    HTTP_POOL_CONNECTIONS,
+    HTTP_POOL_MAXSIZE,
+    HTTP_MAX_RETRIES,
+    HTTP_BACKOFF_BASE,
+    HTTP_BACKOFF_MAX,
+    HTTP_RETRY_AFTER_MAX,
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_READ_TIMEOUT,
+)
+
+# Statuses that mean the server did not process the request, so sending it again is safe.
+# 529 is Anthropic's "overloaded" status.
+RETRY_STATUS_CODES = {408, 429, 500, 502, 503, 504, 529}
+
+def backoff_delay(attempt: int, base: float = HTTP_BACKOFF_BASE, maximum: float = HTTP_BACKOFF_MAX) -> float:
+    # Full jitter: uniform in [0, min(max, base * 2^attempt)].
+    return random.uniform(0, min(maximum, base * (2 ** attempt)))
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Return the wait in seconds a Retry-After header asks for, or None if it is missing or malformed."""
+    if not value:
+        return None
+    try:
+        delay = float(value)
+    except ValueError:
+        try:
+            delay = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return max(delay, 0.0)
+
+def is_connect_error(error: requests.ConnectionError) -> bool:
+    """
+    is_connect_error function
+
+    Parameters:
+        error (requests.ConnectionError): A failed request.
+
+    Returns:
+        bool: True if the connection could not be established, so the server never received the request
+        and sending it again is safe. Errors after connecting (a reset or aborted connection, including a
+        stale keep-alive socket) may come after the server accepted the request, so they are not retried.
+    """
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, (NewConnectionError, ConnectTimeoutError))
+
+class HTTPTransport:
+    """
+    Connection-pooled, keep-alive HTTP transport with retry and backoff.
+
+    A single requests.Session is shared by every caller so that TCP and TLS
+    connections are reused between turns instead of being re-established.
+    """
+
+    def __init__(self,
+                 pool_connections: int = HTTP_POOL_CONNECTIONS,
+                 pool_maxsize: int = HTTP_POOL_MAXSIZE,
+                 max_retries: int = HTTP_MAX_RETRIES,
+                 backoff_base: float = HTTP_BACKOFF_BASE,
+                 backoff_max: float = HTTP_BACKOFF_MAX,
+                 timeout: Tuple[float, float] = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.session = requests.Session()
+        # Retries are handled here rather than by urllib3 so Retry-After and timings are visible.
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def post(self, url: str, headers: Dict[str, str], body: str, stream: bool = False) -> Tuple[requests.Response, Dict[str, Any]]:
+        """
+        post function
+
+        Parameters:
+            url (str): The URL to post to.
+            headers (Dict[str, str]): Request headers.
+            body (str): The serialized request body.
+            stream (bool): Whether to stream the response body.
+
+        Returns:
+            Tuple[requests.Response, Dict[str, Any]]: The final response and the timings of the request.
+        """
+        start = time.perf_counter()
+        retry_wait = 0.0
+        attempt = 0
+        while True:
+            try:
+                response = self.session.post(url, headers=headers, data=body, stream=stream, timeout=self.timeout)
+            except requests.ConnectionError as e:
+                # Messages calls are not idempotent: only retry when the request cannot have been sent.
+                if attempt >= self.max_retries or not is_connect_error(e):
+                    raise
+                delay = backoff_delay(attempt, self.backoff_base, self.backoff_max)
+                logging.warning(f"Connection error posting to {url}: {str(e)}. Retrying in {delay:.2f}s")
+            else:
+                delay = parse_retry_after(response.headers.get("Retry-After"))
+                # A server asking for a longer wait than we are prepared to give gets its answer returned
+                # rather than an early retry.
+                if (response.status_code not in RETRY_STATUS_CODES or attempt >= self.max_retries
+                        or (delay is not None and delay > HTTP_RETRY_AFTER_MAX)):
+                    timings = {
+                        "status": response.status_code,
+                        "attempts": attempt + 1,
+                        "time_to_headers": response.elapsed.total_seconds(),
+                        "retry_wait": retry_wait,
+                        "total": time.perf_counter() - start,
+                    }
+                    logging.debug(f"POST {url} timings: {timings}")
+                    return response, timings
+                if delay is None:
+                    delay = backoff_delay(attempt, self.backoff_base, self.backoff_max)
+                logging.warning(f"POST {url} returned {response.status_code}. Retrying in {delay:.2f}s")
+                response.close()
+            time.sleep(delay)
+            retry_wait += delay
+            attempt += 1
+
+    def close(self):
+        self.session.close()
+
+_shared_transport: Optional[HTTPTransport] = None
+_shared_transport_lock = threading.Lock()
+
+def get_shared_transport() -> HTTPTransport:
+    global _shared_transport
+    with _shared_transport_lock:
+        if _shared_transport is None:
+            _shared_transport = HTTPTransport()
+        return _shared_transport
@@ -9,11 +9,14 @@ LANGUAGE_QUERIES = {
   name: (identifier) @name.definition.function) @definition.function
 
 (import_statement
-  name: (dotted_name (identifier) @name.import)) @import
+  name: (dotted_name) @name.import) @import
+
+(import_statement
+  name: (aliased_import
+    name: (dotted_name) @name.import)) @import
 
 (import_from_statement
-  name: (dotted_name (identifier) @name.import)
-  (import_from_clause (identifier) @name.import)) @import
+  module_name: (dotted_name) @name.import) @import
 """,
     "javascript": """
 (class_declaration
@@ -29,7 +32,9 @@ LANGUAGE_QUERIES = {
   (import_clause (identifier) @name.import)) @import
 
 (export_statement
-  (export_clause (identifier) @name.export)) @export
+  (export_clause
+    (export_specifier
+      name: (identifier) @name.export))) @export
 """,
     "java": """
 (class_declaration
@@ -39,10 +44,28 @@ LANGUAGE_QUERIES = {
   name: (identifier) @name.definition.method) @definition.method
 
 (import_declaration
-  name: (scoped_identifier) @name.import) @import
+  [(identifier) (scoped_identifier)] @name.import) @import
 """,
 }
 
+EXTENSION_TO_LANGUAGE = {
+    ".py": "python",
+    ".js": "javascript",
+    ".java": "java",
+}
+
+def get_language_for_extension(file_extension):
+    """
+    get_language_for_extension function
+
+    Parameters:
+        file_extension (str): The file extension to determine the language (e.g., .py, .js, .java)
+
+    Returns:
+        str: The tree-sitter language name for the extension or an empty string if not supported.
+    """
+    return EXTENSION_TO_LANGUAGE.get(file_extension.lower(), "")
+
 def get_query_for_language(file_extension):
     """
     get_query_for_language function
@@ -53,10 +76,4 @@ def get_query_for_language(file_extension):
     Returns:
         str: The query string for the specified language or an empty string if not supported.
     """
-    extension_to_language = {
-        ".py": "python",
-        ".js": "javascript",
-        ".java": "java",
-    }
-    language = extension_to_language.get(file_extension.lower())
-    return LANGUAGE_QUERIES.get(language, "")
+    return LANGUAGE_QUERIES.get(get_language_for_extension(file_extension), "")
@@ -1,19 +1,41 @@
+import time
+_import_start = time.perf_counter()
+
 import os
-import nltk
+import sys
+import threading
+import argparse
 import logging
 import ssl
 import json
-from typing import List, Dict
-from api_client import AnthropicAPIClient
-from config import SYSTEM_PROMPT, MAX_REQUESTS_PER_TASK
-from file_utils import list_files, read_file, write_file, parse_file
+import io
+import cProfile
+import pstats
+import re
+import shlex
+from contextlib import contextmanager
+from typing import List, Dict, Optional
+from config import (SYSTEM_PROMPT, MAX_REQUESTS_PER_TASK, RESPONSE_CACHE_ENABLED, BATCH_MAX_WORKERS, SERVER_SOCKET_PATH,
+                    SERVER_WORKERS, CONTEXT_TOKEN_BUDGET, FILE_SEARCH_MAX_RESULTS, CONTEXT_PACK_ENABLED,
+                    CONTEXT_PACK_TOKENS, NLTK_DATA_PATH)
+from file_utils import list_files, read_file, write_file, edit_file, patch_files, parse_file
+from atomic_files import WriteTransaction
+from symbol_index import SymbolIndex, find_index_root
+from trigram_index import TrigramIndex
 from command_utils import execute_command
-from code_analyzer import analyze_code, generate_code
+from code_analyzer import analyze_code, write_project_analysis, generate_code
+from dependency_graph import DependencyGraph
 from task_manager import TaskManager
 from nlp_processor import NLPProcessor
+from nlp_pipeline import OPERATIONS as NLP_OPERATIONS
 from memory_manager import MemoryManager
-from knowledge_base import KnowledgeBase
-from download_nltk_data import download_nltk_data
+from response_cache import ResponseCache
+from history_manager import HistoryManager
+from session_log import SessionLog, paired_turns, validate_session_name
+from conversation_export import ConversationExporter, EXPORT_FORMATS
+from metrics import instrument, registry as metrics_registry
+import startup_profile
+from startup_profile import record_phase, startup_phase
 
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -25,90 +47,158 @@ except AttributeError:
 else:
     ssl._create_default_https_context = _create_unverified_https_context
 
-# Set NLTK data path to the virtual environment
-nltk_data_dir = "/Users/marcus/Documents/C-dev/venv/lib/python3.12/site-packages/nltk_data"
-nltk.data.path = [nltk_data_dir]  # Use only this path
-
-logging.info(f"NLTK data directory: {nltk_data_dir}")
-logging.info(f"NLTK data path: {nltk.data.path}")
+# NLTK and its data (config.NLTK_DATA_PATH) are only loaded, and verified by
+# download_nltk_data.ensure_nltk_data, on the first NLP command.
 
-def download_nltk_data():
-    packages = ['punkt', 'averaged_perceptron_tagger', 'maxent_ne_chunker', 'words']
-    for package in packages:
-        try:
-            nltk.data.find(f'{package}')
-            logging.info(f"NLTK data '{package}' is already available.")
-        except LookupError:
-            logging.info(f"Downloading NLTK data '{package}'...")
-            nltk.download(package, download_dir=nltk_data_dir, quiet=False)
-
-def verify_nltk_data():
-    required_data = [
-        ('tokenizers/punkt/english.pickle', 'punkt'),
-        ('taggers/averaged_perceptron_tagger/averaged_perceptron_tagger.pickle', 'averaged_perceptron_tagger'),
-        ('chunkers/maxent_ne_chunker/PY3/english_ace_binary.pickle', 'maxent_ne_chunker'),
-        ('corpora/words/en', 'words')
-    ]
-    missing_data = []
-    for file_path, package_name in required_data:
-        full_path = os.path.join(nltk_data_dir, file_path)
-        if os.path.exists(full_path):
-            logging.info(f"NLTK data '{package_name}' found at: {full_path}")
-        else:
-            logging.error(f"NLTK data '{package_name}' not found at: {full_path}")
-            missing_data.append(package_name)
-    
-    if missing_data:
-        logging.warning(f"The following NLTK data packages are missing: {', '.join(missing_data)}")
-    else:
-        logging.info("All required NLTK data packages are available.")
+record_phase("import modules", time.perf_counter() - _import_start)
 
-# Ensure NLTK data is available
-download_nltk_data()
-verify_nltk_data()
-
-# Now try to use NLTK functions
-try:
-    nltk.word_tokenize("This is a test sentence.")
-    logging.info("NLTK word tokenization successful.")
-except Exception as e:
-    logging.error(f"Error during NLTK word tokenization: {str(e)}")
-
-try:
-    nltk.pos_tag(nltk.word_tokenize("This is a test sentence."))
-    logging.info("NLTK POS tagging successful.")
-except Exception as e:
-    logging.error(f"Error during NLTK POS tagging: {str(e)}")
+# Inputs starting with one of these (or equal to one of COMMANDS) are commands; anything else is a chat turn.
+COMMAND_PREFIXES = ("file ", "system ", "code ", "task ", "nlp ", "memory ", "kb ", "cache ", "export ", "resume ", "stats ", "profile ",
+                   "context ")
+COMMANDS = ("scheduler stats", "stats")
 
-try:
-    nltk.ne_chunk(nltk.pos_tag(nltk.word_tokenize("John lives in New York.")))
-    logging.info("NLTK named entity recognition successful.")
-except Exception as e:
-    logging.error(f"Error during NLTK named entity recognition: {str(e)}")
+# 'file read' range options: --lines 10-20 (or 10-), --bytes 4096:512 (or 4096:), --head 20, --tail 20
+READ_RANGE_PATTERN = re.compile(r"(?P<path>.+?)(?:\s+--(?P<option>lines|bytes|head|tail)\s+"
+                                r"(?P<value>\d+-\d*|\d+:\d*|\d+))?$")
 
-# Check for NumPy
-try:
-    import numpy
-    logging.info("NumPy is installed.")
-except ImportError:
-    logging.error("NumPy is not installed. Please install it using 'pip install numpy'.")
-    print("Warning: NumPy is not installed. Some NLP features may not work correctly.")
+# Number of functions listed when a profile is dumped
+PROFILE_TOP_FUNCTIONS = 25
 
 class AssistantSession:
-    def __init__(self):
-        self.client = AnthropicAPIClient()
+    def __init__(self, session_name: Optional[str] = None):
+        # Turns are appended to the session log named after the session; see resume().
+        self.session_name = session_name or f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+        self._session_log: Optional[SessionLog] = None
+        self.response_cache = ResponseCache()
+        self.response_cache.enabled = RESPONSE_CACHE_ENABLED
+        self._client = None
+        # Full transcript, used for export. What is sent to the API lives in self.history.
         self.conversation_history: List[Dict[str, str]] = []
+        self.history = HistoryManager()
         self.working_directory: str = os.getcwd()
         self.request_count: int = 0
         self.task_manager = TaskManager()
+        self.exporter = ConversationExporter()
+        self._profiler: Optional[cProfile.Profile] = None
+        # Set between 'file transaction begin' and commit/abort; file writes and edits are staged in it.
+        self.transaction: Optional[WriteTransaction] = None
+        # Heavier subsystems are constructed on first use; see the properties below. Batch mode runs
+        # commands on several threads, so construction is guarded by _init_lock.
+        self._init_lock = threading.Lock()
+        self._nlp_processor = None
+        self._memory_manager = None
+        self._knowledge_base = None
+        self._context_packer = None
+        # Whether relevant code from the working directory is attached to chat turns; see 'context on'.
+        self.context_enabled = CONTEXT_PACK_ENABLED
+        if session_name and SessionLog.exists(session_name):
+            self.resume(session_name)
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._init_lock:
+                if self._client is None:
+                    with startup_phase("init api client"):
+                        from api_client import AnthropicAPIClient
+                        self._client = AnthropicAPIClient(cache=self.response_cache)
+        return self._client
+
+    @property
+    def nlp_processor(self) -> NLPProcessor:
+        if self._nlp_processor is None:
+            with self._init_lock:
+                if self._nlp_processor is None:
+                    with startup_phase("init nlp processor"):
+                        self._nlp_processor = NLPProcessor(data_dir=NLTK_DATA_PATH)
+        return self._nlp_processor
+
+    @property
+    def memory_manager(self) -> MemoryManager:
+        if self._memory_manager is None:
+            with self._init_lock:
+                if self._memory_manager is None:
+                    with startup_phase("init memory manager"):
+                        self._memory_manager = MemoryManager()
+        return self._memory_manager
+
+    @property
+    def knowledge_base(self):
+        if self._knowledge_base is None:
+            with self._init_lock:
+                if self._knowledge_base is None:
+                    with startup_phase("init knowledge base"):
+                        from knowledge_base import KnowledgeBase
+                        self._knowledge_base = KnowledgeBase()
+        return self._knowledge_base
+
+    @property
+    def context_packer(self):
+        if self._context_packer is None:
+            with self._init_lock:
+                if self._context_packer is None:
+                    from context_packer import ContextPacker
+                    self._context_packer = ContextPacker()
+        return self._context_packer
+
+    @property
+    def session_log(self) -> SessionLog:
+        if self._session_log is None:
+            with self._init_lock:
+                if self._session_log is None:
+                    self._session_log = SessionLog(self.session_name)
+        return self._session_log
+
+    def _record_message(self, role: str, content: str):
+        self.conversation_history.append({"role": role, "content": content})
         try:
-            self.nlp_processor = NLPProcessor()
+            self.session_log.append(role, content)
+        except OSError as e:
+            logging.error(f"Error appending to session log: {str(e)}")
+
+    def _record_turn(self, message: str, response: str):
+        """Add a completed exchange to the transcript and the session log; failed turns are never recorded."""
+        self._record_message("user", message)
+        self._record_message("assistant", response)
+
+    def close(self):
+        if self._nlp_processor is not None:
+            self._nlp_processor.close()
+        if self._session_log is not None:
+            self._session_log.close()
+            self._session_log = None
+
+    @instrument("command.resume")
+    def resume(self, name: str) -> str:
+        try:
+            validate_session_name(name)
+        except ValueError as e:
+            return f"Error: {str(e)}"
+        if not SessionLog.exists(name):
+            return f"Error: No session log named '{name}'."
+        self.close()
+        self.session_name = name
+        self._session_log = SessionLog(name)
+        # Logs written by older versions can hold unanswered or empty turns, which would break
+        # user/assistant alternation.
+        messages = paired_turns(self._session_log.read_tail(CONTEXT_TOKEN_BUDGET))
+        self.conversation_history = [dict(message) for message in messages]
+        self.history = HistoryManager()
+        for message in messages:
+            self.history.append(message["role"], message["content"])
+        return f"Resumed session '{name}' with the last {len(messages)} of {len(self._session_log)} logged messages."
+
+    def system_prompt_for(self, message: str) -> str:
+        """The system prompt for a turn: the base prompt, history summary and, with context on, relevant code."""
+        prompt = self.history.system_prompt(SYSTEM_PROMPT)
+        if not self.context_enabled:
+            return prompt
+        try:
+            context = self.context_packer.pack(message, self.working_directory)
         except Exception as e:
-            logging.error(f"Error initializing NLPProcessor: {str(e)}")
-            print(f"Warning: NLPProcessor initialization failed. NLP features may not be available.")
-            self.nlp_processor = None
-        self.memory_manager = MemoryManager()
-        self.knowledge_base = KnowledgeBase()
+            logging.error(f"Error packing code context: {str(e)}")
+            return prompt
+        return f"{prompt}\n\n{context}" if context else prompt
 
     def get_working_directory(self) -> str:
         return self.working_directory
@@ -120,13 +210,20 @@ class AssistantSession:
         else:
             return f"Error: {path} is not a valid directory."
 
+    @instrument("command.chat")
     def send_message_to_claude(self, message: str) -> str:
         if self.request_count >= MAX_REQUESTS_PER_TASK:
             return "Error: Maximum number of requests reached for this task. Please start a new session."
         
-        self.conversation_history.append({"role": "user", "content": message})
-        response = self.client.send_message(message, SYSTEM_PROMPT, self.conversation_history)
-        self.conversation_history.append({"role": "assistant", "content": response})
+        self.history.append("user", message)
+        try:
+            response = self.client.send_messages(self.history.messages, self.system_prompt_for(message))
+        except Exception:
+            # Keep the payload alternating user/assistant for the next turn.
+            self.history.pop()
+            raise
+        self._record_turn(message, response)
+        self.history.append("assistant", response)
         self.request_count += 1
         return response
 
@@ -135,33 +232,49 @@ class AssistantSession:
             yield "Error: Maximum number of requests reached for this task. Please start a new session."
             return
 
-        self.conversation_history.append({"role": "user", "content": message})
-        full_response = ""
+        self.history.append("user", message)
+        chunks: List[str] = []
+        failed = False
         try:
-            for chunk in self.client.stream_message(message, SYSTEM_PROMPT, self.conversation_history):
-                full_response += chunk
+            for chunk in self.client.stream_messages(self.history.messages, self.system_prompt_for(message)):
+                chunks.append(chunk)
                 yield chunk
         except Exception as e:
             logging.error(f"Error streaming message to Claude API: {str(e)}")
+            failed = True
             yield f"Error: {str(e)}"
+        logging.debug(f"Stream metrics: {self.client.last_stream_metrics}")
 
-        self.conversation_history.append({"role": "assistant", "content": full_response})
+        full_response = "".join(chunks)
+        # A failed or empty reply is not a turn: nothing is logged and the payload drops the user message.
+        if full_response and not failed:
+            self._record_turn(message, full_response)
+            self.history.append("assistant", full_response)
+        else:
+            self.history.pop()
         self.request_count += 1
 
+    @instrument("command.file")
     def handle_file_operations(self, command: str) -> str:
-        if command.startswith("list"):
-            directory = self.working_directory if len(command.split()) == 1 else os.path.join(self.working_directory, command.split(None, 1)[1])
-            files = list_files(directory)
-            return "\n".join(files)
+        if command == "list" or command.startswith("list "):
+            return self.list_files_command(command[4:])
         elif command.startswith("read "):
-            file_path = os.path.join(self.working_directory, command.split(" ", 1)[1])
-            content = read_file(file_path)
-            return content
+            return self.read_file_command(command[5:])
         elif command.startswith("write "):
             _, rel_path, content = command.split(" ", 2)
             file_path = os.path.join(self.working_directory, rel_path)
-            result = write_file(file_path, content)
+            result = write_file(file_path, content, self.transaction)
             return result
+        elif command.startswith("edit "):
+            return self.edit_file_command(command[5:].strip())
+        elif command.startswith("transaction "):
+            return self.handle_transaction(command[12:].strip())
+        elif command == "index" or command.startswith("index "):
+            return self.index_symbols(command[6:].strip())
+        elif command.startswith("find-symbol "):
+            return self.find_symbol(command[12:].strip())
+        elif command.startswith("search "):
+            return self.search_files(command[7:])
         elif command.startswith("parse "):
             file_path = os.path.join(self.working_directory, command.split(" ", 1)[1])
             if not os.path.isfile(file_path):
@@ -184,6 +297,7 @@ class AssistantSession:
         else:
             return "Invalid file operation command."
 
+    @instrument("command.system")
     def handle_system_command(self, command: str) -> str:
         if command.startswith("exec "):
             cmd = command.split(" ", 1)[1]
@@ -192,8 +306,13 @@ class AssistantSession:
         else:
             return "Invalid system command."
 
+    @instrument("command.code")
     def handle_code_operations(self, command: str) -> str:
-        if command.startswith("analyze "):
+        if command == "analyze-project" or command.startswith("analyze-project "):
+            return self.analyze_project(command[16:].strip())
+        elif command.startswith(("deps ", "rdeps ")):
+            return self.module_dependencies(command)
+        elif command.startswith("analyze "):
             file_path = os.path.join(self.working_directory, command.split(" ", 1)[1])
             analysis = analyze_code(file_path)
             return json.dumps(analysis, indent=2)
@@ -204,6 +323,7 @@ class AssistantSession:
         else:
             return "Invalid code operation command."
 
+    @instrument("command.task")
     def handle_task_management(self, command: str) -> str:
         if command.startswith("task "):
             task_command = command.split(" ", 1)[1]
@@ -211,13 +331,17 @@ class AssistantSession:
         else:
             return "Invalid task management command."
 
+    @instrument("command.nlp")
     def handle_nlp_processing(self, command: str) -> str:
         if command.startswith("nlp "):
             nlp_command = command.split(" ", 1)[1]
+            if nlp_command.startswith("file "):
+                return self.nlp_file_command(nlp_command[5:].strip())
             return self.nlp_processor.process(nlp_command)
         else:
             return "Invalid NLP processing command."
 
+    @instrument("command.memory")
     def handle_memory_operations(self, command: str) -> str:
         if command.startswith("memory "):
             memory_command = command.split(" ", 1)[1]
@@ -225,6 +349,7 @@ class AssistantSession:
         else:
             return "Invalid memory operation command."
 
+    @instrument("command.kb")
     def handle_knowledge_base(self, command: str) -> str:
         if command.startswith("kb "):
             kb_command = command.split(" ", 1)[1]
@@ -232,18 +357,456 @@ class AssistantSession:
         else:
             return "Invalid knowledge base command."
 
-    def export_conversation(self, file_path: str) -> str:
-        try:
+    @instrument("command.cache")
+    def handle_cache_operations(self, command: str) -> str:
+        if command == "stats":
+            stats = self.response_cache.stats()
+            return (f"Response cache {'enabled' if stats['enabled'] else 'bypassed'}: "
+                    f"{stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.0%} hit rate), "
+                    f"{stats['memory_entries']} entries in memory")
+        elif command == "on":
+            self.response_cache.enabled = True
+            return "Response cache enabled."
+        elif command == "off":
+            self.response_cache.enabled = False
+            return "Response cache bypassed."
+        elif command == "clear":
+            removed = self.response_cache.clear()
+            return f"Response cache cleared ({removed} entries removed from disk)."
+        else:
+            return "Invalid cache command. Use 'stats', 'on', 'off', or 'clear'."
+
+    def handle_stats(self, command: str) -> str:
+        # stats | stats json [path] | stats reset
+        parts = command.split(None, 2)
+        if len(parts) == 1:
+            return metrics_registry.format_table()
+        elif parts[1] == "json":
+            if len(parts) == 2:
+                return metrics_registry.to_json()
+            file_path = os.path.join(self.working_directory, parts[2])
             with open(file_path, 'w') as f:
-                for message in self.conversation_history:
-                    f.write(f"# {message['role'].capitalize()}\n\n")
-                    f.write(f"{message['content']}\n\n")
-            return f"Conversation exported to {file_path}"
+                f.write(metrics_registry.to_json())
+            return f"Metrics exported to {file_path}"
+        elif parts[1] == "reset":
+            metrics_registry.reset()
+            return "Metrics reset."
+        else:
+            return "Invalid stats command. Use 'stats', 'stats json [path]', or 'stats reset'."
+
+    def handle_profile(self, command: str) -> str:
+        if command == "on":
+            self._profiler = cProfile.Profile()
+            return "Profiling enabled for subsequent commands. Use 'profile off' to see the hotspots."
+        elif command == "off":
+            if self._profiler is None:
+                return "Profiling is not enabled."
+            output = io.StringIO()
+            stats = pstats.Stats(self._profiler, stream=output)
+            stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(PROFILE_TOP_FUNCTIONS)
+            self._profiler = None
+            return output.getvalue()
+        else:
+            return "Invalid profile command. Use 'profile on' or 'profile off'."
+
+    @contextmanager
+    def profiling(self):
+        """Run the enclosed command under cProfile while 'profile on' is active."""
+        profiler = self._profiler
+        if profiler is None:
+            yield
+            return
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+
+    def is_chat_message(self, user_input: str) -> bool:
+        return not user_input.startswith(COMMAND_PREFIXES) and user_input not in COMMANDS
+
+    def handle_command(self, user_input: str) -> str:
+        if user_input == "stats" or user_input.startswith("stats "):
+            return self.handle_stats(user_input)
+        elif user_input.startswith("profile "):
+            return self.handle_profile(user_input[8:].strip())
+        with self.profiling():
+            return self.dispatch(user_input)
+
+    def dispatch(self, user_input: str) -> str:
+        if user_input.startswith("file "):
+            return self.handle_file_operations(user_input[5:])
+        elif user_input.startswith("system "):
+            return self.handle_system_command(user_input[7:])
+        elif user_input.startswith("code "):
+            return self.handle_code_operations(user_input[5:])
+        elif user_input.startswith("task "):
+            return self.handle_task_management(user_input)
+        elif user_input.startswith("nlp "):
+            return self.handle_nlp_processing(user_input)
+        elif user_input.startswith("memory "):
+            return self.handle_memory_operations(user_input)
+        elif user_input.startswith("kb "):
+            return self.handle_knowledge_base(user_input)
+        elif user_input.startswith("cache "):
+            return self.handle_cache_operations(user_input[6:])
+        elif user_input.startswith("context "):
+            return self.handle_context(user_input[8:].strip())
+        elif user_input == "scheduler stats":
+            return json.dumps(self.client.scheduler.stats(), indent=2)
+        elif user_input.startswith("export "):
+            return self.export_conversation(user_input.split(" ", 1)[1])
+        elif user_input.startswith("resume "):
+            return self.resume(user_input.split(" ", 1)[1].strip())
+        else:
+            return self.send_message_to_claude(user_input)
+
+    def list_files_command(self, arguments: str) -> str:
+        # list [path] [-r] [--include GLOB]... [--exclude GLOB]... [--all] [--limit N]
+        try:
+            parts = shlex.split(arguments)
+        except ValueError as e:
+            return f"Invalid file list command: {str(e)}"
+        usage = "Invalid file list command. Use 'file list [path] [-r] [--include GLOB] [--exclude GLOB] [--all] [--limit N]'."
+        paths, include, exclude = [], [], []
+        # .gitignore rules apply to recursive listings unless --all is given; see list_files.
+        recursive, use_ignore_files, limit = False, None, None
+        i = 0
+        while i < len(parts):
+            part = parts[i]
+            if part in ("-r", "--recursive"):
+                recursive = True
+            elif part == "--all":
+                use_ignore_files = False
+            elif part in ("--include", "--exclude", "--limit"):
+                if i + 1 == len(parts):
+                    return usage
+                i += 1
+                if part == "--include":
+                    include.append(parts[i])
+                elif part == "--exclude":
+                    exclude.append(parts[i])
+                elif parts[i].isdigit():
+                    limit = int(parts[i])
+                else:
+                    return usage
+            else:
+                paths.append(part)
+            i += 1
+        if len(paths) > 1:
+            return usage
+        directory = os.path.join(self.working_directory, paths[0]) if paths else self.working_directory
+        files = list_files(directory, recursive, include or None, exclude or None, use_ignore_files, limit)
+        return "\n".join(files)
+
+    def read_file_command(self, arguments: str) -> str:
+        # read <path> [--lines N-M | --bytes OFFSET:LENGTH | --head N | --tail N]
+        match = READ_RANGE_PATTERN.match(arguments.strip())
+        if not match:
+            return "Invalid file read command. Use 'file read <path> [--lines N-M | --bytes OFFSET:LENGTH | --head N | --tail N]'."
+        file_path = os.path.join(self.working_directory, match.group("path"))
+        option, value = match.group("option"), match.group("value")
+        try:
+            if option == "lines":
+                first, _, last = value.partition("-")
+                return read_file(file_path, start_line=int(first), end_line=int(last) if last else None)
+            if option == "bytes":
+                offset, _, length = value.partition(":")
+                return read_file(file_path, offset=int(offset), length=int(length) if length else None)
+            if option == "head":
+                return read_file(file_path, head=int(value))
+            if option == "tail":
+                return read_file(file_path, tail=int(value))
+        except ValueError:
+            return f"Invalid value for --{option}: {value}"
+        return read_file(file_path)
+
+    def edit_file_command(self, arguments: str) -> str:
+        # edit <path> @patchfile   (unified diff or SEARCH/REPLACE blocks for one file)
+        # edit @patchfile          (unified diff, possibly of several files, relative to the working directory)
+        target, _, patch_ref = arguments.rpartition(" ")
+        if not patch_ref.startswith("@") or len(patch_ref) == 1:
+            return "Invalid file edit command. Use 'file edit [path] @patchfile'."
+        patch_path = os.path.join(self.working_directory, patch_ref[1:])
+        try:
+            with open(patch_path, 'r', encoding='utf-8') as f:
+                patch_text = f.read()
+        except OSError as e:
+            return f"Error reading patch file: {str(e)}"
+        if not target.strip():
+            return patch_files(patch_text, self.working_directory, self.transaction)
+        return edit_file(os.path.join(self.working_directory, target.strip()), patch_text, self.transaction)
+
+    def handle_transaction(self, command: str) -> str:
+        if command == "begin":
+            if self.transaction is not None:
+                return f"A transaction is already open with {len(self.transaction)} staged files."
+            self.transaction = WriteTransaction()
+            return "Transaction started. File writes and edits are staged until 'file transaction commit'."
+        if command == "status":
+            if self.transaction is None:
+                return "No transaction is open."
+            return "\n".join([f"{len(self.transaction)} staged files:"] + self.transaction.paths())
+        if command in ("commit", "abort"):
+            if self.transaction is None:
+                return "No transaction is open."
+            transaction, self.transaction = self.transaction, None
+            if command == "abort":
+                staged = len(transaction)
+                transaction.abort()
+                return f"Transaction aborted; {staged} staged files discarded."
+            try:
+                written = transaction.commit()
+            except Exception as e:
+                logging.error(f"Error committing transaction: {str(e)}")
+                return f"Error committing transaction, no files were changed: {str(e)}"
+            return f"Transaction committed: {len(written)} files written."
+        return "Invalid transaction command. Use 'file transaction begin|status|commit|abort'."
+
+    def index_symbols(self, path: str) -> str:
+        # index [path]
+        root = os.path.join(self.working_directory, path) if path else self.working_directory
+        if not os.path.isdir(root):
+            return f"Error: Directory '{root}' not found."
+        with SymbolIndex(root) as index:
+            stats = index.update()
+        return (f"Indexed {stats['files']} files in {root} in {stats['seconds']:.2f}s: {stats['parsed']} parsed, "
+                f"{stats['unchanged']} unchanged, {stats['removed']} removed, {stats['errors']} errors.")
+
+    def find_symbol(self, arguments: str) -> str:
+        # find-symbol <name> [--kind class|function|method|import|export]
+        parts = arguments.split()
+        kind = None
+        if "--kind" in parts:
+            position = parts.index("--kind")
+            if position + 1 >= len(parts):
+                return "Invalid find-symbol command. Use 'file find-symbol <name> [--kind KIND]'."
+            kind = parts[position + 1]
+            del parts[position:position + 2]
+        if len(parts) != 1:
+            return "Invalid find-symbol command. Use 'file find-symbol <name> [--kind KIND]'."
+        root = find_index_root(self.working_directory, "symbols")
+        if root is None:
+            return f"No symbol index covers {self.working_directory}. Run 'file index' first."
+        with SymbolIndex(root) as index:
+            matches = index.find(parts[0], kind)
+        if not matches:
+            return f"No symbols named '{parts[0]}' found."
+        return "\n".join(f"{os.path.relpath(os.path.join(root, path), self.working_directory)}:{line}: {kind} {name}"
+                         for name, kind, path, line in matches)
+
+    def search_files(self, arguments: str) -> str:
+        # search <query> [--regex] [-i] [--path GLOB] [--exclude GLOB] [--limit N] [--no-refresh]
+        usage = ("Invalid file search command. Use 'file search <query> [--regex] [-i] [--path GLOB] "
+                 "[--exclude GLOB] [--limit N] [--no-refresh]'.")
+        try:
+            parts = shlex.split(arguments)
+        except ValueError as e:
+            return f"Invalid file search command: {str(e)}"
+        terms, options = [], {"--path": None, "--exclude": None, "--limit": str(FILE_SEARCH_MAX_RESULTS)}
+        regex = ignore_case = False
+        refresh = True
+        i = 0
+        while i < len(parts):
+            part = parts[i]
+            if part == "--regex":
+                regex = True
+            elif part in ("-i", "--ignore-case"):
+                ignore_case = True
+            elif part == "--no-refresh":
+                refresh = False
+            elif part in options:
+                if i + 1 == len(parts):
+                    return usage
+                i += 1
+                options[part] = parts[i]
+            else:
+                terms.append(part)
+            i += 1
+        if len(terms) != 1 or not terms[0] or not options["--limit"].isdigit():
+            return usage
+        query, limit = terms[0], int(options["--limit"])
+        if regex:
+            try:
+                re.compile(query)
+            except re.error as e:
+                return f"Invalid regular expression: {str(e)}"
+
+        # Search the index of the nearest indexed ancestor, limited to the working directory's subtree.
+        root = find_index_root(self.working_directory, "trigrams") or self.working_directory
+        prefix = os.path.relpath(self.working_directory, root)
+        prefix = "" if prefix == "." else prefix.replace(os.sep, "/") + "/"
+        lines = []
+        with TrigramIndex(root) as index:
+            if refresh:
+                index.update()
+            for path, line_number, line in index.search(query, regex, ignore_case, options["--path"],
+                                                        options["--exclude"], prefix):
+                if len(lines) == limit:
+                    lines.append("... more matches; narrow the search or raise --limit")
+                    break
+                lines.append(f"{path[len(prefix):]}:{line_number}: {line.strip()}")
+        return "\n".join(lines) if lines else f"No matches for '{query}'."
+
+    def analyze_project(self, arguments: str) -> str:
+        # analyze-project [path] [--output FILE]
+        parts = arguments.split()
+        output_path = None
+        if "--output" in parts:
+            position = parts.index("--output")
+            if position + 1 >= len(parts):
+                return "Invalid analyze-project command. Use 'code analyze-project [path] [--output FILE]'."
+            output_path = os.path.join(self.working_directory, parts[position + 1])
+            del parts[position:position + 2]
+        if len(parts) > 1:
+            return "Invalid analyze-project command. Use 'code analyze-project [path] [--output FILE]'."
+        root = os.path.join(self.working_directory, parts[0]) if parts else self.working_directory
+        if not os.path.isdir(root):
+            return f"Error: Directory '{root}' not found."
+        if output_path is None:
+            output = io.StringIO()
+            write_project_analysis(root, output)
+            return output.getvalue().rstrip()
+        try:
+            with open(output_path, 'w', encoding='utf-8') as output:
+                stats = write_project_analysis(root, output)
+        except OSError as e:
+            return f"Error writing analysis: {str(e)}"
+        return (f"Analyzed {stats['files']} files in {root} in {stats['seconds']:.2f}s ({stats['analyzed']} analyzed, "
+                f"{stats['cached']} cached, {stats['errors']} errors); results written to {output_path}.")
+
+    def module_dependencies(self, command: str) -> str:
+        # deps <file> [--transitive] | rdeps <file> [--transitive]
+        parts = command.split()
+        transitive = "--transitive" in parts
+        if transitive:
+            parts.remove("--transitive")
+        if len(parts) != 2:
+            return f"Invalid {parts[0]} command. Use 'code {parts[0]} <file> [--transitive]'."
+        file_path = os.path.abspath(os.path.join(self.working_directory, parts[1]))
+        if not os.path.isfile(file_path):
+            return f"Error: File '{file_path}' not found."
+        # Use the graph of the nearest indexed ancestor, so imports from elsewhere in the project count.
+        root = find_index_root(os.path.dirname(file_path), "deps") or self.working_directory
+        relative = os.path.relpath(file_path, root).replace(os.sep, "/")
+        if relative.startswith("../"):
+            return f"Error: '{file_path}' is outside the dependency graph's root {root}."
+        with DependencyGraph(root) as graph:
+            graph.update()
+            if parts[0] == "deps":
+                related, label = graph.dependencies(relative, transitive), "imports"
+            else:
+                related, label = graph.dependents(relative, transitive), "is imported by"
+        if not related:
+            return f"{parts[1]} {label} no project files."
+        lines = [f"{parts[1]} {label} {len(related)} project files:"]
+        for path, distance in sorted(related.items(), key=lambda item: (item[1], item[0])):
+            shown = os.path.relpath(os.path.join(root, path), self.working_directory)
+            lines.append(f"{shown} (depth {distance})" if transitive else shown)
+        return "\n".join(lines)
+
+    def nlp_file_command(self, arguments: str) -> str:
+        # file <path> [tokenize|pos|ner] [--output FILE]
+        usage = "Invalid nlp file command. Use 'nlp file <path> [tokenize|pos|ner] [--output FILE]'."
+        parts = arguments.split()
+        output_path = None
+        if "--output" in parts:
+            position = parts.index("--output")
+            if position + 1 >= len(parts):
+                return usage
+            output_path = os.path.join(self.working_directory, parts[position + 1])
+            del parts[position:position + 2]
+        if not parts or len(parts) > 2:
+            return usage
+        operation = parts[1] if len(parts) == 2 else "ner"
+        if operation not in NLP_OPERATIONS:
+            return usage
+        file_path = os.path.join(self.working_directory, parts[0])
+        if not os.path.isfile(file_path):
+            return f"Error: File '{file_path}' not found."
+        output_path = output_path or f"{file_path}.{operation}.jsonl"
+        try:
+            with open(output_path, 'w', encoding='utf-8') as output:
+                stats = self.nlp_processor.process_file(file_path, operation, output)
         except Exception as e:
-            return f"Error exporting conversation: {str(e)}"
+            logging.error(f"Error in nlp file: {str(e)}")
+            return f"Error processing {file_path}: {str(e)}"
+        return (f"Processed {stats['sentences']} sentences ({stats['bytes'] / 1e6:.1f} MB) in {stats['seconds']:.2f}s "
+                f"({stats['mb_per_second']:.2f} MB/s); results written to {output_path}.")
+
+    @instrument("command.context")
+    def handle_context(self, command: str) -> str:
+        if command == "on":
+            self.context_enabled = True
+            return f"Relevant code from the working directory will be attached to messages (up to {CONTEXT_PACK_TOKENS} tokens)."
+        elif command == "off":
+            self.context_enabled = False
+            return "Code context disabled."
+        elif command == "status":
+            return f"Code context is {'on' if self.context_enabled else 'off'} (budget {CONTEXT_PACK_TOKENS} tokens)."
+        elif command.startswith("show "):
+            context = self.context_packer.pack(command[5:], self.working_directory)
+            return context or "No code in the working directory matches that message."
+        else:
+            return "Invalid context command. Use 'context on', 'context off', 'context status' or 'context show <message>'."
+
+    @instrument("command.export")
+    def export_conversation(self, command: str) -> str:
+        # export <path> [markdown|jsonl] [--incremental]
+        parts = command.split()
+        incremental = "--incremental" in parts
+        if incremental:
+            parts.remove("--incremental")
+        export_format = None
+        if len(parts) > 1 and parts[-1] in EXPORT_FORMATS:
+            export_format = parts.pop()
+        if not parts:
+            return "Invalid export command. Use 'export <path> [markdown|jsonl] [--incremental]'."
+        file_path = " ".join(parts)
+        return self.exporter.export(self.conversation_history, file_path, export_format, incremental)
 
 def main():
-    session = AssistantSession()
+    parser = argparse.ArgumentParser(description="Local AI assistant")
+    parser.add_argument("--startup-profile", action="store_true", help="print per-phase import and init timings")
+    parser.add_argument("--batch", metavar="FILE", help="run commands from FILE ('-' for stdin) and print results as JSON lines")
+    parser.add_argument("--jobs", type=int, default=BATCH_MAX_WORKERS, help="worker threads for independent batch commands")
+    parser.add_argument("--session", metavar="NAME", help="name of the session log to append to (resumed if it exists)")
+    parser.add_argument("--serve", action="store_true", help="keep warm sessions in a long-lived local server")
+    parser.add_argument("--attach", metavar="SESSION", help="attach to a named session on a running server")
+    parser.add_argument("--socket", default=SERVER_SOCKET_PATH, help="Unix socket of the server")
+    parser.add_argument("--port", type=int, help="use a localhost TCP port instead of a Unix socket")
+    parser.add_argument("--workers", type=int, default=SERVER_WORKERS, help="commands the server runs concurrently")
+    args = parser.parse_args()
+
+    if args.attach:
+        from session_server import attach
+        attach(args.attach, args.socket, args.port)
+        return
+    if args.serve:
+        from session_server import serve
+        serve(AssistantSession, args.socket, args.port, args.workers)
+        return
+
+    if args.session:
+        try:
+            validate_session_name(args.session)
+        except ValueError as e:
+            parser.error(str(e))
+    with startup_phase("init session"):
+        session = AssistantSession(args.session)
+    if args.startup_profile:
+        print(startup_profile.format_startup_profile(), file=sys.stderr)
+        startup_profile.enabled = True
+
+    if args.batch:
+        from batch_runner import run_batch, write_json_lines
+        if args.batch == "-":
+            failures = write_json_lines(run_batch(session, sys.stdin, args.jobs), sys.stdout)
+        else:
+            with open(args.batch, 'r') as f:
+                failures = write_json_lines(run_batch(session, f, args.jobs), sys.stdout)
+        sys.exit(1 if failures else 0)
+
     print(f"Welcome to the local AI assistant. Type 'quit' to exit.")
     print(f"Current working directory: {session.get_working_directory()}")
     print(f"You have {MAX_REQUESTS_PER_TASK} requests available for this session.")
@@ -254,32 +817,15 @@ def main():
             if user_input.lower() == 'quit':
                 break
             
-            if user_input.startswith("file "):
-                response = session.handle_file_operations(user_input[5:])
-            elif user_input.startswith("system "):
-                response = session.handle_system_command(user_input[7:])
-            elif user_input.startswith("code "):
-                response = session.handle_code_operations(user_input[5:])
-            elif user_input.startswith("task "):
-                response = session.handle_task_management(user_input[5:])
-            elif user_input.startswith("nlp "):
-                if session.nlp_processor:
-                    response = session.handle_nlp_processing(user_input[4:])
-                else:
-                    response = "NLP processing is not available due to initialization errors."
-            elif user_input.startswith("memory "):
-                response = session.handle_memory_operations(user_input[7:])
-            elif user_input.startswith("kb "):
-                response = session.handle_knowledge_base(user_input[3:])
-            elif user_input.startswith("export "):
-                file_path = user_input.split(" ", 1)[1]
-                response = session.export_conversation(file_path)
+            if not session.is_chat_message(user_input):
+                response = session.handle_command(user_input)
             else:
                 response = ""
                 print("Assistant: ", end="", flush=True)
-                for chunk in session.stream_message_from_claude(user_input):
-                    print(chunk, end="", flush=True)
-                    response += chunk
+                with session.profiling():
+                    for chunk in session.stream_message_from_claude(user_input):
+                        print(chunk, end="", flush=True)
+                        response += chunk
                 print()  # New line after the complete response
             
             if response:
@@ -0,0 +1,125 @@
+import functools
+import json
+import math
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict
+
+# Latency percentiles are computed over the most recent samples of each metric.
+MAX_SAMPLES = 10000
+
+class Metric:
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total_time = 0.0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.samples: Deque[float] = deque(maxlen=MAX_SAMPLES)
+
+    def percentile(self, sorted_samples, fraction: float) -> float:
+        if not sorted_samples:
+            return 0.0
+        # Nearest-rank percentile.
+        index = max(0, math.ceil(fraction * len(sorted_samples)) - 1)
+        return sorted_samples[index]
+
+    def summary(self) -> Dict[str, Any]:
+        samples = sorted(self.samples)
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "total_ms": self.total_time * 1000,
+            "p50_ms": self.percentile(samples, 0.50) * 1000,
+            "p95_ms": self.percentile(samples, 0.95) * 1000,
+            "p99_ms": self.percentile(samples, 0.99) * 1000,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+        }
+
+class MetricsRegistry:
+    """Process-wide latency, size and error counters, keyed by operation name."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float, error: bool = False, bytes_in: int = 0, bytes_out: int = 0):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = Metric()
+            metric.count += 1
+            metric.errors += int(error)
+            metric.total_time += seconds
+            metric.bytes_in += bytes_in
+            metric.bytes_out += bytes_out
+            metric.samples.append(seconds)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {name: metric.summary() for name, metric in sorted(self._metrics.items())}
+
+    def reset(self):
+        with self._lock:
+            self._metrics.clear()
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), indent=2)
+
+    def format_table(self) -> str:
+        snapshot = self.snapshot()
+        if not snapshot:
+            return "No metrics recorded yet."
+        header = f"{'operation':<28} {'count':>7} {'errors':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'bytes in':>10} {'bytes out':>10}"
+        lines = [header, "-" * len(header)]
+        for name, m in snapshot.items():
+            lines.append(f"{name:<28} {m['count']:>7} {m['errors']:>6} {m['p50_ms']:>9.2f} {m['p95_ms']:>9.2f} "
+                         f"{m['p99_ms']:>9.2f} {m['bytes_in']:>10} {m['bytes_out']:>10}")
+        return "\n".join(lines)
+
+registry = MetricsRegistry()
+
+def _size(value: Any) -> int:
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    if isinstance(value, (list, tuple)):
+        return sum(_size(item) for item in value)
+    if isinstance(value, dict):
+        return sum(_size(item) for item in value.values())
+    return 0
+
+def _is_error_result(result: Any) -> bool:
+    # Most helpers here report failures as returned messages rather than exceptions.
+    if isinstance(result, str):
+        return result.startswith(("Error", "Invalid"))
+    if isinstance(result, dict):
+        return "error" in result
+    return False
+
+def instrument(name: str) -> Callable:
+    """
+    instrument decorator
+
+    Parameters:
+        name (str): The metric to record calls under.
+
+    Returns:
+        Callable: A decorator recording latency, argument/result sizes and errors of each call.
+    """
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            result = None
+            error = True
+            try:
+                result = func(*args, **kwargs)
+                error = _is_error_result(result)
+                return result
+            finally:
+                registry.record(name, time.perf_counter() - start, error,
+                                bytes_in=_size(args) + _size(kwargs), bytes_out=_size(result))
+        return wrapper
+    return decorator
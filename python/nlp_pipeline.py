@@ -0,0 +1,300 @@
+import codecs
+import json
+import os
+import time
+import logging
+from collections import deque
+from itertools import chain
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+from config import (NLP_WORKERS, NLP_BATCH_CHARS, NLP_FILE_READ_BYTES, NLP_MAX_SENTENCE_CHARS,
+                    NLP_PROGRESS_SECONDS)
+from download_nltk_data import ensure_nltk_data
+from file_reader import sniff_encoding
+from metrics import instrument
+
+OPERATIONS = ("tokenize", "pos", "ner")
+
+# Batches submitted to the pool ahead of the one being yielded, per worker. Bounds memory when the
+# consumer is slower than the workers, while keeping every worker busy.
+IN_FLIGHT_BATCHES_PER_WORKER = 2
+
+# Below this many characters the work is done in-process; starting workers costs more than it saves.
+POOL_MIN_CHARS = 1024 * 1024
+
+def named_entities(tree) -> List[Tuple[str, str]]:
+    """Return the (label, text) entities of an ne_chunk tree, in order."""
+    return [(subtree.label(), " ".join(token for token, _ in subtree.leaves()))
+            for subtree in tree if hasattr(subtree, "label")]
+
+def process_sentences(sentences: List[str], operation: str) -> List[Any]:
+    """
+    process_sentences function
+
+    Parameters:
+        sentences (List[str]): Sentences, already split.
+        operation (str): 'tokenize', 'pos' or 'ner'.
+
+    Returns:
+        List[Any]: One result per sentence: its tokens, its (token, tag) pairs, or its ne_chunk tree. Each
+        stage runs once over the whole list and feeds the next, so nothing is tokenized or tagged twice.
+    """
+    from nltk.tokenize import word_tokenize
+    tokens = [word_tokenize(sentence, preserve_line=True) for sentence in sentences]
+    if operation == "tokenize":
+        return tokens
+    from nltk.tag import pos_tag_sents
+    tagged = pos_tag_sents(tokens)
+    if operation == "pos":
+        return tagged
+    from nltk.chunk import ne_chunk_sents
+    return list(ne_chunk_sents(tagged))
+
+def process_batch(documents: List[str], operation: str) -> List[List[Any]]:
+    """Sentence-split a batch of documents once, process all their sentences together and regroup them by document."""
+    from nltk.tokenize import sent_tokenize
+    split = [sent_tokenize(document) for document in documents]
+    results = process_sentences([sentence for sentences in split for sentence in sentences], operation)
+    grouped, position = [], 0
+    for sentences in split:
+        grouped.append(results[position:position + len(sentences)])
+        position += len(sentences)
+    return grouped
+
+def _process_sentence_batch(sentences: List[str], operation: str) -> Tuple[List[str], List[Any]]:
+    return sentences, process_sentences(sentences, operation)
+
+def _init_worker(data_dir: str):
+    """
+    Pool initializer: load NLTK, its data and the tagger and chunker models once per worker process.
+
+    The parent has already verified (and if needed downloaded) the data, so workers only find the
+    verification stamp here and never download concurrently.
+    """
+    ensure_nltk_data(data_dir)
+    process_batch(["Warm up the models."], "ner")
+
+def batches(documents: Iterable[str], max_chars: int) -> Iterator[List[str]]:
+    """Group documents into lists of about max_chars characters; a longer document is a batch of its own."""
+    batch, size = [], 0
+    for document in documents:
+        if batch and size + len(document) > max_chars:
+            yield batch
+            batch, size = [], 0
+        batch.append(document)
+        size += len(document)
+    if batch:
+        yield batch
+
+class NLPPipeline:
+    """
+    Tokenization, POS tagging and NER over many documents.
+
+    Documents are grouped into batches of about NLP_BATCH_CHARS characters.
+    Each batch is sentence-split once and tagged with pos_tag_sents and
+    ne_chunk_sents, which reuse one loaded model for the whole batch. Large
+    inputs are spread over worker processes that each load the models once;
+    results come back in input order, with a bounded number of batches in
+    flight, so memory does not grow with the input.
+    """
+
+    def __init__(self, data_dir: str, workers: int = NLP_WORKERS, batch_chars: int = NLP_BATCH_CHARS):
+        self.data_dir = data_dir
+        self.workers = workers
+        self.batch_chars = batch_chars
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._loaded = False
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                                 initargs=(self.data_dir,))
+        return self._executor
+
+    def _run_batches(self, function, batch_iter: Iterator[List[str]], operation: str) -> Iterator[List[Any]]:
+        """Yield function(batch, operation) for each batch, in order, in-process or on the pool."""
+        first = next(batch_iter, None)
+        if first is None:
+            return
+        second = next(batch_iter, None)
+        batch_iter = chain([first] if second is None else [first, second], batch_iter)
+        if not self._loaded:
+            ensure_nltk_data(self.data_dir)
+            self._loaded = True
+        if self.workers <= 1 or (second is None and sum(map(len, first)) < POOL_MIN_CHARS):
+            for batch in batch_iter:
+                yield function(batch, operation)
+            return
+
+        executor = self._pool()
+        pending = deque()
+        window = self.workers * IN_FLIGHT_BATCHES_PER_WORKER
+        try:
+            for batch in batch_iter:
+                pending.append(executor.submit(function, batch, operation))
+                if len(pending) >= window:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        except BrokenProcessPool:
+            # A worker died (killed, out of memory); the next call starts a fresh pool.
+            logging.error("An NLP worker process died; the pool will be restarted on the next call")
+            if self._executor is executor:
+                self._executor = None
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    def process_documents(self, documents: Iterable[str], operation: str) -> Iterator[List[Any]]:
+        """
+        process_documents function
+
+        Parameters:
+            documents (Iterable[str]): The texts to process; consumed lazily.
+            operation (str): 'tokenize', 'pos' or 'ner'.
+
+        Returns:
+            Iterator[List[Any]]: For each document, in input order, its per-sentence results (see
+            process_sentences). Raises ValueError for an unknown operation.
+        """
+        if operation not in OPERATIONS:
+            raise ValueError(f"Unknown NLP operation '{operation}'; use one of {', '.join(OPERATIONS)}")
+        return (document for batch in self._run_batches(process_batch, batches(documents, self.batch_chars), operation)
+                for document in batch)
+
+    def process_sentences(self, sentences: Iterable[str], operation: str) -> Iterator[Tuple[str, Any]]:
+        """
+        process_sentences function
+
+        Parameters:
+            sentences (Iterable[str]): Sentences, already split; consumed lazily.
+            operation (str): 'tokenize', 'pos' or 'ner'.
+
+        Returns:
+            Iterator[Tuple[str, Any]]: (sentence, result) pairs in input order; see the module-level
+            process_sentences. Raises ValueError for an unknown operation.
+        """
+        if operation not in OPERATIONS:
+            raise ValueError(f"Unknown NLP operation '{operation}'; use one of {', '.join(OPERATIONS)}")
+        for batch, results in self._run_batches(_process_sentence_batch, batches(sentences, self.batch_chars), operation):
+            yield from zip(batch, results)
+
+def read_sentences(file_path: str, read_bytes: int = NLP_FILE_READ_BYTES,
+                   progress: Optional[Callable[[int], None]] = None) -> Iterator[Tuple[int, str]]:
+    """
+    read_sentences function
+
+    Parameters:
+        file_path (str): The text file to read.
+        read_bytes (int): How much of the file is read at a time.
+        progress (Optional[Callable[[int], None]]): Called with the number of bytes read so far after each read.
+
+    Returns:
+        Iterator[Tuple[int, str]]: (character offset, sentence) for each sentence of the file, in order. The
+        file is read incrementally: the last sentence of each read may continue in the next, so it is
+        carried over and split again together with the following text. A run of more than
+        NLP_MAX_SENTENCE_CHARS characters without a sentence break is cut there.
+    """
+    from nltk.tokenize import sent_tokenize
+    with open(file_path, 'rb') as f:
+        sample = f.read(read_bytes)
+        encoding, bom_length = sniff_encoding(sample)
+        decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        data, total = sample[bom_length:], len(sample)
+        carry, carry_offset = "", 0
+        while True:
+            final = not data
+            text = carry + decoder.decode(data, final=final)
+            if progress:
+                progress(total)
+            sentences = sent_tokenize(text) if text.strip() else []
+            # Unless the file has ended, the last sentence may be incomplete.
+            complete = sentences if final else sentences[:-1]
+            position = 0
+            for sentence in complete:
+                position = text.find(sentence, position)
+                yield carry_offset + position, sentence
+                position += len(sentence)
+            if final:
+                return
+            if sentences:
+                position = text.find(sentences[-1], position)
+            carry, carry_offset = text[position:], carry_offset + position
+            while len(carry) > NLP_MAX_SENTENCE_CHARS:
+                yield carry_offset, carry[:NLP_MAX_SENTENCE_CHARS]
+                carry, carry_offset = carry[NLP_MAX_SENTENCE_CHARS:], carry_offset + NLP_MAX_SENTENCE_CHARS
+            data = f.read(read_bytes)
+            total += len(data)
+
+def sentence_record(number: int, offset: int, sentence: str, operation: str, result: Any) -> Dict[str, Any]:
+    """The JSON-lines record of one processed sentence."""
+    record = {"sentence": number, "offset": offset, "text": sentence}
+    if operation == "tokenize":
+        record["tokens"] = result
+    elif operation == "pos":
+        record["tags"] = result
+    else:
+        record["tags"] = [list(leaf) for leaf in result.leaves()]
+        record["entities"] = named_entities(result)
+    return record
+
+@instrument("nlp.file")
+def process_file(pipeline: NLPPipeline, file_path: str, operation: str, output: TextIO,
+                 progress_interval: float = NLP_PROGRESS_SECONDS) -> Dict[str, Any]:
+    """
+    process_file function
+
+    Parameters:
+        pipeline (NLPPipeline): Runs the operation.
+        file_path (str): The text file to process.
+        operation (str): 'tokenize', 'pos' or 'ner'.
+        output (TextIO): Receives one JSON object per sentence, in order, as results arrive.
+        progress_interval (float): Seconds between progress log lines.
+
+    Returns:
+        Dict[str, Any]: The sentences and bytes processed, the time taken and the throughput. Memory use
+        depends on the read size and the pipeline's batches in flight, not on the file's size.
+    """
+    if operation not in OPERATIONS:
+        raise ValueError(f"Unknown NLP operation '{operation}'; use one of {', '.join(OPERATIONS)}")
+    ensure_nltk_data(pipeline.data_dir)
+    size = os.path.getsize(file_path)
+    start = last_report = time.perf_counter()
+    state = {"bytes": 0}
+
+    def report(bytes_read: int):
+        state["bytes"] = bytes_read
+
+    sentences = read_sentences(file_path, progress=report)
+    offsets = deque()
+
+    def texts():
+        for offset, sentence in sentences:
+            offsets.append(offset)
+            yield sentence
+
+    count = 0
+    for sentence, result in pipeline.process_sentences(texts(), operation):
+        record = sentence_record(count, offsets.popleft(), sentence, operation, result)
+        output.write(json.dumps(record, ensure_ascii=False) + "\n")
+        count += 1
+        now = time.perf_counter()
+        if now - last_report >= progress_interval:
+            last_report = now
+            elapsed = now - start
+            logging.info(f"nlp {operation} {file_path}: {state['bytes'] / max(size, 1):.0%} read, {count} sentences, "
+                         f"{state['bytes'] / elapsed / 1e6:.2f} MB/s")
+    elapsed = time.perf_counter() - start
+    return {"sentences": count, "bytes": size, "seconds": elapsed,
+            "mb_per_second": size / elapsed / 1e6 if elapsed else 0.0}
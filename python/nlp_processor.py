@@ -1,53 +1,125 @@
 import os
-import nltk
+import threading
+import time
 import logging
-from nltk.tokenize import word_tokenize
-from nltk.tag import pos_tag
-from nltk.chunk import ne_chunk
+from download_nltk_data import ensure_nltk_data
+from metrics import instrument
 
 logging.basicConfig(level=logging.INFO)
 
 # Set NLTK data path
 nltk_data_dir = os.path.expanduser("~/nltk_data")
-nltk.data.path.append(nltk_data_dir)
 
-def download_nltk_data():
-    packages = ['punkt', 'averaged_perceptron_tagger', 'maxent_ne_chunker', 'words']
-    for package in packages:
-        try:
-            nltk.data.find(f'{package}')
-            logging.info(f"NLTK data '{package}' is available.")
-        except LookupError:
-            logging.info(f"Downloading NLTK data '{package}'...")
-            nltk.download(package, download_dir=nltk_data_dir, quiet=False)
+class NLPProcessor:
+    """
+    NLTK-backed tokenization, POS tagging and NER.
 
-# Ensure NLTK data is available
-download_nltk_data()
+    Construction is free: NLTK itself and its data are only imported and
+    verified the first time one of the operations is used.
+    """
 
-class NLPProcessor:
+    def __init__(self, data_dir: str = nltk_data_dir):
+        self.data_dir = data_dir
+        self.load_time = None
+        self._word_tokenize = None
+        self._pos_tag = None
+        self._ne_chunk = None
+        self._pipeline = None
+        # Sessions served concurrently can hit the first NLP command at the same time.
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._word_tokenize is not None:
+            return
+        with self._lock:
+            if self._word_tokenize is not None:
+                return
+            start = time.perf_counter()
+            ensure_nltk_data(self.data_dir)
+            from nltk.tokenize import word_tokenize
+            from nltk.tag import pos_tag
+            from nltk.chunk import ne_chunk
+            try:
+                import numpy
+            except ImportError:
+                logging.error("NumPy is not installed. Please install it using 'pip install numpy'.")
+            self._pos_tag, self._ne_chunk = pos_tag, ne_chunk
+            # Set last: other threads take a non-None _word_tokenize to mean everything is loaded.
+            self._word_tokenize = word_tokenize
+            self.load_time = time.perf_counter() - start
+        logging.info(f"Loaded NLTK in {self.load_time:.3f}s")
+
+    @instrument("nlp.tokenize")
     def tokenize(self, text):
         try:
-            return word_tokenize(text)
+            self._load()
+            return self._word_tokenize(text)
         except Exception as e:
             logging.error(f"Error in tokenization: {str(e)}")
             return []
 
+    @instrument("nlp.pos_tag")
     def pos_tag(self, tokens):
         try:
-            return pos_tag(tokens)
+            self._load()
+            return self._pos_tag(tokens)
         except Exception as e:
             logging.error(f"Error in POS tagging: {str(e)}")
             return []
 
+    @instrument("nlp.ner")
     def ner(self, text):
         try:
-            tokens = word_tokenize(text)
-            pos_tags = pos_tag(tokens)
-            return ne_chunk(pos_tags)
+            self._load()
+            tokens = self._word_tokenize(text)
+            pos_tags = self._pos_tag(tokens)
+            return self._ne_chunk(pos_tags)
         except Exception as e:
             logging.error(f"Error in NER: {str(e)}")
             return None
 
+    @property
+    def pipeline(self):
+        if self._pipeline is None:
+            with self._lock:
+                if self._pipeline is None:
+                    from nlp_pipeline import NLPPipeline
+                    self._pipeline = NLPPipeline(self.data_dir)
+        return self._pipeline
+
+    def process_documents(self, documents, operation):
+        """
+        process_documents function
+
+        Parameters:
+            documents (Iterable[str]): The texts to process.
+            operation (str): 'tokenize', 'pos' or 'ner'.
+
+        Returns:
+            Iterator[List[Any]]: Per-sentence results for each document, in order; see NLPPipeline.
+        """
+        return self.pipeline.process_documents(documents, operation)
+
+    def process_file(self, file_path, operation, output):
+        """
+        process_file function
+
+        Parameters:
+            file_path (str): The text file to process, read incrementally.
+            operation (str): 'tokenize', 'pos' or 'ner'.
+            output (TextIO): Receives one JSON line per sentence.
+
+        Returns:
+            Dict[str, Any]: Sentences and bytes processed, time taken and throughput; see nlp_pipeline.process_file.
+        """
+        from nlp_pipeline import process_file
+        return process_file(self.pipeline, file_path, operation, output)
+
+    def close(self):
+        if self._pipeline is not None:
+            self._pipeline.close()
+            self._pipeline = None
+
     def process(self, command):
         parts = command.split(maxsplit=1)
         if len(parts) < 2:
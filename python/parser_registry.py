@@ -0,0 +1,308 @@
+import os
+import threading
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from config import TREE_SITTER_LIBRARY, PARSE_CACHE_ENTRIES
+from language_queries import LANGUAGE_QUERIES, get_language_for_extension
+
+# Query capture names and the symbol kinds they produce
+CAPTURE_KINDS = {
+    "name.definition.class": "class",
+    "name.definition.function": "function",
+    "name.definition.method": "method",
+    "name.import": "import",
+    "name.export": "export",
+}
+
+class ParserRegistry:
+    """
+    Process-wide tree-sitter languages, parsers and compiled queries.
+
+    Each language is loaded from the shared library and its query compiled
+    once. Parsers keep per-parse state, so each thread gets its own.
+    """
+
+    def __init__(self, library_path: str = TREE_SITTER_LIBRARY):
+        self.library_path = library_path
+        self._languages: Dict[str, Any] = {}
+        self._queries: Dict[str, Any] = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def language(self, name: str):
+        language = self._languages.get(name)
+        if language is None:
+            from tree_sitter import Language
+            with self._lock:
+                language = self._languages.get(name)
+                if language is None:
+                    language = self._languages[name] = Language(self.library_path, name)
+        return language
+
+    def query(self, name: str):
+        query = self._queries.get(name)
+        if query is None:
+            language = self.language(name)
+            with self._lock:
+                query = self._queries.get(name)
+                if query is None:
+                    query = self._queries[name] = language.query(LANGUAGE_QUERIES[name])
+        return query
+
+    def parser(self, name: str):
+        parsers = getattr(self._local, "parsers", None)
+        if parsers is None:
+            parsers = self._local.parsers = {}
+        parser = parsers.get(name)
+        if parser is None:
+            from tree_sitter import Parser
+            parser = Parser()
+            parser.set_language(self.language(name))
+            parsers[name] = parser
+        return parser
+
+_registry: Optional[ParserRegistry] = None
+_registry_lock = threading.Lock()
+
+def get_registry() -> ParserRegistry:
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ParserRegistry()
+    return _registry
+
+def extract_symbols(query, root_node, source: bytes, start_point: Optional[Tuple[int, int]] = None,
+                    end_point: Optional[Tuple[int, int]] = None) -> List[Dict[str, Any]]:
+    """
+    extract_symbols function
+
+    Parameters:
+        query: A compiled LANGUAGE_QUERIES query.
+        root_node: The node to run the query under.
+        source (bytes): The parsed source.
+        start_point (Optional[Tuple[int, int]]): Only capture nodes from this (row, column) on.
+        end_point (Optional[Tuple[int, int]]): Only capture nodes before this (row, column).
+
+    Returns:
+        List[Dict[str, Any]]: One {"kind", "name", "line", "end_line"} entry per named capture, in source order.
+        Lines are 1-based; for definitions they span the whole definition node.
+    """
+    symbols = []
+    if start_point is not None:
+        captures = query.captures(root_node, start_point=start_point, end_point=end_point)
+    else:
+        captures = query.captures(root_node)
+    for node, capture_name in captures:
+        kind = CAPTURE_KINDS.get(capture_name)
+        if kind is None:
+            continue
+        # The name node's parent is the definition or import it belongs to.
+        owner = node.parent if node.parent is not None else node
+        symbols.append({
+            "kind": kind,
+            "name": source[node.start_byte:node.end_byte].decode("utf-8", errors="replace").strip(),
+            "line": owner.start_point[0] + 1,
+            "end_line": owner.end_point[0] + 1,
+        })
+    return symbols
+
+class ParsedFile:
+    """A parsed file: its source and tree, kept for incremental re-parsing, and its symbols."""
+
+    __slots__ = ("key", "language", "source", "tree", "symbols")
+
+    def __init__(self, key: Tuple[int, int], language: str, source: bytes, tree, symbols: List[Dict[str, Any]]):
+        self.key = key
+        self.language = language
+        self.source = source
+        self.tree = tree
+        self.symbols = symbols
+
+class ParseCache:
+    """Recently parsed files. An entry's symbols are current while the file's mtime and size are unchanged."""
+
+    def __init__(self, max_entries: int = PARSE_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.incremental = 0
+        self._entries: "OrderedDict[str, ParsedFile]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path: str, key: Optional[Tuple[int, int]] = None) -> Optional[ParsedFile]:
+        """Return the entry for path, if any. Given the file's current key, also count a hit or a miss."""
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None:
+                self._entries.move_to_end(path)
+            if key is not None:
+                if entry is not None and entry.key == key:
+                    self.hits += 1
+                else:
+                    self.misses += 1
+            return entry
+
+    def take(self, path: str) -> Optional[ParsedFile]:
+        """Remove and return an entry, so only one thread at a time edits its tree."""
+        with self._lock:
+            return self._entries.pop(path, None)
+
+    def put(self, path: str, entry: ParsedFile, incremental: bool = False):
+        with self._lock:
+            if incremental:
+                self.incremental += 1
+            self._entries[path] = entry
+            self._entries.move_to_end(path)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+parse_cache = ParseCache()
+
+# Block size used when comparing old and new content for their common prefix and suffix
+COMPARE_BLOCK = 1 << 16
+
+def _common_prefix(old: bytes, new: bytes, limit: int, from_end: bool) -> int:
+    def same(start: int, end: int) -> bool:
+        if from_end:
+            return old[len(old) - end:len(old) - start] == new[len(new) - end:len(new) - start]
+        return old[start:end] == new[start:end]
+
+    # Compare whole blocks first, then binary-search the first differing block.
+    position = 0
+    while position < limit and same(position, min(position + COMPARE_BLOCK, limit)):
+        position = min(position + COMPARE_BLOCK, limit)
+    if position >= limit:
+        return limit
+    lo, hi = position, min(position + COMPARE_BLOCK, limit) - 1
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if same(position, mid):
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+def _common_affixes(old: bytes, new: bytes) -> Tuple[int, int]:
+    """Return the lengths of the common prefix and (non-overlapping) common suffix of two byte strings."""
+    limit = min(len(old), len(new))
+    prefix = _common_prefix(old, new, limit, False)
+    return prefix, _common_prefix(old, new, limit - prefix, True)
+
+def _point(source: bytes, offset: int) -> Tuple[int, int]:
+    row = source.count(b"\n", 0, offset)
+    return row, offset - (source.rfind(b"\n", 0, offset) + 1)
+
+def reparse_incrementally(entry: ParsedFile, source: bytes, registry: ParserRegistry) -> Tuple[Any, List[Dict[str, Any]]]:
+    """
+    reparse_incrementally function
+
+    Parameters:
+        entry (ParsedFile): The previous parse of the file.
+        source (bytes): The file's new content.
+        registry (ParserRegistry): Supplies the parser and query.
+
+    Returns:
+        Tuple[Any, List[Dict[str, Any]]]: The new tree and symbols. The edit between the old and new
+        content is applied to the old tree so tree-sitter reuses its unchanged parts, and the query
+        only re-runs over the top-level nodes touched by the edit or by tree-sitter's changed ranges.
+        Symbols elsewhere are carried over, with their lines shifted past the edit.
+    """
+    old = entry.source
+    prefix, suffix = _common_affixes(old, source)
+    old_end, new_end = len(old) - suffix, len(source) - suffix
+    start_point = _point(old, prefix)
+    old_end_point = _point(old, old_end)
+    new_end_point = _point(source, new_end)
+
+    old_tree = entry.tree
+    old_tree.edit(start_byte=prefix, old_end_byte=old_end, new_end_byte=new_end,
+                  start_point=start_point, old_end_point=old_end_point, new_end_point=new_end_point)
+    tree = registry.parser(entry.language).parse(source, old_tree)
+
+    # Rows (0-based, new coordinates) whose symbols must be recomputed: the edit itself, which
+    # catches renames that leave the tree's shape unchanged, plus every structurally changed range.
+    lo, hi = start_point[0], new_end_point[0]
+    for changed in old_tree.changed_ranges(tree):
+        lo = min(lo, changed.start_point[0])
+        hi = max(hi, changed.end_point[0])
+    # Widen to whole top-level nodes, so every definition overlapping the region is re-queried in full.
+    for child in tree.root_node.children:
+        if child.end_point[0] >= lo and child.start_point[0] <= hi:
+            lo = min(lo, child.start_point[0])
+            hi = max(hi, child.end_point[0])
+
+    row_shift = new_end_point[0] - old_end_point[0]
+    kept = []
+    for symbol in entry.symbols:
+        line, end_line = symbol["line"] - 1, symbol["end_line"] - 1
+        if end_line < start_point[0]:
+            pass
+        elif line > old_end_point[0]:
+            symbol = dict(symbol, line=symbol["line"] + row_shift, end_line=symbol["end_line"] + row_shift)
+            line += row_shift
+        else:
+            continue
+        if not lo <= line <= hi:
+            kept.append(symbol)
+
+    query = registry.query(entry.language)
+    fresh = [symbol for symbol in extract_symbols(query, tree.root_node, source, (lo, 0), (hi + 1, 0))
+             if lo <= symbol["line"] - 1 <= hi]
+    # Both lists are in source order and cover disjoint lines, so a stable sort merges them.
+    return tree, sorted(kept + fresh, key=lambda symbol: symbol["line"])
+
+def parse_symbols(file_path: str, registry: Optional[ParserRegistry] = None,
+                  cache: Optional[ParseCache] = None) -> List[Dict[str, Any]]:
+    """
+    parse_symbols function
+
+    Parameters:
+        file_path (str): The source file to parse.
+        registry (Optional[ParserRegistry]): Languages, parsers and queries to use; the process-wide registry by default.
+        cache (Optional[ParseCache]): Result cache to use; the shared cache by default.
+
+    Returns:
+        List[Dict[str, Any]]: The file's symbols, see extract_symbols. An unchanged file is served from
+        the cache after a single stat, and a changed one previously parsed is re-parsed incrementally.
+        Raises ValueError for unsupported file types and the underlying error if the grammar cannot be
+        loaded or the file read.
+    """
+    registry = registry or get_registry()
+    cache = cache if cache is not None else parse_cache
+    language = get_language_for_extension(os.path.splitext(file_path)[1])
+    if not language:
+        raise ValueError(f"Parsing not supported for this file type: {os.path.splitext(file_path)[1]}")
+
+    path = os.path.abspath(file_path)
+    st = os.stat(path)
+    key = (st.st_mtime_ns, st.st_size)
+    entry = cache.get(path, key)
+    if entry is not None and entry.key == key:
+        return entry.symbols
+
+    with open(path, 'rb') as f:
+        source = f.read()
+    entry = cache.take(path) if entry is not None else None
+    if entry is not None and entry.language == language:
+        if entry.source == source:
+            # Touched but not changed.
+            cache.put(path, ParsedFile(key, language, source, entry.tree, entry.symbols))
+            return entry.symbols
+        try:
+            tree, symbols = reparse_incrementally(entry, source, registry)
+            cache.put(path, ParsedFile(key, language, source, tree, symbols), incremental=True)
+            return symbols
+        except Exception as e:
+            logging.warning(f"Incremental re-parse of {path} failed, parsing from scratch: {str(e)}")
+
+    tree = registry.parser(language).parse(source)
+    symbols = extract_symbols(registry.query(language), tree.root_node, source)
+    cache.put(path, ParsedFile(key, language, source, tree, symbols))
+    logging.debug(f"Parsed {path}: {len(symbols)} symbols")
+    return symbols
@@ -0,0 +1,253 @@
+import re
+from typing import List, Optional, Tuple
+from file_reader import split_lines
+
+HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+SEARCH_MARKER = re.compile(r"^<{5,} SEARCH\s*$")
+DIVIDER_MARKER = re.compile(r"^={5,}\s*$")
+REPLACE_MARKER = re.compile(r"^>{5,} REPLACE\s*$")
+
+# How far from its stated position a hunk's context is searched for when the file has drifted
+HUNK_SEARCH_LINES = 1000
+
+class PatchError(Exception):
+    pass
+
+class Hunk:
+    def __init__(self, old_start: int, old_count: int):
+        self.old_start = old_start
+        self.old_count = old_count
+        self.old_lines: List[str] = []
+        self.new_lines: List[str] = []
+        # Set by "\ No newline at end of file" after the last added line
+        self.new_missing_newline = False
+
+class FilePatch:
+    def __init__(self, old_path: Optional[str], new_path: Optional[str]):
+        self.old_path = old_path
+        self.new_path = new_path
+        self.hunks: List[Hunk] = []
+
+    @property
+    def path(self) -> str:
+        return self.new_path or self.old_path
+
+    @property
+    def deletes_file(self) -> bool:
+        return self.new_path is None
+
+    @property
+    def creates_file(self) -> bool:
+        return self.old_path is None
+
+def is_search_replace(text: str) -> bool:
+    return any(SEARCH_MARKER.match(line) for line in split_lines(text))
+
+def _diff_path(header: str) -> Optional[str]:
+    # "--- a/path<TAB>timestamp": drop the timestamp and a git-style a/ or b/ prefix.
+    path = header[4:].split("\t", 1)[0].strip()
+    if path == "/dev/null":
+        return None
+    if path.startswith(("a/", "b/")):
+        path = path[2:]
+    return path
+
+def _mark_missing_newline(hunk: Hunk, previous_line: str):
+    # Only the new side's final newline matters; a missing one on the old side still matches.
+    if previous_line.startswith(("+", " ")):
+        hunk.new_missing_newline = True
+
+def parse_unified_diff(text: str) -> List[FilePatch]:
+    """
+    parse_unified_diff function
+
+    Parameters:
+        text (str): A unified diff covering one or more files.
+
+    Returns:
+        List[FilePatch]: One entry per file, with its hunks in order. Raises PatchError on malformed input.
+    """
+    patches: List[FilePatch] = []
+    current: Optional[FilePatch] = None
+    hunk: Optional[Hunk] = None
+    remaining_old = remaining_new = 0
+    # A trailing "\r" is part of the line ending, as in files with CRLF line endings.
+    lines = [line[:-2] if line.endswith("\r\n") else line.rstrip("\n") for line in split_lines(text)]
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        if hunk is not None and (remaining_old > 0 or remaining_new > 0):
+            tag, body = (line[:1], line[1:]) if line else (" ", "")
+            if tag == " ":
+                hunk.old_lines.append(body)
+                hunk.new_lines.append(body)
+                remaining_old -= 1
+                remaining_new -= 1
+            elif tag == "-":
+                hunk.old_lines.append(body)
+                remaining_old -= 1
+            elif tag == "+":
+                hunk.new_lines.append(body)
+                remaining_new -= 1
+            elif tag == "\\":
+                _mark_missing_newline(hunk, lines[i - 1])
+            else:
+                raise PatchError(f"Unexpected line {i + 1} in hunk: {line!r}")
+            i += 1
+            continue
+        if line.startswith("\\") and hunk is not None:
+            _mark_missing_newline(hunk, lines[i - 1])
+        elif line.startswith("--- ") and i + 1 < len(lines) and lines[i + 1].startswith("+++ "):
+            current = FilePatch(_diff_path(line), _diff_path(lines[i + 1]))
+            patches.append(current)
+            hunk = None
+            i += 1
+        elif line.startswith("@@"):
+            match = HUNK_HEADER.match(line)
+            if not match or current is None:
+                raise PatchError(f"Malformed hunk header on line {i + 1}: {line!r}")
+            old_count = int(match.group(2)) if match.group(2) is not None else 1
+            new_count = int(match.group(4)) if match.group(4) is not None else 1
+            hunk = Hunk(int(match.group(1)), old_count)
+            current.hunks.append(hunk)
+            remaining_old, remaining_new = old_count, new_count
+        i += 1
+    if hunk is not None and (remaining_old > 0 or remaining_new > 0):
+        raise PatchError("Diff ends in the middle of a hunk")
+    if not patches:
+        raise PatchError("No file headers ('--- ' / '+++ ') found in diff")
+    return patches
+
+def _find_hunk(lines: List[str], old_lines: List[str], expected: int, lower: int) -> int:
+    """Return where old_lines match, preferring the stated position and then the nearest offset."""
+    stripped = [line.rstrip("\r\n") for line in old_lines]
+    size = len(stripped)
+
+    def matches(position: int) -> bool:
+        if position < lower or position + size > len(lines):
+            return False
+        return all(lines[position + k].rstrip("\r\n") == stripped[k] for k in range(size))
+
+    for offset in range(HUNK_SEARCH_LINES + 1):
+        for position in (expected - offset, expected + offset) if offset else (expected,):
+            if matches(position):
+                return position
+    return -1
+
+def apply_unified_hunks(content: str, hunks: List[Hunk]) -> str:
+    """
+    apply_unified_hunks function
+
+    Parameters:
+        content (str): The current file content.
+        hunks (List[Hunk]): The hunks of one file, in order.
+
+    Returns:
+        str: The patched content. Hunks whose context has moved are applied at the nearest match,
+        and the file's line endings are kept. Raises PatchError when a hunk does not apply.
+    """
+    lines = split_lines(content)
+    newline = "\r\n" if lines and lines[0].endswith("\r\n") else "\n"
+    result: List[str] = []
+    position = 0
+    drift = 0
+    for number, hunk in enumerate(hunks, 1):
+        # A hunk without old lines inserts after line old_start rather than replacing it.
+        expected = (hunk.old_start if hunk.old_count == 0 else hunk.old_start - 1) + drift
+        start = _find_hunk(lines, hunk.old_lines, max(expected, position), position)
+        if start == -1:
+            raise PatchError(f"Hunk {number} (at line {hunk.old_start}) does not apply: its context was not found")
+        drift = start - (hunk.old_start - 1 if hunk.old_count else hunk.old_start)
+        result.extend(lines[position:start])
+        end = start + len(hunk.old_lines)
+        new_lines = [line + newline for line in hunk.new_lines]
+        if new_lines and hunk.new_missing_newline:
+            new_lines[-1] = new_lines[-1][:-len(newline)]
+        result.extend(new_lines)
+        position = end
+    result.extend(lines[position:])
+    return "".join(result)
+
+def parse_search_replace(text: str) -> List[Tuple[str, str]]:
+    """
+    parse_search_replace function
+
+    Parameters:
+        text (str): One or more blocks of the form
+            <<<<<<< SEARCH / existing text / ======= / replacement text / >>>>>>> REPLACE
+
+    Returns:
+        List[Tuple[str, str]]: (search, replace) pairs in order. Raises PatchError on malformed input.
+    """
+    blocks = []
+    lines = split_lines(text)
+    i = 0
+    while i < len(lines):
+        if not SEARCH_MARKER.match(lines[i]):
+            i += 1
+            continue
+        search, replace = [], []
+        i += 1
+        while i < len(lines) and not DIVIDER_MARKER.match(lines[i]):
+            search.append(lines[i])
+            i += 1
+        i += 1
+        while i < len(lines) and not REPLACE_MARKER.match(lines[i]):
+            replace.append(lines[i])
+            i += 1
+        if i >= len(lines):
+            raise PatchError("Unterminated SEARCH/REPLACE block")
+        blocks.append(("".join(search), "".join(replace)))
+        i += 1
+    if not blocks:
+        raise PatchError("No SEARCH/REPLACE blocks found")
+    return blocks
+
+def apply_search_replace(content: str, blocks: List[Tuple[str, str]]) -> str:
+    """
+    apply_search_replace function
+
+    Parameters:
+        content (str): The current file content.
+        blocks (List[Tuple[str, str]]): (search, replace) pairs, applied in order.
+
+    Returns:
+        str: The edited content. Each search text must occur exactly once; an empty search on an
+        empty file writes the replacement. Raises PatchError otherwise.
+    """
+    crlf = "\r\n" in content
+    for number, (search, replace) in enumerate(blocks, 1):
+        if crlf:
+            search = search.replace("\r\n", "\n").replace("\n", "\r\n")
+            replace = replace.replace("\r\n", "\n").replace("\n", "\r\n")
+        if not search:
+            if content:
+                raise PatchError(f"Block {number} has an empty SEARCH section but the file is not empty")
+            content = replace
+            continue
+        count = content.count(search)
+        if count == 0:
+            raise PatchError(f"Block {number}: SEARCH text not found")
+        if count > 1:
+            raise PatchError(f"Block {number}: SEARCH text matches {count} times; include more context")
+        content = content.replace(search, replace, 1)
+    return content
+
+def apply_patch(content: str, patch_text: str) -> str:
+    """
+    apply_patch function
+
+    Parameters:
+        content (str): The current file content.
+        patch_text (str): SEARCH/REPLACE blocks, or a unified diff of this one file.
+
+    Returns:
+        str: The patched content. Raises PatchError when the patch is malformed or does not apply.
+    """
+    if is_search_replace(patch_text):
+        return apply_search_replace(content, parse_search_replace(patch_text))
+    patches = parse_unified_diff(patch_text)
+    if len(patches) != 1:
+        raise PatchError(f"The diff covers {len(patches)} files; apply it without a target path")
+    return apply_unified_hunks(content, patches[0].hunks)
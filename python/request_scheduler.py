@@ -0,0 +1,146 @@
+import threading
+import time
+import logging
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+from config import RATE_LIMIT_REQUESTS_PER_MIN, RATE_LIMIT_TOKENS_PER_MIN
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 1
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_BATCH: "batch"}
+
+class TokenBucket:
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def cost(self, amount: float) -> float:
+        # A request larger than the bucket is charged a full bucket: it waits for one rather than forever,
+        # and does not leave a debt that stalls the callers after it.
+        return min(amount, self.capacity)
+
+    def time_until(self, amount: float, now: float) -> float:
+        self._refill(now)
+        amount = self.cost(amount)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float):
+        self.tokens -= self.cost(amount)
+
+class RequestScheduler:
+    """
+    Process-wide admission control for API requests.
+
+    Requests wait in per-priority FIFO lanes until both the requests/min and
+    the tokens/min buckets can cover them. The head of the highest-priority
+    non-empty lane is always served first, so interactive turns overtake
+    queued batch work. A limit of 0 disables that bucket.
+    """
+
+    def __init__(self, requests_per_minute: int = RATE_LIMIT_REQUESTS_PER_MIN,
+                 tokens_per_minute: int = RATE_LIMIT_TOKENS_PER_MIN):
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self._condition = threading.Condition()
+        self._lanes: Dict[int, Deque[object]] = {priority: deque() for priority in PRIORITY_NAMES}
+        self._granted = {priority: 0 for priority in PRIORITY_NAMES}
+        self._total_wait = {priority: 0.0 for priority in PRIORITY_NAMES}
+        self._max_wait = {priority: 0.0 for priority in PRIORITY_NAMES}
+        self._max_depth = 0
+
+    def _head(self) -> Optional[object]:
+        for priority in sorted(self._lanes):
+            if self._lanes[priority]:
+                return self._lanes[priority][0]
+        return None
+
+    def _wait_time(self, tokens: int, now: float) -> float:
+        wait = 0.0
+        if self.request_bucket is not None:
+            wait = max(wait, self.request_bucket.time_until(1, now))
+        if self.token_bucket is not None:
+            wait = max(wait, self.token_bucket.time_until(tokens, now))
+        return wait
+
+    def acquire(self, tokens: int, priority: int = PRIORITY_INTERACTIVE) -> float:
+        """
+        acquire function
+
+        Parameters:
+            tokens (int): The estimated number of tokens the request will use.
+            priority (int): PRIORITY_INTERACTIVE or PRIORITY_BATCH.
+
+        Returns:
+            float: How long the caller waited, in seconds.
+        """
+        if self.request_bucket is None and self.token_bucket is None:
+            return 0.0
+        ticket = object()
+        start = time.monotonic()
+        with self._condition:
+            lane = self._lanes[priority]
+            lane.append(ticket)
+            self._max_depth = max(self._max_depth, sum(len(queue) for queue in self._lanes.values()))
+            while True:
+                if self._head() is ticket:
+                    now = time.monotonic()
+                    wait = self._wait_time(tokens, now)
+                    if wait <= 0:
+                        if self.request_bucket is not None:
+                            self.request_bucket.consume(1)
+                        if self.token_bucket is not None:
+                            self.token_bucket.consume(tokens)
+                        lane.popleft()
+                        self._condition.notify_all()
+                        break
+                    # Woken early if a higher-priority request arrives and takes the head.
+                    self._condition.wait(wait)
+                else:
+                    self._condition.wait()
+            waited = time.monotonic() - start
+            self._granted[priority] += 1
+            self._total_wait[priority] += waited
+            self._max_wait[priority] = max(self._max_wait[priority], waited)
+        if waited > 0.01:
+            logging.info(f"Rate limiter delayed {PRIORITY_NAMES[priority]} request by {waited:.2f}s")
+        return waited
+
+    def settle(self, estimated_tokens: int, input_tokens: Optional[int], output_tokens: Optional[int] = None):
+        """Correct the token bucket once the real usage of a request is known, output tokens included."""
+        if self.token_bucket is None or (input_tokens is None and output_tokens is None):
+            return
+        actual_tokens = (estimated_tokens if input_tokens is None else input_tokens) + (output_tokens or 0)
+        with self._condition:
+            bucket = self.token_bucket
+            charged = bucket.cost(estimated_tokens)
+            bucket.tokens = min(bucket.capacity, bucket.tokens - (bucket.cost(actual_tokens) - charged))
+            self._condition.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._condition:
+            return {
+                "queue_depth": {PRIORITY_NAMES[p]: len(lane) for p, lane in self._lanes.items()},
+                "max_queue_depth": self._max_depth,
+                "granted": {PRIORITY_NAMES[p]: count for p, count in self._granted.items()},
+                "average_wait": {PRIORITY_NAMES[p]: (self._total_wait[p] / self._granted[p] if self._granted[p] else 0.0)
+                                 for p in self._granted},
+                "max_wait": {PRIORITY_NAMES[p]: wait for p, wait in self._max_wait.items()},
+            }
+
+_scheduler: Optional[RequestScheduler] = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler() -> RequestScheduler:
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RequestScheduler()
+        return _scheduler
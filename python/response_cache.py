@@ -0,0 +1,178 @@
+import hashlib
+import json
+import os
+import threading
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from config import RESPONSE_CACHE_DIR, RESPONSE_CACHE_MEMORY_ENTRIES, RESPONSE_CACHE_MAX_DISK_BYTES
+
+def make_cache_key(request: Dict[str, Any]) -> str:
+    """
+    make_cache_key function
+
+    Parameters:
+        request (Dict[str, Any]): A Messages API request body.
+
+    Returns:
+        str: A stable SHA-256 hex digest of the model, system prompt and messages of the request.
+    """
+    payload = {
+        "model": request.get("model"),
+        "system": request.get("system"),
+        "messages": request.get("messages"),
+    }
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+class ResponseCache:
+    """
+    Content-addressed cache of API responses.
+
+    Responses are stored as the list of text chunks they were received in, so
+    streaming calls can replay them through the same generator interface.
+    Lookups go to a bounded in-memory LRU first, then to an on-disk store that
+    evicts its least recently used entries once it exceeds max_disk_bytes.
+    """
+
+    def __init__(self, cache_dir: str = RESPONSE_CACHE_DIR,
+                 max_memory_entries: int = RESPONSE_CACHE_MEMORY_ENTRIES,
+                 max_disk_bytes: int = RESPONSE_CACHE_MAX_DISK_BYTES):
+        self.cache_dir = cache_dir
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.enabled = True
+        self.hits = 0
+        self.misses = 0
+        self._memory: "OrderedDict[str, List[str]]" = OrderedDict()
+        self._disk_bytes: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Optional[List[str]]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            chunks = self._memory.get(key)
+            if chunks is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return chunks
+        chunks = self._read_disk(key)
+        with self._lock:
+            if chunks is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._remember(key, chunks)
+        return chunks
+
+    def put(self, key: str, chunks: List[str]):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._remember(key, chunks)
+        self._write_disk(key, chunks)
+
+    def clear(self) -> int:
+        with self._lock:
+            self._memory.clear()
+            removed = 0
+            for path, _, _ in self._disk_entries():
+                try:
+                    os.remove(path)
+                    removed += 1
+                except OSError:
+                    pass
+            self._disk_bytes = 0
+            return removed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "disk_bytes": self._disk_bytes,
+            }
+
+    def _remember(self, key: str, chunks: List[str]):
+        self._memory[key] = chunks
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _read_disk(self, key: str) -> Optional[List[str]]:
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                chunks = json.load(f)
+            # Touch the entry so eviction sees it as recently used.
+            os.utime(path)
+            return chunks
+        except FileNotFoundError:
+            return None
+        except (OSError, json.JSONDecodeError) as e:
+            logging.warning(f"Discarding unreadable cache entry {path}: {str(e)}")
+            return None
+
+    def _write_disk(self, key: str, chunks: List[str]):
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(chunks, f, ensure_ascii=False)
+            size = os.path.getsize(tmp_path)
+        except OSError as e:
+            logging.warning(f"Could not write cache entry {path}: {str(e)}")
+            return
+        with self._lock:
+            # Replaced under the lock so the size of the entry being overwritten is the one subtracted.
+            try:
+                previous = os.path.getsize(path)
+            except OSError:
+                previous = 0
+            try:
+                os.replace(tmp_path, path)
+            except OSError as e:
+                logging.warning(f"Could not write cache entry {path}: {str(e)}")
+                return
+            if self._disk_bytes is None:
+                self._disk_bytes = sum(entry_size for _, entry_size, _ in self._disk_entries())
+            else:
+                self._disk_bytes += size - previous
+            if self._disk_bytes > self.max_disk_bytes:
+                self._evict_disk()
+
+    def _disk_entries(self):
+        if not os.path.isdir(self.cache_dir):
+            return
+        for shard in os.scandir(self.cache_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith(".json"):
+                    stat = entry.stat()
+                    yield entry.path, stat.st_size, stat.st_mtime
+
+    def _evict_disk(self):
+        # Evict least recently used entries down to 90% of the limit so we don't evict on every write.
+        entries = sorted(self._disk_entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        target = self.max_disk_bytes * 0.9
+        for path, size, _ in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self._disk_bytes = total
+        logging.info(f"Evicted response cache entries; disk usage is now {total} bytes")
@@ -0,0 +1,158 @@
+import json
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+import logging
+from typing import Dict, List, Optional
+from config import SESSION_LOG_DIR
+from history_manager import estimate_tokens
+
+# The index holds the byte offset of every record in the log, 8 bytes each,
+# so record N is found without reading anything before it.
+INDEX_ENTRY = struct.Struct("<Q")
+
+# Session names become file names, so they are kept to one plain path component.
+SESSION_NAME = re.compile(r"[A-Za-z0-9_][A-Za-z0-9_.-]*")
+
+def validate_session_name(name: str) -> str:
+    """Return name if it can be used as a session log name; raise ValueError otherwise."""
+    if not SESSION_NAME.fullmatch(name) or ".." in name:
+        raise ValueError(f"Invalid session name '{name}': use letters, digits, '_', '-' and '.'")
+    return name
+
+def paired_turns(messages: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """
+    paired_turns function
+
+    Parameters:
+        messages (List[Dict[str, str]]): Logged messages, oldest first.
+
+    Returns:
+        List[Dict[str, str]]: The messages that form complete user/assistant exchanges, in order. Empty
+        messages, user turns that never got a reply (only the last of consecutive user turns was
+        answered) and a trailing unanswered user turn are left out.
+    """
+    turns: List[Dict[str, str]] = []
+    pending: Optional[Dict[str, str]] = None
+    for message in messages:
+        if not message["content"]:
+            continue
+        if message["role"] == "user":
+            pending = message
+        elif pending is not None:
+            turns.extend((pending, message))
+            pending = None
+    return turns
+
+class SessionLog:
+    """
+    Append-only JSON-lines log of a session's turns, with an offset index.
+
+    Each message is appended and flushed as it happens. Loading the tail maps
+    the index and the log and decodes only the records it returns, so resume
+    time does not grow with the length of the session.
+    """
+
+    def __init__(self, name: str, log_dir: str = SESSION_LOG_DIR):
+        self.name = validate_session_name(name)
+        os.makedirs(log_dir, exist_ok=True)
+        self.log_path = os.path.join(log_dir, f"{name}.jsonl")
+        self.index_path = os.path.join(log_dir, f"{name}.idx")
+        self._lock = threading.Lock()
+        self._log = open(self.log_path, 'ab')
+        self._index = open(self.index_path, 'ab')
+        self._repair()
+
+    @staticmethod
+    def exists(name: str, log_dir: str = SESSION_LOG_DIR) -> bool:
+        return bool(SESSION_NAME.fullmatch(name)) and ".." not in name and os.path.exists(os.path.join(log_dir, f"{name}.jsonl"))
+
+    def __len__(self) -> int:
+        return os.path.getsize(self.index_path) // INDEX_ENTRY.size
+
+    def _repair(self):
+        """Index records written before a crash left the index behind, and drop a torn last record."""
+        index_size = os.path.getsize(self.index_path)
+        if index_size % INDEX_ENTRY.size:
+            os.truncate(self.index_path, index_size - index_size % INDEX_ENTRY.size)
+            index_size -= index_size % INDEX_ENTRY.size
+        log_size = os.path.getsize(self.log_path)
+        if index_size:
+            with open(self.index_path, 'rb') as f:
+                f.seek(index_size - INDEX_ENTRY.size)
+                offset = INDEX_ENTRY.unpack(f.read(INDEX_ENTRY.size))[0]
+        else:
+            offset = 0
+        with open(self.log_path, 'rb') as f:
+            f.seek(offset)
+            if index_size:
+                f.readline()
+            position = f.tell()
+            missing = []
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                missing.append(position)
+                position += len(line)
+        if position < log_size:
+            logging.warning(f"Truncating torn record at the end of {self.log_path}")
+            os.truncate(self.log_path, position)
+        if missing:
+            logging.info(f"Indexing {len(missing)} unindexed records in {self.log_path}")
+            self._index.write(b"".join(INDEX_ENTRY.pack(offset) for offset in missing))
+            self._index.flush()
+
+    def append(self, role: str, content: str):
+        record = json.dumps({"role": role, "content": content, "time": time.time()}).encode("utf-8") + b"\n"
+        with self._lock:
+            offset = self._log.tell()
+            self._log.write(record)
+            self._log.flush()
+            # The index is written after the record, so it never points past the end of the log.
+            self._index.write(INDEX_ENTRY.pack(offset))
+            self._index.flush()
+
+    def read_tail(self, max_tokens: int, max_messages: Optional[int] = None) -> List[Dict[str, str]]:
+        """
+        read_tail function
+
+        Parameters:
+            max_tokens (int): Stop once the messages returned would exceed this many estimated tokens.
+            max_messages (Optional[int]): Optional cap on the number of messages returned.
+
+        Returns:
+            List[Dict[str, str]]: The most recent messages, oldest first, starting with a user turn.
+        """
+        with self._lock:
+            count = len(self)
+            if count == 0:
+                return []
+            messages: List[Dict[str, str]] = []
+            tokens = 0
+            with open(self.index_path, 'rb') as index_file, open(self.log_path, 'rb') as log_file:
+                with mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ) as index, \
+                        mmap.mmap(log_file.fileno(), 0, access=mmap.ACCESS_READ) as log:
+                    end = len(log)
+                    for i in range(count - 1, -1, -1):
+                        if max_messages is not None and len(messages) >= max_messages:
+                            break
+                        start = INDEX_ENTRY.unpack_from(index, i * INDEX_ENTRY.size)[0]
+                        record = json.loads(log[start:end])
+                        end = start
+                        tokens += estimate_tokens(record["content"])
+                        if tokens > max_tokens and messages:
+                            break
+                        messages.append({"role": record["role"], "content": record["content"]})
+        messages.reverse()
+        # The API needs the conversation to start with a user turn.
+        while messages and messages[0]["role"] != "user":
+            messages.pop(0)
+        return messages
+
+    def close(self):
+        with self._lock:
+            self._log.close()
+            self._index.close()
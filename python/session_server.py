@@ -0,0 +1,316 @@
+import errno
+import hmac
+import json
+import os
+import secrets
+import socket
+import stat
+import socketserver
+import sys
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+from config import SERVER_SOCKET_PATH, SERVER_WORKERS, SERVER_SESSION_IDLE_TIMEOUT
+from session_log import validate_session_name
+
+class SessionEntry:
+    def __init__(self):
+        self.session = None
+        # Set once the session is built, or its construction failed (error is then set).
+        self.ready = threading.Event()
+        self.error: Optional[BaseException] = None
+        # Commands for one session run one at a time; different sessions run in parallel.
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+
+class SessionRegistry:
+    """Warm AssistantSessions by name, created on first use and evicted once idle."""
+
+    def __init__(self, session_factory: Callable[[str], Any], idle_timeout: float = SERVER_SESSION_IDLE_TIMEOUT):
+        self.session_factory = session_factory
+        self.idle_timeout = idle_timeout
+        self._sessions: Dict[str, SessionEntry] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str, cwd: Optional[str] = None) -> SessionEntry:
+        """
+        get function
+
+        Parameters:
+            name (str): The session's name.
+            cwd (Optional[str]): Working directory for a session created by this call.
+
+        Returns:
+            SessionEntry: The ready session entry. Only the entry is reserved under the registry lock; the
+            session (which may resume a long log) is built outside it, so other lookups don't wait, and
+            concurrent requests for the same new session wait for that one build. Raises whatever the
+            session factory raised.
+        """
+        with self._lock:
+            entry = self._sessions.get(name)
+            creating = entry is None
+            if creating:
+                entry = self._sessions[name] = SessionEntry()
+            entry.last_used = time.monotonic()
+        if not creating:
+            entry.ready.wait()
+            if entry.error is not None:
+                raise entry.error
+            return entry
+        try:
+            session = self.session_factory(name)
+            if cwd:
+                session.set_working_directory(cwd)
+        except BaseException as e:
+            with self._lock:
+                if self._sessions.get(name) is entry:
+                    del self._sessions[name]
+            entry.error = e
+            entry.ready.set()
+            raise
+        entry.session = session
+        entry.ready.set()
+        logging.info(f"Created session '{name}'")
+        return entry
+
+    def evict_idle(self) -> int:
+        now = time.monotonic()
+        evicted = 0
+        with self._lock:
+            for name, entry in list(self._sessions.items()):
+                # A session still being built, or whose lock is held (running a command), is not idle.
+                if (entry.ready.is_set() and now - entry.last_used > self.idle_timeout
+                        and entry.lock.acquire(blocking=False)):
+                    del self._sessions[name]
+                    entry.session.close()
+                    entry.lock.release()
+                    evicted += 1
+                    logging.info(f"Evicted idle session '{name}'")
+        return evicted
+
+    def names(self):
+        with self._lock:
+            return sorted(name for name, entry in self._sessions.items() if entry.session is not None)
+
+class SessionRequestHandler(socketserver.StreamRequestHandler):
+    """
+    One command per connection, as JSON lines.
+
+    The client sends {"token": token, "session": name, "command": text,
+    "cwd": path} and receives {"chunk": text} lines as output is produced,
+    then a final {"done": true, ...} or {"error": text} line. The token is
+    the one the server wrote to its token file (see token_path).
+    """
+
+    def send(self, message: Dict[str, Any]):
+        self.wfile.write((json.dumps(message) + "\n").encode("utf-8"))
+        self.wfile.flush()
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            # A client that connected and hung up, e.g. another server checking whether this one is alive.
+            return
+        try:
+            request = json.loads(line)
+            token = request.get("token")
+        except (ValueError, AttributeError) as e:
+            self.send({"error": f"Invalid request: {str(e)}"})
+            return
+        # Commands include 'system exec', so nothing runs without the server's token.
+        if not isinstance(token, str) or not hmac.compare_digest(token.encode("utf-8"), self.server.token.encode("utf-8")):
+            logging.warning("Rejected a request without a valid server token")
+            self.send({"error": "Not authorized: missing or wrong server token"})
+            return
+        try:
+            name = validate_session_name(request.get("session") or "default")
+            command = request["command"]
+        except (ValueError, KeyError, TypeError) as e:
+            self.send({"error": f"Invalid request: {str(e)}"})
+            return
+
+        if command == "sessions":
+            self.send({"chunk": "\n".join(self.server.registry.names())})
+            self.send({"done": True})
+            return
+
+        try:
+            entry = self.server.registry.get(name, request.get("cwd"))
+        except Exception as e:
+            logging.error(f"Error creating session '{name}': {str(e)}")
+            self.send({"error": f"Could not create session '{name}': {str(e)}"})
+            return
+        with entry.lock:
+            session = entry.session
+            try:
+                if session.is_chat_message(command):
+                    for chunk in session.stream_message_from_claude(command):
+                        self.send({"chunk": chunk})
+                else:
+                    self.send({"chunk": session.handle_command(command)})
+                self.send({"done": True, "working_directory": session.working_directory,
+                           "request_count": session.request_count})
+            except (BrokenPipeError, ConnectionResetError):
+                logging.info(f"Client of session '{name}' disconnected")
+            except Exception as e:
+                logging.error(f"Error running command for session '{name}': {str(e)}")
+                self.send({"error": str(e)})
+            finally:
+                entry.last_used = time.monotonic()
+
+class _WorkerPoolMixIn:
+    """Serve connections on a fixed-size thread pool instead of a thread per connection."""
+
+    def process_request(self, request, client_address):
+        self.executor.submit(self._process_request_worker, request, client_address)
+
+    def _process_request_worker(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+class UnixSessionServer(_WorkerPoolMixIn, socketserver.UnixStreamServer):
+    pass
+
+class TCPSessionServer(_WorkerPoolMixIn, socketserver.TCPServer):
+    allow_reuse_address = True
+
+def token_path(socket_path: str = SERVER_SOCKET_PATH, port: Optional[int] = None) -> str:
+    """The file holding the token of the server on socket_path, or on the TCP port if one is given."""
+    if port is not None:
+        return os.path.join(os.path.dirname(socket_path) or ".", f"server-{port}.token")
+    return f"{socket_path}.token"
+
+def _write_token(path: str) -> str:
+    token = secrets.token_hex(32)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    try:
+        # O_CREAT's mode does not apply to a file left over from an earlier run.
+        os.fchmod(fd, 0o600)
+        os.write(fd, token.encode("ascii"))
+    finally:
+        os.close(fd)
+    return token
+
+def read_token(socket_path: str = SERVER_SOCKET_PATH, port: Optional[int] = None) -> str:
+    with open(token_path(socket_path, port), 'r', encoding='ascii') as f:
+        return f.read().strip()
+
+def _bind_unix(socket_path: str) -> UnixSessionServer:
+    """Bind the Unix socket owner-only, replacing a socket left behind by a server that is gone."""
+    # Set before bind, so the socket is never reachable with wider permissions.
+    old_umask = os.umask(0o177)
+    try:
+        try:
+            return UnixSessionServer(socket_path, SessionRequestHandler)
+        except OSError as e:
+            if e.errno != errno.EADDRINUSE:
+                raise
+        if not stat.S_ISSOCK(os.lstat(socket_path).st_mode):
+            raise OSError(errno.EEXIST, f"{socket_path} exists and is not a socket")
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+            try:
+                probe.connect(socket_path)
+            except ConnectionRefusedError:
+                logging.info(f"Removing stale socket {socket_path}")
+                os.remove(socket_path)
+            else:
+                raise OSError(errno.EADDRINUSE, f"An assistant server is already listening on {socket_path}")
+        return UnixSessionServer(socket_path, SessionRequestHandler)
+    finally:
+        os.umask(old_umask)
+
+def serve(session_factory: Callable[[str], Any], socket_path: str = SERVER_SOCKET_PATH,
+          port: Optional[int] = None, workers: int = SERVER_WORKERS):
+    """
+    serve function
+
+    Parameters:
+        session_factory (Callable[[str], Any]): Creates a new AssistantSession with the given name.
+        socket_path (str): Unix socket to listen on when no port is given.
+        port (Optional[int]): Listen on this localhost TCP port instead of a Unix socket.
+        workers (int): Number of commands served concurrently.
+
+    Every request must carry the token written to token_path(socket_path, port), a file only the
+    server's user can read; the directory holding it and the socket is created owner-only.
+    """
+    directory = os.path.dirname(socket_path) or "."
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    if os.stat(directory).st_mode & 0o077:
+        logging.warning(f"{directory} is accessible to other users; the server token is still owner-only")
+    if port is not None:
+        server = TCPSessionServer(("127.0.0.1", port), SessionRequestHandler)
+        address = f"127.0.0.1:{port}"
+    else:
+        server = _bind_unix(socket_path)
+        address = socket_path
+    token_file = token_path(socket_path, port)
+    server.token = _write_token(token_file)
+    server.executor = ThreadPoolExecutor(max_workers=workers)
+    server.registry = SessionRegistry(session_factory)
+
+    stop = threading.Event()
+
+    def evict_loop():
+        while not stop.wait(min(60.0, server.registry.idle_timeout)):
+            server.registry.evict_idle()
+
+    threading.Thread(target=evict_loop, daemon=True).start()
+    print(f"Serving assistant sessions on {address} with {workers} workers", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        server.server_close()
+        server.executor.shutdown(wait=False)
+        for path in (token_file, socket_path if port is None else None):
+            if path and os.path.exists(path):
+                os.remove(path)
+
+def _connect(socket_path: str, port: Optional[int]) -> socket.socket:
+    if port is not None:
+        return socket.create_connection(("127.0.0.1", port))
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(socket_path)
+    return sock
+
+def send_command(session_name: str, command: str, socket_path: str = SERVER_SOCKET_PATH, port: Optional[int] = None):
+    """Send one command to a running server and yield its response messages as they arrive."""
+    token = read_token(socket_path, port)
+    with _connect(socket_path, port) as sock:
+        request = {"token": token, "session": session_name, "command": command, "cwd": os.getcwd()}
+        sock.sendall((json.dumps(request) + "\n").encode("utf-8"))
+        with sock.makefile("r", encoding="utf-8") as responses:
+            for line in responses:
+                yield json.loads(line)
+
+def attach(session_name: str, socket_path: str = SERVER_SOCKET_PATH, port: Optional[int] = None):
+    print(f"Attached to session '{session_name}'. Type 'quit' to detach.")
+    while True:
+        try:
+            user_input = input("You: ")
+        except EOFError:
+            break
+        if user_input.lower() == 'quit':
+            break
+        if not user_input.strip():
+            continue
+        try:
+            print("Assistant: ", end="", flush=True)
+            for message in send_command(session_name, user_input, socket_path, port):
+                if "chunk" in message:
+                    print(message["chunk"], end="", flush=True)
+                elif "error" in message:
+                    print(f"Error: {message['error']}", end="")
+            print()
+        except OSError as e:
+            print(f"Could not reach the assistant server: {str(e)}")
+        except KeyboardInterrupt:
+            print("\nKeyboard interrupt detected. Type 'quit' to detach or continue with your next input.")
@@ -0,0 +1,114 @@
+import json
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+class SSEEvent:
+    def __init__(self, event: str, data: str):
+        self.event = event
+        self.data = data
+
+    def json(self) -> Any:
+        return json.loads(self.data)
+
+class SSEDecoder:
+    """
+    Incremental server-sent-event decoder.
+
+    Bytes are fed in as they arrive from the socket. Only the trailing partial
+    line is kept between calls, so the body is never re-buffered.
+    """
+
+    def __init__(self):
+        self._partial = b""
+        self._event = ""
+        self._data: List[str] = []
+
+    def feed(self, chunk: bytes) -> List[SSEEvent]:
+        if self._partial:
+            chunk = self._partial + chunk
+        events = []
+        start = 0
+        while True:
+            end = chunk.find(b"\n", start)
+            if end == -1:
+                break
+            line = chunk[start:end]
+            if line.endswith(b"\r"):
+                line = line[:-1]
+            start = end + 1
+            event = self._process_line(line.decode("utf-8"))
+            if event is not None:
+                events.append(event)
+        self._partial = chunk[start:]
+        return events
+
+    def flush(self) -> List[SSEEvent]:
+        events = self.feed(b"\n") if self._partial else []
+        event = self._dispatch()
+        if event is not None:
+            events.append(event)
+        return events
+
+    def iter_events(self, chunks: Iterable[bytes]) -> Iterator[SSEEvent]:
+        for chunk in chunks:
+            yield from self.feed(chunk)
+        yield from self.flush()
+
+    def _process_line(self, line: str) -> Optional[SSEEvent]:
+        if not line:
+            return self._dispatch()
+        if line.startswith(":"):
+            return None
+        field, _, value = line.partition(":")
+        if value.startswith(" "):
+            value = value[1:]
+        if field == "event":
+            self._event = value
+        elif field == "data":
+            self._data.append(value)
+        return None
+
+    def _dispatch(self) -> Optional[SSEEvent]:
+        if not self._data:
+            self._event = ""
+            return None
+        event = SSEEvent(self._event or "message", "\n".join(self._data))
+        self._event = ""
+        self._data = []
+        return event
+
+class StreamMetrics:
+    """Timing of a single streamed response: time to first token, tokens/sec and duration."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.first_token_at: Optional[float] = None
+        self.end: Optional[float] = None
+        self.chunks = 0
+        self.characters = 0
+        self.input_tokens: Optional[int] = None
+        self.output_tokens: Optional[int] = None
+
+    def record_chunk(self, text: str):
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        self.chunks += 1
+        self.characters += len(text)
+
+    def finish(self):
+        if self.end is None:
+            self.end = time.perf_counter()
+
+    def to_dict(self) -> Dict[str, Any]:
+        end = self.end if self.end is not None else time.perf_counter()
+        # Fall back to the usual ~4 characters per token when the server sent no usage.
+        output_tokens = self.output_tokens if self.output_tokens is not None else self.characters / 4
+        generation_time = end - self.first_token_at if self.first_token_at is not None else 0.0
+        return {
+            "time_to_first_token": self.first_token_at - self.start if self.first_token_at is not None else None,
+            "tokens_per_second": output_tokens / generation_time if generation_time > 0 else None,
+            "duration": end - self.start,
+            "chunks": self.chunks,
+            "input_tokens": self.input_tokens,
+            "output_tokens": output_tokens,
+        }
@@ -0,0 +1,29 @@
+import sys
+import time
+import logging
+from contextlib import contextmanager
+from typing import List, Tuple
+
+# Set by main's --startup-profile flag; lazily initialized subsystems then report as they load.
+enabled = False
+
+_phases: List[Tuple[str, float]] = []
+
+def record_phase(name: str, seconds: float):
+    _phases.append((name, seconds))
+    logging.debug(f"Startup phase '{name}' took {seconds * 1000:.1f}ms")
+    if enabled:
+        print(f"[startup] {name}: {seconds * 1000:.1f}ms", file=sys.stderr)
+
+@contextmanager
+def startup_phase(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_phase(name, time.perf_counter() - start)
+
+def format_startup_profile() -> str:
+    lines = [f"  {name:<32} {seconds * 1000:9.1f}ms" for name, seconds in _phases]
+    lines.append(f"  {'total':<32} {sum(seconds for _, seconds in _phases) * 1000:9.1f}ms")
+    return "Startup profile:\n" + "\n".join(lines)
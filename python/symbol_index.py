@@ -0,0 +1,204 @@
+import hashlib
+import os
+import sqlite3
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from config import INDEX_DIR, INDEX_WORKERS, INDEX_MAX_FILE_BYTES
+from file_tree import iter_files
+from language_queries import EXTENSION_TO_LANGUAGE
+from metrics import instrument
+
+# Below this many changed files the work is done in-process; a pool costs more to start than it saves.
+POOL_MIN_FILES = 64
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    hash TEXT
+);
+CREATE TABLE IF NOT EXISTS symbols (
+    name TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    path TEXT NOT NULL,
+    line INTEGER NOT NULL,
+    end_line INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS symbols_name ON symbols (name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS symbols_path ON symbols (path);
+"""
+
+def index_location(root: str, name: str) -> str:
+    """Return where the index called name for the directory root is stored."""
+    digest = hashlib.sha1(os.path.abspath(root).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(INDEX_DIR, f"{digest}-{name}.sqlite")
+
+def find_index_root(directory: str, name: str) -> Optional[str]:
+    """Return the directory, or its nearest ancestor, that has an index called name."""
+    current = os.path.abspath(directory)
+    while True:
+        if os.path.exists(index_location(current, name)):
+            return current
+        parent = os.path.dirname(current)
+        if parent == current:
+            return None
+        current = parent
+
+def open_index(db_path: str, schema: str) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    connection = sqlite3.connect(db_path)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.executescript(schema)
+    return connection
+
+def scan_tree(root: str, known: Dict[str, Tuple], include: Optional[List[str]] = None) -> Tuple[set, Dict[str, Tuple[int, int]]]:
+    """
+    scan_tree function
+
+    Parameters:
+        root (str): The indexed directory.
+        known (Dict[str, Tuple]): Indexed files by relative path, each starting with (mtime_ns, size).
+        include (Optional[List[str]]): Only consider files matching one of these globs.
+
+    Returns:
+        Tuple[set, Dict[str, Tuple[int, int]]]: Every indexable file under root, and the (mtime_ns, size)
+        of those that are new or whose mtime or size changed. Files over INDEX_MAX_FILE_BYTES are left out.
+    """
+    seen = set()
+    changed = {}
+    for relative in iter_files(root, recursive=True, include=include):
+        try:
+            st = os.stat(os.path.join(root, relative))
+        except OSError:
+            continue
+        if st.st_size > INDEX_MAX_FILE_BYTES:
+            continue
+        seen.add(relative)
+        previous = known.get(relative)
+        if previous and previous[0] == st.st_mtime_ns and previous[1] == st.st_size:
+            continue
+        changed[relative] = (st.st_mtime_ns, st.st_size)
+    return seen, changed
+
+def _index_file(task: Tuple[str, str, Optional[str]]) -> Tuple[str, Optional[str], Optional[List[Tuple]], Optional[str]]:
+    """Pool worker: return (path, hash, symbols, error). symbols is None when the hash is unchanged."""
+    relative, path, known_hash = task
+    try:
+        with open(path, 'rb') as f:
+            source = f.read()
+        digest = hashlib.sha1(source).hexdigest()
+        if digest == known_hash:
+            return relative, digest, None, None
+        if path.endswith(".py"):
+            from code_analyzer import extract_python_symbols
+            symbols = extract_python_symbols(source.decode("utf-8", errors="replace"))
+        else:
+            from parser_registry import parse_symbols
+            symbols = parse_symbols(path)
+        return relative, digest, [(s["name"], s["kind"], s["line"], s["end_line"]) for s in symbols], None
+    except Exception as e:
+        return relative, None, [], str(e)
+
+class SymbolIndex:
+    """
+    Classes, functions, methods, imports and exports of every supported file under a directory.
+
+    The index lives in SQLite. update() only re-parses files whose mtime or
+    size changed and whose content hash differs, spreading the work over a
+    process pool; lookups by name use an index and take milliseconds.
+    """
+
+    def __init__(self, root: str, db_path: Optional[str] = None):
+        self.root = os.path.abspath(root)
+        self.db_path = db_path or index_location(self.root, "symbols")
+        self.connection = open_index(self.db_path, SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @instrument("index.symbols.update")
+    def update(self, workers: int = INDEX_WORKERS) -> Dict[str, Any]:
+        """
+        update function
+
+        Parameters:
+            workers (int): Processes used to parse changed files.
+
+        Returns:
+            Dict[str, Any]: Counts of files scanned, parsed, unchanged, removed and failed, and the time taken.
+        """
+        start = time.perf_counter()
+        known = {path: (mtime, size, digest) for path, mtime, size, digest
+                 in self.connection.execute("SELECT path, mtime_ns, size, hash FROM files")}
+        include = [f"*{extension}" for extension in EXTENSION_TO_LANGUAGE]
+        seen, stats = scan_tree(self.root, known, include)
+        tasks = [(relative, os.path.join(self.root, relative), known[relative][2] if relative in known else None)
+                 for relative in stats]
+
+        if len(tasks) >= POOL_MIN_FILES and workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                chunksize = max(1, min(256, len(tasks) // (workers * 4)))
+                results = list(executor.map(_index_file, tasks, chunksize=chunksize))
+        else:
+            results = [_index_file(task) for task in tasks]
+
+        parsed = unchanged = errors = 0
+        removed = set(known) - seen
+        with self.connection:
+            for relative, digest, symbols, error in results:
+                mtime, size = stats[relative]
+                if error:
+                    errors += 1
+                    logging.warning(f"Could not index {relative}: {error}")
+                if symbols is None:
+                    unchanged += 1
+                    self.connection.execute("UPDATE files SET mtime_ns = ?, size = ? WHERE path = ?", (mtime, size, relative))
+                    continue
+                parsed += 0 if error else 1
+                # Failed files are recorded too, so they are retried only once they change.
+                self.connection.execute("DELETE FROM symbols WHERE path = ?", (relative,))
+                self.connection.executemany("INSERT INTO symbols (name, kind, path, line, end_line) VALUES (?, ?, ?, ?, ?)",
+                                            [(name, kind, relative, line, end_line) for name, kind, line, end_line in symbols])
+                self.connection.execute("INSERT OR REPLACE INTO files (path, mtime_ns, size, hash) VALUES (?, ?, ?, ?)",
+                                        (relative, mtime, size, digest))
+            for relative in removed:
+                self.connection.execute("DELETE FROM symbols WHERE path = ?", (relative,))
+                self.connection.execute("DELETE FROM files WHERE path = ?", (relative,))
+
+        return {"files": len(seen), "parsed": parsed, "unchanged": unchanged, "removed": len(removed),
+                "errors": errors, "seconds": time.perf_counter() - start}
+
+    @instrument("index.symbols.find")
+    def find(self, name: str, kind: Optional[str] = None, limit: int = 100) -> List[Tuple[str, str, str, int]]:
+        """
+        find function
+
+        Parameters:
+            name (str): The symbol name. Matched case-insensitively, with exact-case matches first;
+                a name containing * ? or [ is a case-sensitive glob.
+            kind (Optional[str]): Only return symbols of this kind (class, function, method, import, export).
+            limit (int): Maximum number of results.
+
+        Returns:
+            List[Tuple[str, str, str, int]]: (name, kind, path relative to the index root, line) tuples.
+        """
+        if any(c in name for c in "*?["):
+            sql, params = "SELECT name, kind, path, line FROM symbols WHERE name GLOB ?", [name]
+        else:
+            sql, params = "SELECT name, kind, path, line FROM symbols WHERE name = ? COLLATE NOCASE", [name]
+        if kind:
+            sql += " AND kind = ?"
+            params.append(kind)
+        sql += " ORDER BY name = ? DESC, path, line LIMIT ?"
+        params.extend([name, limit])
+        return self.connection.execute(sql, params).fetchall()
@@ -0,0 +1,98 @@
+import asyncio
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+import aiohttp
+from async_api_client import AsyncAnthropicAPIClient
+from fake_anthropic_server import FakeAnthropicServer, FakeMessagesHandler
+from request_scheduler import RequestScheduler
+
+class FailingHandler(FakeMessagesHandler):
+    """Answers every request with the server's configured error status."""
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.server.hits += 1
+        body = json.dumps({"type": "error", "error": {"type": "invalid_request_error"}}).encode("utf-8")
+        self.send_response(self.server.status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if self.server.retry_after is not None:
+            self.send_header("Retry-After", self.server.retry_after)
+        self.end_headers()
+        self.wfile.write(body)
+
+class FailingServer(FakeAnthropicServer):
+    def __init__(self, status: int, retry_after=None):
+        super().__init__()
+        self.RequestHandlerClass = FailingHandler
+        self.status = status
+        self.retry_after = retry_after
+        self.hits = 0
+
+class AsyncAnthropicAPIClientTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.server = FakeAnthropicServer(response_tokens=5).start()
+        self.scheduler = RequestScheduler(requests_per_minute=0, tokens_per_minute=0)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def client(self, url=None, **kwargs) -> AsyncAnthropicAPIClient:
+        return AsyncAnthropicAPIClient(api_url=url or self.server.url, scheduler=self.scheduler, **kwargs)
+
+    async def test_send_message(self):
+        async with self.client() as client:
+            reply = await client.send_message("Hello", "system", [])
+        self.assertEqual(reply, "word0 word1 word2 word3 word4 ")
+
+    async def test_stream_message(self):
+        async with self.client() as client:
+            chunks = [chunk async for chunk in client.stream_message("Hello", "system", [])]
+        self.assertEqual(len(chunks), 5)
+        self.assertEqual("".join(chunks), "word0 word1 word2 word3 word4 ")
+
+    async def test_batch_keeps_input_order(self):
+        async with self.client(concurrency=3) as client:
+            results = await client.batch([f"prompt {i}" for i in range(8)], stream=True)
+        self.assertEqual(results, ["word0 word1 word2 word3 word4 "] * 8)
+
+    async def test_error_status_releases_connection(self):
+        server = FailingServer(400).start()
+        try:
+            async with self.client(url=server.url, pool_size=1) as client:
+                for _ in range(3):
+                    with self.assertRaises(aiohttp.ClientResponseError) as raised:
+                        await asyncio.wait_for(client.send_message("Hello", "system", []), timeout=5)
+                    self.assertEqual(raised.exception.status, 400)
+        finally:
+            server.stop()
+        # With a pool of one, a leaked connection would make the later requests hang.
+        self.assertEqual(server.hits, 3)
+
+    async def test_retries_overloaded_responses(self):
+        server = FailingServer(529, retry_after="0").start()
+        try:
+            async with self.client(url=server.url, max_retries=2) as client:
+                with self.assertRaises(aiohttp.ClientResponseError):
+                    await client.send_message("Hello", "system", [])
+        finally:
+            server.stop()
+        self.assertEqual(server.hits, 3)
+
+    async def test_batch_reports_failures_per_prompt(self):
+        server = FailingServer(400).start()
+        try:
+            async with self.client(url=server.url) as client:
+                results = await client.batch(["a", "b"])
+        finally:
+            server.stop()
+        self.assertTrue(all(isinstance(result, aiohttp.ClientResponseError) for result in results))
+
+if __name__ == "__main__":
+    unittest.main()
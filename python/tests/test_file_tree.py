@@ -0,0 +1,97 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from file_tree import DirectoryCache, IgnoreRules, iter_files, parse_ignore_file
+from file_utils import list_files
+
+# (.gitignore lines, path relative to the .gitignore's directory, is a directory, ignored)
+IGNORE_CASES = [
+    (["*.log"], "a.log", False, True),
+    (["*.log"], "deep/er/a.log", False, True),
+    (["*.log"], "a.logx", False, False),
+    (["/build"], "build", True, True),
+    (["/build"], "src/build", True, False),
+    (["doc/*.txt"], "doc/a.txt", False, True),
+    (["doc/*.txt"], "doc/sub/a.txt", False, False),
+    (["doc/*.txt"], "other/doc/a.txt", False, False),
+    (["**/foo"], "foo", True, True),
+    (["**/foo"], "a/b/foo", False, True),
+    (["a/**/b"], "a/b", False, True),
+    (["a/**/b"], "a/x/y/b", False, True),
+    (["a/**/b"], "c/a/b", False, False),
+    (["logs/**"], "logs/x/y.txt", False, True),
+    (["logs/**"], "other/logs/x.txt", False, False),
+    (["build/"], "build", True, True),
+    (["build/"], "build", False, False),
+    (["build/"], "src/build", True, True),
+    (["?.py"], "a.py", False, True),
+    (["?.py"], "ab.py", False, False),
+    (["[abc].txt"], "b.txt", False, True),
+    (["[!abc].txt"], "b.txt", False, False),
+    (["[!abc].txt"], "d.txt", False, True),
+    (["\\#name"], "#name", False, True),
+    (["\\!name"], "!name", False, True),
+    (["# comment"], "# comment", False, False),
+    (["trailing   "], "trailing", False, True),
+    (["*.log", "!keep.log"], "keep.log", False, False),
+    (["*.log", "!keep.log"], "other.log", False, True),
+    (["!keep.log", "*.log"], "keep.log", False, True),
+]
+
+@pytest.mark.parametrize("lines, path, is_dir, expected", IGNORE_CASES)
+def test_ignore_patterns(lines, path, is_dir, expected):
+    rules = IgnoreRules().push("/repo", parse_ignore_file([line + "\n" for line in lines]))
+    assert rules.ignored("/repo/" + path, is_dir) is expected
+
+def test_nested_ignore_files_layer():
+    rules = IgnoreRules().push("/repo", parse_ignore_file(["*.py\n"]))
+    rules = rules.push("/repo/sub", parse_ignore_file(["!keep.py\n", "/local.txt\n"]))
+    assert rules.ignored("/repo/sub/other.py", False)
+    assert not rules.ignored("/repo/sub/keep.py", False)
+    assert rules.ignored("/repo/sub/local.txt", False)
+    assert not rules.ignored("/repo/sub/deeper/local.txt", False)
+
+def write(root, relative, content=""):
+    path = os.path.join(root, relative)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(content)
+
+@pytest.fixture
+def repo(tmp_path):
+    root = str(tmp_path)
+    os.mkdir(os.path.join(root, ".git"))
+    write(root, ".gitignore", "*.log\nbuild/\n!important.log\n/top.txt\n")
+    for relative in ("a.py", "a.log", "important.log", "top.txt", "build/out.py", "build/keep.log",
+                     "sub/top.txt", "sub/x.py", "sub/keep.py", "sub/a.log", "sub/important.log"):
+        write(root, relative)
+    write(root, "sub/.gitignore", "*.py\n!keep.py\n")
+    return root
+
+def test_iter_files_applies_layered_ignore_files(repo):
+    assert list(iter_files(repo, cache=DirectoryCache())) == [
+        ".gitignore", "a.py", "important.log",
+        "sub/.gitignore", "sub/important.log", "sub/keep.py", "sub/top.txt",
+    ]
+
+def test_iter_files_inherits_rules_from_repository_ancestors(repo):
+    assert list(iter_files(os.path.join(repo, "sub"), cache=DirectoryCache())) == [
+        ".gitignore", "important.log", "keep.py", "top.txt",
+    ]
+
+def test_iter_files_without_ignore_files(repo):
+    files = list(iter_files(repo, use_ignore_files=False, cache=DirectoryCache()))
+    assert "a.log" in files and "build/out.py" in files and "sub/x.py" in files
+    assert not any(path.startswith(".git/") for path in files)
+
+def test_non_recursive_list_files_ignores_gitignore(repo):
+    assert list_files(repo) == [".gitignore", "a.log", "a.py", "important.log", "top.txt"]
+    assert list_files(repo, use_ignore_files=True) == [".gitignore", "a.py", "important.log"]
+
+def test_recursive_list_files_applies_gitignore(repo):
+    assert "a.log" not in list_files(repo, recursive=True)
+    assert "a.log" in list_files(repo, recursive=True, use_ignore_files=False)
@@ -0,0 +1,310 @@
+import os
+import sys
+import threading
+import types
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import parser_registry
+from parser_registry import ParseCache, ParsedFile, ParserRegistry, parse_symbols
+
+class StandInLanguage:
+    loaded = []
+
+    def __init__(self, library_path, name):
+        self.name = name
+        StandInLanguage.loaded.append(name)
+
+    def query(self, source):
+        return ("query", self.name)
+
+class StandInParser:
+    def set_language(self, language):
+        self.language = language
+
+@pytest.fixture
+def stand_in_tree_sitter(monkeypatch):
+    StandInLanguage.loaded = []
+    module = types.SimpleNamespace(Language=StandInLanguage, Parser=StandInParser)
+    monkeypatch.setitem(sys.modules, "tree_sitter", module)
+    return module
+
+def test_parsers_are_per_thread_and_languages_shared(stand_in_tree_sitter):
+    registry = ParserRegistry("unused.so")
+    assert registry.parser("python") is registry.parser("python")
+    parsers = []
+    threads = [threading.Thread(target=lambda: parsers.append(registry.parser("python"))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    parsers.append(registry.parser("python"))
+    assert len({id(parser) for parser in parsers}) == 5
+    assert all(parser.language is registry.language("python") for parser in parsers)
+    assert StandInLanguage.loaded == ["python"]
+    assert registry.query("python") is registry.query("python")
+
+class StandInRegistry:
+    """Counts parses; trees and queries are placeholders for the patched extract_symbols."""
+
+    def __init__(self):
+        self.parses = 0
+
+    def parser(self, language):
+        registry = self
+
+        class Parser:
+            def parse(self, source, old_tree=None):
+                registry.parses += 1
+                return types.SimpleNamespace(root_node=source)
+
+        return Parser()
+
+    def query(self, language):
+        return None
+
+@pytest.fixture
+def stand_ins(monkeypatch):
+    registry = StandInRegistry()
+    incremental = []
+    # One "symbol" per line of the source, so results show which content they came from.
+    monkeypatch.setattr(parser_registry, "extract_symbols",
+                        lambda query, root, source, *points: [{"kind": "function", "name": line.decode(),
+                                                               "line": 1, "end_line": 1}
+                                                              for line in source.splitlines()])
+
+    def reparse(entry, source, registry):
+        incremental.append(source)
+        return registry.parser(entry.language).parse(source, entry.tree), parser_registry.extract_symbols(None, None, source)
+
+    monkeypatch.setattr(parser_registry, "reparse_incrementally", reparse)
+    return registry, incremental
+
+def write(path, data: bytes, mtime_ns=None):
+    with open(path, 'wb') as f:
+        f.write(data)
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+def names(symbols):
+    return [symbol["name"] for symbol in symbols]
+
+def test_unchanged_file_is_a_hit(tmp_path, stand_ins):
+    registry, _ = stand_ins
+    path = str(tmp_path / "a.py")
+    write(path, b"one\n")
+    cache = ParseCache()
+    assert names(parse_symbols(path, registry, cache)) == ["one"]
+    assert names(parse_symbols(path, registry, cache)) == ["one"]
+    assert (cache.hits, cache.misses, registry.parses) == (1, 1, 1)
+
+def test_touched_file_is_not_reparsed(tmp_path, stand_ins):
+    registry, incremental = stand_ins
+    path = str(tmp_path / "a.py")
+    write(path, b"one\n", 1_000_000_000)
+    cache = ParseCache()
+    parse_symbols(path, registry, cache)
+    write(path, b"one\n", 2_000_000_000)
+    assert names(parse_symbols(path, registry, cache)) == ["one"]
+    assert (cache.misses, registry.parses, incremental) == (2, 1, [])
+    # The new key is stored, so the next call is a hit again.
+    parse_symbols(path, registry, cache)
+    assert cache.hits == 1
+
+@pytest.mark.parametrize("new_content, new_mtime", [
+    (b"two\n", 2_000_000_000),        # same size, new mtime
+    (b"three\n", 1_000_000_000),      # same mtime, new size
+])
+def test_key_change_reparses_incrementally(tmp_path, stand_ins, new_content, new_mtime):
+    registry, incremental = stand_ins
+    path = str(tmp_path / "a.py")
+    write(path, b"one\n", 1_000_000_000)
+    cache = ParseCache()
+    parse_symbols(path, registry, cache)
+    write(path, new_content, new_mtime)
+    assert names(parse_symbols(path, registry, cache)) == [new_content.decode().strip()]
+    assert incremental == [new_content]
+    assert cache.incremental == 1
+
+def test_same_key_is_trusted(tmp_path, stand_ins):
+    # The (mtime_ns, size) key is the contract: content changed without changing either is not noticed.
+    registry, _ = stand_ins
+    path = str(tmp_path / "a.py")
+    write(path, b"one\n", 1_000_000_000)
+    cache = ParseCache()
+    parse_symbols(path, registry, cache)
+    write(path, b"two\n", 1_000_000_000)
+    assert names(parse_symbols(path, registry, cache)) == ["one"]
+
+def test_failed_incremental_parse_falls_back(tmp_path, stand_ins, monkeypatch):
+    registry, _ = stand_ins
+    path = str(tmp_path / "a.py")
+    write(path, b"one\n", 1_000_000_000)
+    cache = ParseCache()
+    parse_symbols(path, registry, cache)
+
+    def broken(entry, source, registry):
+        raise RuntimeError("bad edit")
+
+    monkeypatch.setattr(parser_registry, "reparse_incrementally", broken)
+    write(path, b"two\n", 2_000_000_000)
+    assert names(parse_symbols(path, registry, cache)) == ["two"]
+    assert cache.incremental == 0 and registry.parses == 2
+
+def test_unsupported_extension(tmp_path, stand_ins):
+    registry, _ = stand_ins
+    path = str(tmp_path / "a.txt")
+    write(path, b"one\n")
+    with pytest.raises(ValueError):
+        parse_symbols(path, registry, ParseCache())
+
+def test_cache_evicts_least_recently_used():
+    cache = ParseCache(max_entries=2)
+    for name in ("a", "b", "c"):
+        cache.put(name, ParsedFile((0, 0), "python", b"", None, []))
+        if name == "b":
+            cache.get("a")
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+
+def test_counters_are_exact_under_threads(tmp_path, stand_ins):
+    registry, _ = stand_ins
+    path = str(tmp_path / "a.py")
+    write(path, b"one\n")
+    cache = ParseCache()
+    parse_symbols(path, registry, cache)
+
+    def worker():
+        for _ in range(500):
+            parse_symbols(path, registry, cache)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert (cache.hits, cache.misses) == (4000, 1)
+
+# Incremental re-parsing against the real grammars. They are built separately (see
+# config.TREE_SITTER_LIBRARY), so these tests skip when the library is not there.
+
+PYTHON_SOURCE = b'''import os
+from typing import List
+
+class Model:
+    """A model."""
+
+    def run(self, value):
+        return value + 1
+
+    def stop(self):
+        pass
+
+def helper(items: List[int]) -> int:
+    total = 0
+    for item in items:
+        total += item
+    return total
+
+class Other(Model):
+    def run(self, value):
+        return "\xc3\xa9t\xc3\xa9"
+
+def last():
+    return Model()
+'''
+
+JAVASCRIPT_SOURCE = b'''import fs from "fs";
+
+class Model {
+    run(value) {
+        return value + 1;
+    }
+}
+
+function helper(items) {
+    let total = 0;
+    for (const item of items) {
+        total += item;
+    }
+    return total;
+}
+
+export function last() {
+    return new Model();
+}
+'''
+
+SNIPPETS = {
+    "python": [b"def added(x):\n    return x\n", b"class Added:\n    def method(self):\n        pass\n",
+               b"\n", b"    ", b"import sys\n", b"name = '\xc3\xa9'\n", b"(", b")", b":", b"#", b"renamed", b"\t"],
+    "javascript": [b"function added(x) {\n    return x;\n}\n", b"class Added {\n    method() {}\n}\n",
+                   b"\n", b"{", b"}", b"import x from \"x\";\n", b"const s = '\xc3\xa9';\n", b"renamed", b"//"],
+}
+
+def random_edit(rng, source: bytes, snippets) -> bytes:
+    line_starts = [0] + [i + 1 for i, byte in enumerate(source) if byte == 0x0a]
+    # Edits at line starts keep the code mostly valid; edits anywhere exercise error recovery.
+    position = rng.choice(line_starts) if rng.random() < 0.6 else rng.randint(0, len(source))
+    action = rng.choice(("insert", "delete", "replace"))
+    deleted = rng.randint(1, 40) if action != "insert" else 0
+    inserted = rng.choice(snippets) if action != "delete" else b""
+    edited = source[:position] + inserted + source[position + deleted:]
+    # Never split a UTF-8 sequence; the files are read as whole characters.
+    try:
+        edited.decode("utf-8")
+    except UnicodeDecodeError:
+        return source
+    return edited
+
+@pytest.fixture(scope="module")
+def grammar_registry():
+    pytest.importorskip("tree_sitter")
+    from config import TREE_SITTER_LIBRARY
+    if not os.path.exists(TREE_SITTER_LIBRARY):
+        pytest.skip(f"No tree-sitter grammar library at {TREE_SITTER_LIBRARY}")
+    registry = ParserRegistry(TREE_SITTER_LIBRARY)
+    try:
+        registry.query("python")
+        registry.query("javascript")
+    except Exception as e:
+        pytest.skip(f"Grammars could not be loaded: {str(e)}")
+    return registry
+
+def full_parse(registry, language, source):
+    tree = registry.parser(language).parse(source)
+    return tree, parser_registry.extract_symbols(registry.query(language), tree.root_node, source)
+
+@pytest.mark.parametrize("language, source", [("python", PYTHON_SOURCE), ("javascript", JAVASCRIPT_SOURCE)])
+@pytest.mark.parametrize("seed", range(10))
+def test_incremental_symbols_match_full_parse(grammar_registry, language, source, seed):
+    import random
+    rng = random.Random(seed)
+    query = grammar_registry.query(language)
+    tree, symbols = full_parse(grammar_registry, language, source)
+    entry = ParsedFile((0, 0), language, source, tree, symbols)
+    for step in range(40):
+        edited = random_edit(rng, entry.source, SNIPPETS[language])
+        if edited == entry.source:
+            continue
+        tree, symbols = parser_registry.reparse_incrementally(entry, edited, grammar_registry)
+        context = f"step {step}:\n{edited.decode('utf-8')}"
+        assert symbols == parser_registry.extract_symbols(query, tree.root_node, edited), context
+        # tree-sitter may recover from syntax errors differently when it reuses the old tree, so
+        # only error-free sources must match a fresh parse exactly.
+        fresh_tree, fresh_symbols = full_parse(grammar_registry, language, edited)
+        if not (tree.root_node.has_error or fresh_tree.root_node.has_error):
+            assert symbols == fresh_symbols, context
+        entry = ParsedFile((0, 0), language, edited, tree, symbols)
+
+def test_parse_symbols_reuses_and_updates_the_tree(grammar_registry, tmp_path):
+    path = str(tmp_path / "module.py")
+    write(path, PYTHON_SOURCE, 1_000_000_000)
+    cache = ParseCache()
+    before = parse_symbols(path, grammar_registry, cache)
+    write(path, PYTHON_SOURCE.replace(b"def helper(", b"def renamed_helper("), 2_000_000_000)
+    after = parse_symbols(path, grammar_registry, cache)
+    assert cache.incremental == 1
+    assert [s["name"] for s in after] == [s["name"].replace("helper", "renamed_helper") for s in before]
@@ -0,0 +1,168 @@
+import difflib
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import atomic_files
+from atomic_files import WriteTransaction, atomic_write
+from file_reader import split_lines
+from file_utils import edit_file, patch_files
+from patch_utils import PatchError, apply_patch, parse_search_replace, parse_unified_diff
+
+def unified_diff(old: str, new: str, path: str = "f.txt", context: int = 3) -> str:
+    return "".join(difflib.unified_diff(split_lines(old), split_lines(new),
+                                        f"a/{path}", f"b/{path}", n=context))
+
+def mutate(rng: random.Random, lines):
+    lines = list(lines)
+    for _ in range(rng.randint(1, 4)):
+        position = rng.randint(0, len(lines))
+        action = rng.choice(("insert", "delete", "change"))
+        if action == "insert" or not lines:
+            lines[position:position] = [f"new {rng.random():.6f}\n" for _ in range(rng.randint(1, 3))]
+        elif action == "delete":
+            del lines[min(position, len(lines) - 1):min(position, len(lines) - 1) + rng.randint(1, 3)]
+        else:
+            lines[min(position, len(lines) - 1)] = f"changed {rng.random():.6f}\n"
+    return lines
+
+@pytest.mark.parametrize("seed", range(200))
+def test_difflib_round_trip(seed):
+    rng = random.Random(seed)
+    old = [f"line {i} {rng.choice('abc')}\n" for i in range(rng.randint(0, 40))]
+    new = mutate(rng, old)
+    old_text, new_text = "".join(old), "".join(new)
+    assert apply_patch(old_text, unified_diff(old_text, new_text, context=rng.randint(0, 3))) == new_text
+
+def test_missing_final_newline():
+    old = "a\nb\nc\n"
+    diff = "--- a/f\n+++ b/f\n@@ -2,2 +2,2 @@\n b\n-c\n+C\n\\ No newline at end of file\n"
+    assert apply_patch(old, diff) == "a\nb\nC"
+
+def test_hunk_applies_at_offset():
+    old = "".join(f"{i}\n" for i in range(20))
+    new = old.replace("10\n", "ten\n")
+    diff = unified_diff(old, new)
+    drifted = "".join(f"extra {i}\n" for i in range(7)) + old
+    assert apply_patch(drifted, diff) == "".join(f"extra {i}\n" for i in range(7)) + new
+
+def test_later_hunks_follow_the_drift_of_earlier_ones():
+    old = "".join(f"{i}\n" for i in range(60))
+    new = old.replace("5\n", "five\n").replace("50\n", "fifty\n")
+    drifted = "head\n" * 3 + old
+    assert apply_patch(drifted, unified_diff(old, new)) == "head\n" * 3 + new
+
+def test_lines_split_on_newline_only():
+    # Form feeds and other separators str.splitlines breaks at are ordinary characters in a line.
+    old = "page one\x0c\nsecond\x1c line\nthird line\nlast\n"
+    new = old.replace("last\n", "LAST\n")
+    assert apply_patch(old, unified_diff(old, new)) == new
+
+def test_search_replace():
+    blocks = parse_search_replace("<<<<<<< SEARCH\nb = 2\n=======\nb = 3\n>>>>>>> REPLACE\n")
+    assert blocks == [("b = 2\n", "b = 3\n")]
+    assert apply_patch("a = 1\nb = 2\n", "<<<<<<< SEARCH\nb = 2\n=======\nb = 3\n>>>>>>> REPLACE\n") == "a = 1\nb = 3\n"
+
+@pytest.mark.parametrize("patch_text, message", [
+    ("<<<<<<< SEARCH\nmissing\n=======\nx\n>>>>>>> REPLACE\n", "not found"),
+    ("<<<<<<< SEARCH\nsame\n=======\nx\n>>>>>>> REPLACE\n", "matches 2 times"),
+    ("<<<<<<< SEARCH\nsame\n=======\nx\n", "Unterminated"),
+])
+def test_search_replace_errors(patch_text, message):
+    with pytest.raises(PatchError, match=message):
+        apply_patch("same\nsame\n", patch_text)
+
+def test_malformed_diffs_are_rejected():
+    with pytest.raises(PatchError):
+        parse_unified_diff("no headers here\n")
+    with pytest.raises(PatchError):
+        parse_unified_diff("--- a/f\n+++ b/f\n@@ -1,3 +1,3 @@\n a\n")
+
+def write_bytes(path, data: bytes):
+    with open(path, 'wb') as f:
+        f.write(data)
+
+def read_bytes(path) -> bytes:
+    with open(path, 'rb') as f:
+        return f.read()
+
+def test_rejected_hunk_leaves_file_untouched(tmp_path):
+    path = str(tmp_path / "f.txt")
+    write_bytes(path, b"a\nb\nc\n")
+    result = edit_file(path, "--- a/f.txt\n+++ b/f.txt\n@@ -1,2 +1,2 @@\n a\n-x\n+y\n")
+    assert result.startswith("Error editing file")
+    assert read_bytes(path) == b"a\nb\nc\n"
+    assert os.listdir(str(tmp_path)) == ["f.txt"]
+
+def test_crlf_file_keeps_line_endings(tmp_path):
+    path = str(tmp_path / "f.txt")
+    write_bytes(path, b"one\r\ntwo\r\nthree\r\n")
+    diff = "--- a/f.txt\n+++ b/f.txt\n@@ -1,3 +1,3 @@\n one\n-two\n+TWO\n three\n"
+    assert not edit_file(path, diff).startswith("Error")
+    assert read_bytes(path) == b"one\r\nTWO\r\nthree\r\n"
+
+def test_crlf_search_replace(tmp_path):
+    path = str(tmp_path / "f.txt")
+    write_bytes(path, b"one\r\ntwo\r\n")
+    assert not edit_file(path, "<<<<<<< SEARCH\ntwo\n=======\n2\n>>>>>>> REPLACE\n").startswith("Error")
+    assert read_bytes(path) == b"one\r\n2\r\n"
+
+def test_multi_file_patch_is_all_or_nothing(tmp_path):
+    write_bytes(str(tmp_path / "a.txt"), b"a\n")
+    write_bytes(str(tmp_path / "b.txt"), b"b\n")
+    diff = unified_diff("a\n", "A\n", "a.txt") + "--- a/b.txt\n+++ b/b.txt\n@@ -1 +1 @@\n-nope\n+B\n"
+    assert patch_files(diff, str(tmp_path)).startswith("Error")
+    assert read_bytes(str(tmp_path / "a.txt")) == b"a\n"
+
+def test_transaction_commit(tmp_path):
+    keep, gone, new = (str(tmp_path / name) for name in ("keep.txt", "gone.txt", "new.txt"))
+    write_bytes(keep, b"old")
+    write_bytes(gone, b"gone")
+    transaction = WriteTransaction()
+    transaction.stage(keep, b"new")
+    transaction.stage(gone, None)
+    transaction.stage(new, b"created")
+    assert transaction.staged(keep) == (True, b"new")
+    assert transaction.commit() == [keep, gone, new]
+    assert read_bytes(keep) == b"new" and read_bytes(new) == b"created" and not os.path.exists(gone)
+    assert sorted(os.listdir(str(tmp_path))) == ["keep.txt", "new.txt"]
+
+def test_transaction_rolls_back_when_a_write_fails(tmp_path, monkeypatch):
+    first, second, third, created = (str(tmp_path / name) for name in ("1.txt", "2.txt", "3.txt", "new.txt"))
+    for path in (first, second, third):
+        write_bytes(path, b"original " + os.path.basename(path).encode())
+    transaction = WriteTransaction()
+    transaction.stage(first, b"changed")
+    transaction.stage(created, b"created")
+    transaction.stage(second, None)
+    transaction.stage(third, b"changed")
+
+    real_replace = os.replace
+
+    def failing_replace(source, destination):
+        if destination == third:
+            raise OSError("disk full")
+        return real_replace(source, destination)
+
+    monkeypatch.setattr(atomic_files.os, "replace", failing_replace)
+    with pytest.raises(OSError, match="disk full"):
+        transaction.commit()
+    monkeypatch.setattr(atomic_files.os, "replace", real_replace)
+
+    for path in (first, second, third):
+        assert read_bytes(path) == b"original " + os.path.basename(path).encode()
+    assert not os.path.exists(created)
+    # No temporary files or backups are left behind.
+    assert sorted(os.listdir(str(tmp_path))) == ["1.txt", "2.txt", "3.txt"]
+
+def test_atomic_write_keeps_mode(tmp_path):
+    path = str(tmp_path / "f.txt")
+    write_bytes(path, b"x")
+    os.chmod(path, 0o640)
+    atomic_write(path, b"y")
+    assert read_bytes(path) == b"y"
+    assert os.stat(path).st_mode & 0o777 == 0o640
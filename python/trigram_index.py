@@ -0,0 +1,327 @@
+import fnmatch
+import hashlib
+import os
+import re
+import time
+import zlib
+import logging
+from array import array
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import accumulate
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+from config import INDEX_WORKERS
+from metrics import instrument
+from symbol_index import POOL_MIN_FILES, index_location, open_index, scan_tree
+
+try:
+    import re._parser as sre_parse
+except ImportError:
+    import sre_parse
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    path TEXT UNIQUE NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    hash TEXT,
+    trigrams BLOB,
+    in_base INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS base_postings (
+    trigram INTEGER PRIMARY KEY,
+    ids BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS delta_postings (
+    trigram INTEGER NOT NULL,
+    file_id INTEGER NOT NULL,
+    PRIMARY KEY (trigram, file_id)
+) WITHOUT ROWID;
+"""
+
+# Files indexed since the last rebuild have row-per-trigram postings; once they exceed this share of
+# the index, the compressed base postings are rebuilt to include them.
+DELTA_REBUILD_FRACTION = 0.1
+DELTA_REBUILD_MIN_FILES = 500
+
+# Rebuilding the base holds at most about this many postings in memory at a time.
+REBUILD_POSTINGS_PER_PASS = 20_000_000
+
+# At most this many of a query's trigrams are used to look up candidates.
+MAX_QUERY_TRIGRAMS = 24
+
+# Matched lines are cut to this many characters in results.
+MAX_LINE_CHARS = 300
+
+def encode_ids(values) -> bytes:
+    """Compress a sorted sequence of integers as zlib-packed gaps."""
+    values = list(values)
+    gaps = array("I", [value - previous for value, previous in zip(values, [0] + values)])
+    return zlib.compress(gaps.tobytes(), 1)
+
+def decode_ids(blob: bytes) -> array:
+    gaps = array("I")
+    gaps.frombytes(zlib.decompress(blob))
+    return array("I", accumulate(gaps))
+
+def text_trigrams(data: bytes) -> Set[int]:
+    """Return the case-folded (ASCII) trigrams of some bytes as 24-bit integers."""
+    lowered = data.lower()
+    return {(a << 16) | (b << 8) | c for a, b, c in set(zip(lowered, lowered[1:], lowered[2:]))}
+
+def required_literals(pattern: str, flags: int = 0) -> List[str]:
+    """
+    required_literals function
+
+    Parameters:
+        pattern (str): A regular expression.
+        flags (int): re flags the pattern is compiled with.
+
+    Returns:
+        List[str]: Literal strings of three or more characters that every match must contain. Alternations,
+        optional parts and character classes end a literal; their contents are not required.
+    """
+    literals: List[str] = []
+    current: List[str] = []
+
+    def flush():
+        if len(current) >= 3:
+            literals.append("".join(current))
+        current.clear()
+
+    def walk(items):
+        for op, argument in items:
+            if op is sre_parse.LITERAL:
+                current.append(chr(argument))
+            elif op is sre_parse.SUBPATTERN:
+                walk(argument[-1])
+            elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT) or op is getattr(sre_parse, "POSSESSIVE_REPEAT", None):
+                minimum, _, body = argument
+                flush()
+                if minimum >= 1:
+                    walk(body)
+                    flush()
+            elif op is sre_parse.AT:
+                # Anchors match no characters, so the literals around them stay contiguous.
+                continue
+            else:
+                flush()
+
+    walk(sre_parse.parse(pattern, flags))
+    flush()
+    return literals
+
+def query_trigrams(literals: List[str], ignore_case: bool) -> Set[int]:
+    trigrams: Set[int] = set()
+    for literal in literals:
+        # The index folds ASCII case only, so a case-insensitive non-ASCII literal cannot narrow the search.
+        if ignore_case and not literal.isascii():
+            continue
+        trigrams |= text_trigrams(literal.encode("utf-8"))
+    return trigrams
+
+def _extract_file(task: Tuple[str, str, Optional[str]]) -> Tuple[str, Optional[str], Optional[bytes], Optional[str]]:
+    """Pool worker: return (path, hash, encoded trigrams, error). Trigrams are None when the hash is unchanged."""
+    relative, path, known_hash = task
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+        digest = hashlib.sha1(data).hexdigest()
+        if digest == known_hash:
+            return relative, digest, None, None
+        if b"\x00" in data[:8192]:
+            # Binary files are recorded without trigrams, so they never match.
+            return relative, digest, encode_ids([]), None
+        return relative, digest, encode_ids(sorted(text_trigrams(data))), None
+    except Exception as e:
+        return relative, None, encode_ids([]), str(e)
+
+class TrigramIndex:
+    """
+    Persistent trigram index of the text files under a directory, for literal and regex search.
+
+    Each file's trigrams (case-folded) are stored with it. For lookups,
+    files indexed at the last rebuild are covered by compressed per-trigram
+    id lists; files indexed since then by row-per-trigram delta postings,
+    which keep small updates cheap. A changed file gets a new id, so stale
+    base postings simply point at ids that no longer exist.
+    """
+
+    def __init__(self, root: str, db_path: Optional[str] = None):
+        self.root = os.path.abspath(root)
+        self.db_path = db_path or index_location(self.root, "trigrams")
+        self.connection = open_index(self.db_path, SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @instrument("index.trigrams.update")
+    def update(self, workers: int = INDEX_WORKERS) -> Dict[str, Any]:
+        """
+        update function
+
+        Parameters:
+            workers (int): Processes used to read and extract trigrams from changed files.
+
+        Returns:
+            Dict[str, Any]: Counts of files scanned, indexed, unchanged, removed and failed, whether the
+            base postings were rebuilt, and the time taken.
+        """
+        start = time.perf_counter()
+        known = {path: (mtime, size, digest, file_id) for file_id, path, mtime, size, digest
+                 in self.connection.execute("SELECT id, path, mtime_ns, size, hash FROM files")}
+        seen, stats = scan_tree(self.root, known)
+        tasks = [(relative, os.path.join(self.root, relative), known[relative][2] if relative in known else None)
+                 for relative in stats]
+        if len(tasks) >= POOL_MIN_FILES and workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                chunksize = max(1, min(256, len(tasks) // (workers * 4)))
+                results = list(executor.map(_extract_file, tasks, chunksize=chunksize))
+        else:
+            results = [_extract_file(task) for task in tasks]
+
+        removed = set(known) - seen
+        changed = [result for result in results if result[2] is not None]
+        total = len(seen)
+        delta_files = self.connection.execute("SELECT COUNT(*) FROM files WHERE in_base = 0").fetchone()[0]
+        rebuild = delta_files + len(changed) > max(DELTA_REBUILD_MIN_FILES, DELTA_REBUILD_FRACTION * total)
+        errors = 0
+        with self.connection:
+            for relative, digest, encoded, error in results:
+                mtime, size = stats[relative]
+                if error:
+                    errors += 1
+                    logging.warning(f"Could not index {relative}: {error}")
+                if encoded is None:
+                    self.connection.execute("UPDATE files SET mtime_ns = ?, size = ? WHERE path = ?", (mtime, size, relative))
+                    continue
+                self._remove(relative, known)
+                cursor = self.connection.execute(
+                    "INSERT INTO files (path, mtime_ns, size, hash, trigrams, in_base) VALUES (?, ?, ?, ?, ?, 0)",
+                    (relative, mtime, size, digest, encoded))
+                if not rebuild:
+                    self.connection.executemany("INSERT INTO delta_postings (trigram, file_id) VALUES (?, ?)",
+                                                ((trigram, cursor.lastrowid) for trigram in decode_ids(encoded)))
+            for relative in removed:
+                self._remove(relative, known)
+            if rebuild:
+                self._rebuild_base()
+        return {"files": total, "indexed": len(changed), "unchanged": len(results) - len(changed),
+                "removed": len(removed), "errors": errors, "rebuilt": rebuild, "seconds": time.perf_counter() - start}
+
+    def _remove(self, relative: str, known: Dict[str, Tuple]):
+        if relative not in known:
+            return
+        file_id = known[relative][3]
+        self.connection.execute("DELETE FROM delta_postings WHERE file_id = ?", (file_id,))
+        self.connection.execute("DELETE FROM files WHERE id = ?", (file_id,))
+
+    def _rebuild_base(self):
+        """Rebuild the compressed base postings from every file's stored trigrams, in bounded-memory passes."""
+        total_postings = 0
+        for (blob,) in self.connection.execute("SELECT trigrams FROM files"):
+            total_postings += len(zlib.decompress(blob)) // 4
+        passes = max(1, -(-total_postings // REBUILD_POSTINGS_PER_PASS))
+        span = -(-(1 << 24) // passes)
+        self.connection.execute("DELETE FROM base_postings")
+        for number in range(passes):
+            low, high = number * span, (number + 1) * span
+            postings: Dict[int, array] = defaultdict(lambda: array("I"))
+            for file_id, blob in self.connection.execute("SELECT id, trigrams FROM files ORDER BY id"):
+                trigrams = decode_ids(blob)
+                if passes > 1:
+                    trigrams = [trigram for trigram in trigrams if low <= trigram < high]
+                for trigram in trigrams:
+                    postings[trigram].append(file_id)
+            self.connection.executemany("INSERT INTO base_postings (trigram, ids) VALUES (?, ?)",
+                                        ((trigram, encode_ids(ids)) for trigram, ids in postings.items()))
+        self.connection.execute("DELETE FROM delta_postings")
+        self.connection.execute("UPDATE files SET in_base = 1")
+
+    def candidates(self, trigrams: Set[int]) -> Optional[Set[int]]:
+        """Return ids of files containing every trigram, or None when there is nothing to narrow by."""
+        if not trigrams:
+            return None
+        trigrams = sorted(trigrams)[:MAX_QUERY_TRIGRAMS]
+        placeholders = ",".join("?" * len(trigrams))
+        base: Optional[Set[int]] = None
+        rows = dict(self.connection.execute(f"SELECT trigram, ids FROM base_postings WHERE trigram IN ({placeholders})", trigrams))
+        if len(rows) == len(trigrams):
+            # Intersect the shortest lists first.
+            for blob in sorted(rows.values(), key=len):
+                ids = set(decode_ids(blob))
+                base = ids if base is None else base & ids
+                if not base:
+                    break
+        delta = {file_id for (file_id,) in self.connection.execute(
+            f"SELECT file_id FROM delta_postings WHERE trigram IN ({placeholders}) "
+            f"GROUP BY file_id HAVING COUNT(*) = ?", trigrams + [len(trigrams)])}
+        return (base or set()) | delta
+
+    @instrument("index.trigrams.search")
+    def search(self, query: str, regex: bool = False, ignore_case: bool = False, path_glob: Optional[str] = None,
+               exclude_glob: Optional[str] = None, prefix: str = "") -> Iterator[Tuple[str, int, str]]:
+        """
+        search function
+
+        Parameters:
+            query (str): A literal string, or a regular expression when regex is set.
+            regex (bool): Treat query as a regular expression.
+            ignore_case (bool): Match case-insensitively.
+            path_glob (Optional[str]): Only search files whose relative path or name matches this glob.
+            exclude_glob (Optional[str]): Skip files whose relative path or name matches this glob.
+            prefix (str): Only search files under this subdirectory of the index root.
+
+        Returns:
+            Iterator[Tuple[str, int, str]]: (path relative to the index root, 1-based line, line text) for each
+            matching line, yielded as each candidate file is verified. Files are narrowed to those containing
+            every trigram the query requires, then searched for real.
+        """
+        flags = re.MULTILINE | (re.IGNORECASE if ignore_case else 0)
+        pattern = re.compile(query if regex else re.escape(query), flags)
+        literals = required_literals(query, flags) if regex else [query]
+        ids = self.candidates(query_trigrams(literals, ignore_case))
+        if ids is None:
+            rows = self.connection.execute("SELECT path FROM files ORDER BY path").fetchall()
+        else:
+            rows = []
+            id_list = sorted(ids)
+            for i in range(0, len(id_list), 900):
+                chunk = id_list[i:i + 900]
+                rows.extend(self.connection.execute(
+                    f"SELECT path FROM files WHERE id IN ({','.join('?' * len(chunk))})", chunk))
+            rows.sort()
+        for (relative,) in rows:
+            if prefix and not relative.startswith(prefix):
+                continue
+            name = os.path.basename(relative)
+            if path_glob and not (fnmatch.fnmatch(relative, path_glob) or fnmatch.fnmatch(name, path_glob)):
+                continue
+            if exclude_glob and (fnmatch.fnmatch(relative, exclude_glob) or fnmatch.fnmatch(name, exclude_glob)):
+                continue
+            yield from self._search_file(relative, pattern)
+
+    def _search_file(self, relative: str, pattern) -> Iterator[Tuple[str, int, str]]:
+        try:
+            with open(os.path.join(self.root, relative), 'r', encoding='utf-8', errors='replace') as f:
+                text = f.read()
+        except OSError:
+            return
+        line_number, position, last_line_start = 1, 0, -1
+        for match in pattern.finditer(text):
+            line_number += text.count("\n", position, match.start())
+            position = match.start()
+            line_start = text.rfind("\n", 0, position) + 1
+            if line_start == last_line_start:
+                continue
+            last_line_start = line_start
+            line_end = text.find("\n", position)
+            line = text[line_start:line_end if line_end != -1 else len(text)]
+            yield relative, line_number, line[:MAX_LINE_CHARS]